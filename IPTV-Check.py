@@ -4,20 +4,181 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 import threading
 import queue
-import requests
 import time
-import re
-from concurrent.futures import ThreadPoolExecutor
-from urllib.parse import urljoin
 import os
+import re
 import sys
 import subprocess
+import multiprocessing
+from iptv_check import export, ffprobe, playlist
+from iptv_check.async_engine import AIOHTTP_AVAILABLE, DEFAULT_CONCURRENCY
+from iptv_check.cache import ResultCache
+from iptv_check.checkpoint import Checkpoint, journal_path, replay
+from iptv_check.diff import DiffState, state_path
+from iptv_check.engine import DEFAULT_THREADS, DEFAULT_TIMEOUT, CheckEngine
+from iptv_check.results import COLUMNS, VIEW_NAMES, ResultStore
+from iptv_check.scheduler import DEFAULT_PER_HOST_LIMIT
+from iptv_check.sharding import ShardedEngine
+from iptv_check.subscription import Subscription, is_remote
 
 # --- 统一管理版本信息 ---
 APP_VERSION = "1.0"
 APP_TITLE = f"电视直播源检测工具 V{APP_VERSION}"
 # --- 统一管理版本信息结束 ---
 
+# 结果队列每隔 QUEUE_TICK_MS 毫秒处理一次，每次最多占用主线程 QUEUE_DRAIN_BUDGET 秒
+QUEUE_TICK_MS = 100
+QUEUE_DRAIN_BUDGET = 0.04
+# 筛选框停止输入多少毫秒后再执行筛选
+FILTER_DEBOUNCE_MS = 150
+
+
+class VirtualTreeview:
+    # 虚拟滚动的结果列表：Treeview 中只保留可见窗口的若干行，滚动时替换行内容，
+    # 数据来自 ResultStore 中该视图的行号列表，十万行也只渲染几十行
+    def __init__(self, parent, store, name, columns):
+        self.store, self.name = store, name
+        self.offset, self.visible = 0, 1
+        self.selected = set()  # 选中的行号，可跨越可见窗口
+        self._window = []  # 当前渲染在各槽位上的行号
+        self._header_height, self._row_height = 25, 22
+        self.tree = ttk.Treeview(
+            parent, columns=columns, show="headings", height=15, selectmode="extended"
+        )
+        self.vsb = ttk.Scrollbar(parent, orient=VERTICAL, command=self.yview)
+        hsb = ttk.Scrollbar(parent, orient=HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=hsb.set)
+        self.vsb.pack(side=RIGHT, fill=Y)
+        hsb.pack(side=BOTTOM, fill=X)
+        self.tree.pack(fill=BOTH, expand=True)
+
+        self.tree.bind("<Configure>", lambda event: self.render())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Button-1>", self._on_click)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_wheel)
+        for sequence, delta in (
+            ("<Up>", -1),
+            ("<Down>", 1),
+            ("<Prior>", "-page"),
+            ("<Next>", "page"),
+            ("<Home>", "-all"),
+            ("<End>", "all"),
+        ):
+            self.tree.bind(sequence, lambda event, d=delta: self._on_key(event, d))
+
+    @property
+    def rows(self):
+        return self.store.visible_rows(self.name)
+
+    def reset(self):
+        self.offset = 0
+        self.selected.clear()
+        self.tree.delete(*self.tree.get_children())
+        self._window = []
+        self.render()
+
+    def row_at(self, y):
+        item = self.tree.identify_row(y)
+        return self._window[int(item)] if item else None
+
+    def selected_rows(self):
+        # 按当前显示顺序返回选中的行号
+        if not self.selected:
+            return []
+        return [row_id for row_id in self.rows if row_id in self.selected]
+
+    def select_all(self):
+        self.selected = set(self.rows)
+        self.render()
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.offset += int(args[1]) * step
+        self.render()
+
+    def _measure(self):
+        # 可见行数 = (控件高度 - 表头高度) / 行高，行高与表头高度取自第一行的位置
+        if self._window:
+            bbox = self.tree.bbox("0")
+            if bbox:
+                self._header_height, self._row_height = bbox[1], max(bbox[3], 1)
+        height = self.tree.winfo_height() - self._header_height
+        self.visible = max(1, height // self._row_height)
+
+    def render(self):
+        self._measure()
+        rows = self.rows
+        self.offset = max(0, min(self.offset, len(rows) - self.visible))
+        window = rows[self.offset : self.offset + self.visible]
+        store, tree = self.store, self.tree
+        for slot, row_id in enumerate(window):
+            tag = "valid" if store.is_valid(row_id) else "invalid"
+            if slot >= len(self._window):
+                tree.insert(
+                    "", END, iid=str(slot), values=store.values(row_id), tags=(tag,)
+                )
+            elif self._window[slot] != row_id:
+                tree.item(str(slot), values=store.values(row_id), tags=(tag,))
+        for slot in range(len(window), len(self._window)):
+            tree.delete(str(slot))
+        self._window = window
+        tree.selection_set(
+            [str(slot) for slot, row_id in enumerate(window) if row_id in self.selected]
+        )
+        tree.yview_moveto(0)
+        if rows:
+            self.vsb.set(
+                self.offset / len(rows), (self.offset + len(window)) / len(rows)
+            )
+        else:
+            self.vsb.set(0, 1)
+
+    def _on_select(self, event=None):
+        # 把 Treeview 中可见行的选择状态同步回 selected
+        chosen = {self._window[int(item)] for item in self.tree.selection()}
+        for row_id in self._window:
+            if row_id in chosen:
+                self.selected.add(row_id)
+            else:
+                self.selected.discard(row_id)
+
+    def _on_click(self, event):
+        # 不带 Ctrl/Shift 的单击会清除窗口外的选择
+        if not event.state & 0x5:
+            self.selected.clear()
+
+    def _on_wheel(self, event):
+        self.offset += -3 if event.num == 4 or event.delta > 0 else 3
+        self.render()
+        return "break"
+
+    def _on_key(self, event, delta):
+        rows = self.rows
+        if not rows:
+            return "break"
+        if delta in ("page", "-page"):
+            delta = self.visible if delta == "page" else -self.visible
+        elif delta in ("all", "-all"):
+            delta = len(rows) if delta == "all" else -len(rows)
+        focus = self.tree.focus()
+        pos = self.offset + (int(focus) if focus else 0) + delta
+        pos = max(0, min(pos, len(rows) - 1))
+        if pos < self.offset:
+            self.offset = pos
+        elif pos >= self.offset + self.visible:
+            self.offset = pos - self.visible + 1
+        if event.state & 0x1:
+            self.selected.add(rows[pos])
+        else:
+            self.selected = {rows[pos]}
+        self.render()
+        self.tree.focus(str(pos - self.offset))
+        return "break"
+
 
 class StreamCheckerApp:
     def __init__(self, root):
@@ -60,17 +221,46 @@ class StreamCheckerApp:
             tk.StringVar(),
             tk.StringVar(),
         )
-        self.timeout, self.max_threads = tk.IntVar(value=8), tk.IntVar(value=30)
+        self.timeout = tk.IntVar(value=DEFAULT_TIMEOUT)
+        self.max_threads = tk.IntVar(value=DEFAULT_THREADS)
         # 默认开启的选项
         self.use_deep_check, self.run_speed_test = tk.BooleanVar(
             value=True
         ), tk.BooleanVar(value=True)
+        # 两阶段：先对全部链接做快速检测 (HEAD)，只有通过的再做深度检测
+        self.use_two_stage = tk.BooleanVar(value=False)
+        # 异步引擎：单个事件循环承载大量并发检测，适合死链较多的大列表
+        self.use_async_engine = tk.BooleanVar(value=False)
+        self.async_concurrency = tk.IntVar(value=DEFAULT_CONCURRENCY)
+        # 单个主机的最大并发数，避免同一源站的大量条目同时请求导致被限流
+        self.per_host_limit = tk.IntVar(value=DEFAULT_PER_HOST_LIMIT)
+        # 跨运行结果缓存：未过期的 URL 不再重复检测
+        self.use_result_cache = tk.BooleanVar(value=False)
+        self.result_cache = None
+        # 深度检测通过后用 ffprobe 解码验证，ffprobe 路径取环境变量 IPTV_FFPROBE 或 PATH
+        self.use_ffprobe = tk.BooleanVar(value=False)
+        # 增量检测：与该文件上次完整检测的结果对比，只检测新增/变更和到期复查的条目
+        self.use_diff = tk.BooleanVar(value=False)
+        self.diff_state, self.change_report = None, None
+        # 导出格式: m3u 为有效源 .m3u + 无效源 .txt，其余为包含全部结果的表格文件
+        self.export_format = tk.StringVar(value=export.DEFAULT_EXPORT_FORMAT)
+        # 多进程：按源站把链接分给与 CPU 核数相同的子进程检测，线程数/并发数为各进程合计
+        self.use_sharding = tk.BooleanVar(value=False)
         self.status_message = tk.StringVar()
         self.total_links, self.checked_links = tk.IntVar(value=0), tk.IntVar(value=0)
         self.valid_links, self.invalid_links = tk.IntVar(value=0), tk.IntVar(value=0)
-        self.links_to_check, self.last_export_path = [], None
-        self.is_running, self.stop_requested, self.executor = False, False, None
+        self.links_to_check, self.last_export_path = None, None
+        self.is_running, self.stop_requested, self.engine = False, False, None
+        # 断点续检日志：检测中断后保留，完整结束后删除
+        self.checkpoint = None
         self.result_queue = queue.Queue()
+        # 全部结果保存在内存模型中，三个标签页只渲染可见的行
+        self.result_store = ResultStore()
+        self.views = {}
+        # 结果筛选：在频道名称、URL、编码、分辨率和信息中查找，可选正则表达式
+        self.filter_text, self.filter_regex = tk.StringVar(), tk.BooleanVar(value=False)
+        self.filter_count = tk.StringVar()
+        self._filter_job = None
         self.sort_state = {
             "all": {"col": "原始序号", "rev": False},
             "valid": {"col": "原始序号", "rev": False},
@@ -90,10 +280,11 @@ class StreamCheckerApp:
         config_frame = ttk.Labelframe(top_frame, text="配置选项", padding="10")
         config_frame.grid(row=0, column=0, sticky="ew")
         config_frame.grid_columnconfigure(1, weight=1)
-        ttk.Label(config_frame, text="源文件:").grid(
+        ttk.Label(config_frame, text="源文件/订阅:").grid(
             row=0, column=0, padx=5, pady=5, sticky=W
         )
-        ttk.Entry(config_frame, textvariable=self.file_path, state="readonly").grid(
+        # 可以直接粘贴 http(s) 订阅地址
+        ttk.Entry(config_frame, textvariable=self.file_path).grid(
             row=0, column=1, columnspan=3, padx=5, pady=5, sticky=EW
         )
         self.browse_button = ttk.Button(
@@ -139,6 +330,13 @@ class StreamCheckerApp:
             style="primary.Roundtoggle.Toolbutton",
         )
         self.deep_check_btn.pack(side=LEFT, padx=(0, 5))
+        self.two_stage_btn = ttk.Checkbutton(
+            check_options_frame,
+            text="两阶段",
+            variable=self.use_two_stage,
+            style="primary.Roundtoggle.Toolbutton",
+        )
+        self.two_stage_btn.pack(side=LEFT, padx=(0, 5))
         self.speed_test_btn = ttk.Checkbutton(
             check_options_frame,
             text="速度测试(慢)",
@@ -146,6 +344,61 @@ class StreamCheckerApp:
             style="success.Roundtoggle.Toolbutton",
         )
         self.speed_test_btn.pack(side=LEFT)
+        ttk.Label(config_frame, text="异步并发:").grid(
+            row=3, column=0, padx=5, pady=5, sticky=W
+        )
+        self.async_concurrency_spinbox = ttk.Spinbox(
+            config_frame,
+            from_=1,
+            to=10000,
+            textvariable=self.async_concurrency,
+            width=8,
+        )
+        self.async_concurrency_spinbox.grid(row=3, column=1, padx=5, pady=5, sticky=W)
+        ttk.Label(config_frame, text="单主机并发:").grid(
+            row=3, column=2, padx=(10, 5), pady=5, sticky=W
+        )
+        self.per_host_spinbox = ttk.Spinbox(
+            config_frame, from_=1, to=100, textvariable=self.per_host_limit, width=8
+        )
+        self.per_host_spinbox.grid(row=3, column=3, padx=5, pady=5, sticky=W)
+        engine_options_frame = ttk.Frame(config_frame)
+        engine_options_frame.grid(row=3, column=4, padx=5, pady=5, sticky=E)
+        self.async_engine_btn = ttk.Checkbutton(
+            engine_options_frame,
+            text="异步引擎",
+            variable=self.use_async_engine,
+            style="info.Roundtoggle.Toolbutton",
+        )
+        self.async_engine_btn.pack(side=LEFT, padx=(0, 5))
+        self.result_cache_btn = ttk.Checkbutton(
+            engine_options_frame,
+            text="结果缓存",
+            variable=self.use_result_cache,
+            style="info.Roundtoggle.Toolbutton",
+        )
+        self.result_cache_btn.pack(side=LEFT, padx=(0, 5))
+        self.ffprobe_btn = ttk.Checkbutton(
+            engine_options_frame,
+            text="ffprobe验证",
+            variable=self.use_ffprobe,
+            style="info.Roundtoggle.Toolbutton",
+        )
+        self.ffprobe_btn.pack(side=LEFT, padx=(0, 5))
+        self.diff_btn = ttk.Checkbutton(
+            engine_options_frame,
+            text="增量检测",
+            variable=self.use_diff,
+            style="info.Roundtoggle.Toolbutton",
+        )
+        self.diff_btn.pack(side=LEFT, padx=(0, 5))
+        self.sharding_btn = ttk.Checkbutton(
+            engine_options_frame,
+            text="多进程",
+            variable=self.use_sharding,
+            style="info.Roundtoggle.Toolbutton",
+        )
+        self.sharding_btn.pack(side=LEFT)
         control_theme_frame = ttk.Frame(main_frame)
         control_theme_frame.pack(fill=X, pady=10)
         self.start_button = ttk.Button(
@@ -171,6 +424,13 @@ class StreamCheckerApp:
             state=DISABLED,
         )
         self.export_button.pack(side=LEFT, padx=5, fill=X, expand=True)
+        ttk.Combobox(
+            control_theme_frame,
+            textvariable=self.export_format,
+            values=export.EXPORT_FORMATS,
+            state="readonly",
+            width=8,
+        ).pack(side=LEFT, padx=5)
         self.theme_button = ttk.Button(
             control_theme_frame,
             text="切换主题",
@@ -220,8 +480,24 @@ class StreamCheckerApp:
             main_frame, text="检测结果 (支持Ctrl/Shift多选, 右键可复制)", padding="10"
         )
         result_frame.pack(fill=BOTH, expand=True, pady=5)
+        filter_frame = ttk.Frame(result_frame)
+        filter_frame.pack(fill=X, pady=(0, 5))
+        ttk.Label(filter_frame, text="筛选:").pack(side=LEFT, padx=(0, 5))
+        ttk.Entry(filter_frame, textvariable=self.filter_text, width=40).pack(side=LEFT)
+        ttk.Checkbutton(
+            filter_frame,
+            text="正则",
+            variable=self.filter_regex,
+            bootstyle="round-toggle",
+            command=self.apply_filter,
+        ).pack(side=LEFT, padx=10)
+        ttk.Label(filter_frame, textvariable=self.filter_count).pack(side=LEFT)
+        self.filter_text.trace_add("write", lambda *args: self.schedule_filter())
         self.notebook = ttk.Notebook(result_frame)
         self.notebook.pack(fill=BOTH, expand=True)
+        self.notebook.bind(
+            "<<NotebookTabChanged>>", lambda event: self.refresh_current_view()
+        )
         self.create_result_tab("all", "全部")
         self.create_result_tab("valid", "有效源")
         self.create_result_tab("invalid", "无效源")
@@ -229,26 +505,22 @@ class StreamCheckerApp:
     def create_result_tab(self, name, text):
         tab = ttk.Frame(self.notebook, padding=5)
         self.notebook.add(tab, text=text)
-        cols = ("原始序号", "频道名称", "URL", "状态", "延迟(ms)", "速度(KB/s)", "信息")
 
-        # --- 升级点：设置选择模式为 extended ---
-        tree = ttk.Treeview(
-            tab, columns=cols, show="headings", height=15, selectmode="extended"
-        )
-        setattr(self, f"tree_{name}", tree)
+        # --- 升级点：虚拟滚动列表，选择模式为 extended ---
+        view = VirtualTreeview(tab, self.result_store, name, COLUMNS)
+        self.views[name] = view
+        tree = view.tree
 
-        tree.bind("<Button-3>", lambda event, t=tree: self.show_context_menu(event, t))
+        tree.bind("<Button-3>", lambda event, v=view: self.show_context_menu(event, v))
         # --- 新增：Ctrl+A 全选功能 ---
-        tree.bind("<Control-a>", lambda event, t=tree: self.select_all_items(t))
-        tree.bind("<Control-A>", lambda event, t=tree: self.select_all_items(t))
+        tree.bind("<Control-a>", lambda event, v=view: self.select_all_items(v))
+        tree.bind("<Control-A>", lambda event, v=view: self.select_all_items(v))
 
-        for col in cols:
+        for col in COLUMNS:
             tree.heading(
                 col,
                 text=col,
-                command=lambda _col=col, _tree_name=name: self.sort_treeview_column(
-                    getattr(self, f"tree_{_tree_name}"), _col, _tree_name
-                ),
+                command=lambda _col=col, _name=name: self.sort_view(_name, _col),
             )
         tree.column("原始序号", width=80, anchor=CENTER)
         tree.column("频道名称", width=200, anchor=W)
@@ -256,82 +528,73 @@ class StreamCheckerApp:
         tree.column("状态", width=80, anchor=CENTER)
         tree.column("延迟(ms)", width=100, anchor=CENTER)
         tree.column("速度(KB/s)", width=100, anchor=CENTER)
+        tree.column("编码", width=100, anchor=CENTER)
+        tree.column("分辨率", width=90, anchor=CENTER)
         tree.column("信息", width=150, anchor=W)
-
-        vsb = ttk.Scrollbar(tab, orient=VERTICAL, command=tree.yview)
-        hsb = ttk.Scrollbar(tab, orient=HORIZONTAL, command=tree.xview)
-        tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-        vsb.pack(side=RIGHT, fill=Y)
-        hsb.pack(side=BOTTOM, fill=X)
-        tree.pack(fill=BOTH, expand=True)
         tree.tag_configure("valid", foreground="green")
         tree.tag_configure("invalid", foreground="red")
 
     # --- 新增：全选方法 ---
-    def select_all_items(self, tree):
-        tree.selection_set(tree.get_children())
+    def select_all_items(self, view):
+        view.select_all()
         return "break"  # 阻止事件继续传播
 
     # --- 升级点：上下文菜单逻辑 ---
-    def show_context_menu(self, event, tree):
+    def show_context_menu(self, event, view):
         # 如果右键点击的地方没有行，则不显示菜单
-        clicked_item = tree.identify_row(event.y)
-        if not clicked_item:
+        clicked_row = view.row_at(event.y)
+        if clicked_row is None:
             return
 
-        selected_items = tree.selection()
-        num_selected = len(selected_items)
-
         # 如果右键点击的行不在当前选择中，则清空旧选择，只选中当前行
-        if clicked_item not in selected_items:
-            tree.selection_set(clicked_item)
-            selected_items = tree.selection()
-            num_selected = 1
+        if clicked_row not in view.selected:
+            view.selected = {clicked_row}
+            view.render()
+        num_selected = len(view.selected)
 
-        context_menu = tk.Menu(tree, tearoff=0)
+        context_menu = tk.Menu(view.tree, tearoff=0)
 
         if num_selected <= 1:  # 单行选择菜单
             context_menu.add_command(
-                label="复制 URL", command=lambda: self.copy_cell_value(tree, "URL")
+                label="复制 URL", command=lambda: self.copy_cell_value(view, "URL")
             )
             context_menu.add_command(
                 label="复制 频道名称",
-                command=lambda: self.copy_cell_value(tree, "频道名称"),
+                command=lambda: self.copy_cell_value(view, "频道名称"),
             )
             context_menu.add_separator()
             context_menu.add_command(
-                label="复制 整行数据", command=lambda: self.copy_cell_value(tree, None)
+                label="复制 整行数据", command=lambda: self.copy_cell_value(view, None)
             )
         else:  # 多行选择菜单
             context_menu.add_command(
                 label=f"复制 {num_selected} 个 URL (每行一个)",
-                command=lambda: self.copy_multiple_values(tree, "URL"),
+                command=lambda: self.copy_multiple_values(view, "URL"),
             )
             context_menu.add_command(
                 label=f"复制 {num_selected} 个 频道名称",
-                command=lambda: self.copy_multiple_values(tree, "频道名称"),
+                command=lambda: self.copy_multiple_values(view, "频道名称"),
             )
             context_menu.add_separator()
             context_menu.add_command(
                 label=f"复制 {num_selected} 行的全部数据",
-                command=lambda: self.copy_multiple_values(tree, None),
+                command=lambda: self.copy_multiple_values(view, None),
             )
 
         context_menu.post(event.x_root, event.y_root)
 
-    def copy_cell_value(self, tree, column_name):
-        selected_items = tree.selection()
-        if not selected_items:
+    def copy_cell_value(self, view, column_name):
+        selected_rows = view.selected_rows()
+        if not selected_rows:
             return
-        item_id = selected_items[0]
-        all_values = tree.item(item_id, "values")
+        all_values = self.result_store.values(selected_rows[0])
 
         if column_name is None:
             text_to_copy = ", ".join(map(str, all_values))
             message = "整行数据已复制到剪贴板"
         else:
             try:
-                col_index = tree["columns"].index(column_name)
+                col_index = COLUMNS.index(column_name)
                 text_to_copy = all_values[col_index]
                 message = f"{column_name} 已复制到剪贴板"
             except (ValueError, IndexError):
@@ -343,20 +606,20 @@ class StreamCheckerApp:
         self.set_status_message(message)
 
     # --- 新增：批量复制方法 ---
-    def copy_multiple_values(self, tree, column_name):
-        selected_items = tree.selection()
-        if not selected_items:
+    def copy_multiple_values(self, view, column_name):
+        selected_rows = view.selected_rows()
+        if not selected_rows:
             return
 
         data_to_copy = []
         try:
-            col_index = tree["columns"].index(column_name) if column_name else -1
-            for item_id in selected_items:
-                all_values = tree.item(item_id, "values")
+            col_index = COLUMNS.index(column_name) if column_name else -1
+            for row_id in selected_rows:
+                all_values = self.result_store.values(row_id)
                 if column_name is None:
                     data_to_copy.append(", ".join(map(str, all_values)))
                 else:
-                    data_to_copy.append(all_values[col_index])
+                    data_to_copy.append(str(all_values[col_index]))
 
             text_to_copy = "\n".join(data_to_copy)
             self.root.clipboard_clear()
@@ -374,25 +637,45 @@ class StreamCheckerApp:
         self.status_label.config(bootstyle="danger" if error else "primary")
         self.root.after(duration, lambda: self.status_message.set(""))
 
-    def sort_treeview_column(self, tv, col, tree_name):
-        sort_info = self.sort_state[tree_name]
+    def sort_view(self, name, col):
+        sort_info = self.sort_state[name]
         reverse = not sort_info["rev"] if col == sort_info["col"] else False
         sort_info["col"] = col
         sort_info["rev"] = reverse
-        l = [(tv.set(k, col), k) for k in tv.get_children("")]
+        self.result_store.sort_view(name, col, reverse)
+        self.views[name].render()
 
-        def safe_float_convert(s):
-            try:
-                return float(s)
-            except (ValueError, TypeError):
-                return -1
+    def schedule_filter(self):
+        # 输入过程中不断重新计时，停止输入后才执行一次筛选
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(FILTER_DEBOUNCE_MS, self.apply_filter)
+
+    def apply_filter(self):
+        self._filter_job = None
+        try:
+            self.result_store.set_filter(
+                self.filter_text.get(), regex=self.filter_regex.get()
+            )
+        except re.error as e:
+            self.set_status_message(f"正则表达式错误: {e}", error=True)
+            return
+        self.update_filter_count()
+        for name in VIEW_NAMES:
+            self.views[name].offset = 0
+        self.refresh_current_view()
 
-        if col in ("原始序号", "延迟(ms)", "速度(KB/s)"):
-            l.sort(key=lambda t: safe_float_convert(t[0]), reverse=reverse)
+    def update_filter_count(self):
+        if self.filter_text.get().strip():
+            count = len(self.result_store.visible_rows("all"))
+            self.filter_count.set(f"匹配 {count} 条")
         else:
-            l.sort(key=lambda t: str(t[0]).lower(), reverse=reverse)
-        for index, (val, k) in enumerate(l):
-            tv.move(k, "", index)
+            self.filter_count.set("")
+
+    def refresh_current_view(self):
+        # 只渲染当前标签页，其他标签页切换过去时再渲染
+        current = self.notebook.index("current")
+        self.views[VIEW_NAMES[current]].render()
 
     def browse_file(self):
         path = filedialog.askopenfilename(
@@ -419,69 +702,185 @@ class StreamCheckerApp:
             self.root.style.theme_use("litera")
 
     def parse_file(self):
-        path = self.file_path.get()
+        path = self.file_path.get().strip()
         if not path:
-            messagebox.showerror("错误", "请先选择一个源文件！")
-            return []
-        links = []
+            messagebox.showerror("错误", "请先选择一个源文件或填写订阅地址！")
+            return None
         try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-            name = "N/A"
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith("#EXTM3U"):
-                    continue
-                if line.startswith("#EXTINF:"):
-                    match = re.search(r",(.+)", line)
-                    name = match.group(1).strip() if match else "N/A"
-                elif "://" in line and not line.startswith("#"):
-                    url = line
-                    if "," in line and "://" in line.split(",", 1)[1]:
-                        parts = line.split(",", 1)
-                        name, url = parts[0].strip(), parts[1].strip()
-                    links.append({"name": name, "url": url})
-                    name = "N/A"
+            # 返回按需读取的生成器，边解析边检测
+            return playlist.open_playlist(path)
         except Exception as e:
             messagebox.showerror("文件读取错误", f"解析文件时出错: {e}")
-            return []
-        return links
+            return None
 
     def start_checking(self):
-        self.links_to_check = self.parse_file()
-        if not self.links_to_check:
+        if self.use_async_engine.get() and not AIOHTTP_AVAILABLE:
+            messagebox.showerror(
+                "错误", "异步引擎需要安装 aiohttp：\npip install aiohttp"
+            )
+            return
+        if self.use_ffprobe.get() and ffprobe.find_ffprobe() is None:
+            messagebox.showerror(
+                "错误",
+                "找不到 ffprobe，请安装 ffmpeg 并加入 PATH，"
+                f"或设置环境变量 {ffprobe.FFPROBE_ENV}",
+            )
+            return
+        source = self.file_path.get().strip()
+        if is_remote(source):
+            self._fetch_subscription(source)
+            return
+        links = self.parse_file()
+        if not links:
+            return
+        # 手动填写的路径：与“浏览...”一样按源文件设置导出位置和文件名
+        if not self.export_dir.get().strip():
+            self.export_dir.set(os.path.dirname(os.path.abspath(source)))
+        self.source_file_basename.set(os.path.splitext(os.path.basename(source))[0])
+        self._begin(source, links)
+
+    def _fetch_subscription(self, url):
+        # 订阅在后台线程下载 (条件请求，未变化时直接读取缓存)，完成后回到主线程开始检测
+        subscription = Subscription(url)
+        outcome = queue.Queue()
+
+        def fetch():
+            try:
+                subscription.fetch()
+                outcome.put(None)
+            except Exception as e:
+                outcome.put(e)
+
+        self.toggle_controls(True)
+        self.stop_button.config(state=DISABLED)
+        self.status_message.set("正在获取订阅...")
+        threading.Thread(target=fetch, daemon=True).start()
+        self.root.after(QUEUE_TICK_MS, self._poll_subscription, subscription, outcome)
+
+    def _poll_subscription(self, subscription, outcome):
+        try:
+            error = outcome.get_nowait()
+        except queue.Empty:
+            self.root.after(
+                QUEUE_TICK_MS, self._poll_subscription, subscription, outcome
+            )
+            return
+        self.toggle_controls(False)
+        self.status_message.set("")
+        if error is not None:
+            messagebox.showerror("订阅获取失败", f"下载订阅时出错: {error}")
             return
+        links = subscription.open()
+        if links is None:
+            messagebox.showerror("错误", "订阅中未找到任何直播源！")
+            return
+        if not self.export_dir.get().strip():
+            self.export_dir.set(os.getcwd())
+        self.source_file_basename.set(subscription.name)
+        if self._begin(subscription.entries_path, links, subscription):
+            self.set_status_message(subscription.summary(), duration=10000)
+
+    def _begin(self, source, links, subscription=None):
+        # source 为本地源文件或订阅的条目缓存文件，断点日志和增量状态都以它为准
+        self.links_to_check = links
+        checkpoint = self._open_checkpoint(source)
+        if checkpoint is None:
+            return False
+        self.change_report = None
+        self.diff_state = None
+        # 订阅总是记录增量状态；订阅未变化时即使没有开启增量检测也沿用上次的结果
+        if self.use_diff.get() or subscription is not None:
+            self.diff_state = DiffState(
+                state_path(source),
+                reuse=self.use_diff.get() or subscription.unchanged,
+            )
+        options = dict(
+            timeout=self.timeout.get(),
+            max_workers=self.max_threads.get(),
+            deep_check=self.use_deep_check.get(),
+            two_stage=self.use_two_stage.get(),
+            run_speed_test=self.run_speed_test.get(),
+            use_async=self.use_async_engine.get(),
+            async_concurrency=self.async_concurrency.get(),
+            on_result=self.result_queue.put,
+            cache=self._get_result_cache(),
+            per_host_limit=self.per_host_limit.get(),
+            verify_ffprobe=self.use_ffprobe.get(),
+            checkpoint=checkpoint,
+            diff=self.diff_state,
+        )
+        if self.use_sharding.get():
+            engine = ShardedEngine(**options)
+        else:
+            engine = CheckEngine(**options)
+        self.engine, self.checkpoint = engine, checkpoint
         self.is_running, self.stop_requested = True, False
         self.toggle_controls(True)
         self.reset_ui()
-        self.total_links.set(len(self.links_to_check))
-        self.progress_bar["maximum"] = len(self.links_to_check)
+        # 总数随解析进度增长，由 process_queue 更新
+        self.total_links.set(0)
+        self.progress_bar["maximum"] = 1
         threading.Thread(target=self.submit_tasks, daemon=True).start()
-        self.root.after(100, self.process_queue)
+        self.root.after(QUEUE_TICK_MS, self.process_queue)
+        return True
 
-    def submit_tasks(self):
-        check_function = (
-            self.check_url_deep if self.use_deep_check.get() else self.check_url_simple
-        )
-        with ThreadPoolExecutor(max_workers=self.max_threads.get()) as executor:
-            self.executor = executor
-            for index, link_info in enumerate(self.links_to_check):
-                if self.stop_requested:
-                    break
-                executor.submit(
-                    check_function,
-                    index,
-                    link_info,
-                    self.timeout.get(),
-                    self.run_speed_test.get(),
+    def _open_checkpoint(self, path):
+        # 同一源文件有未完成的检测日志时询问是否续检；返回 None 表示取消
+        try:
+            journal = journal_path(path)
+            records = replay(journal)
+            if records:
+                answer = messagebox.askyesnocancel(
+                    "断点续检",
+                    f"发现该文件上次未完成的检测（已检测 {len(records)} 条），是否继续？\n"
+                    "选择“否”将重新检测全部条目。",
                 )
+                if answer is None:
+                    return None
+                if not answer:
+                    records = None
+            return Checkpoint(journal, records)
+        except OSError as e:
+            messagebox.showerror("错误", f"无法创建断点日志: {e}")
+            return None
+
+    def _close_checkpoint(self, discard=False):
+        if self.checkpoint:
+            if discard:
+                self.checkpoint.discard()
+            else:
+                self.checkpoint.close()
+            self.checkpoint = None
+
+    def _save_diff_state(self):
+        # 只有完整结束的运行才更新增量状态，变更报告随结果一起导出
+        if not self.diff_state:
+            return
+        try:
+            self.diff_state.save()
+            if self.use_diff.get():
+                self.change_report = self.diff_state.report()
+        except OSError as e:
+            self.set_status_message(f"保存增量检测状态失败: {e}", error=True)
+
+    def _get_result_cache(self):
+        if not self.use_result_cache.get():
+            return None
+        if self.result_cache is None:
+            self.result_cache = ResultCache()
+        return self.result_cache
+
+    def submit_tasks(self):
+        self.engine.run(self.links_to_check)
 
     def stop_checking(self):
         if not self.is_running:
             return
         self.stop_requested = True
-        if self.executor:
-            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.engine:
+            self.engine.stop()
+        # 保留断点日志，下次选择同一文件开始检测时可以续检
+        self._close_checkpoint()
         self.is_running = False
         self.toggle_controls(False)
         self.root.title(self.root.title().split(" - ")[0] + " - 已由用户中断")
@@ -495,7 +894,15 @@ class StreamCheckerApp:
             self.timeout_spinbox,
             self.threads_spinbox,
             self.deep_check_btn,
+            self.two_stage_btn,
             self.speed_test_btn,
+            self.async_concurrency_spinbox,
+            self.per_host_spinbox,
+            self.async_engine_btn,
+            self.result_cache_btn,
+            self.ffprobe_btn,
+            self.diff_btn,
+            self.sharding_btn,
         ]:
             widget.config(state=state)
         self.stop_button.config(state=NORMAL if is_checking else DISABLED)
@@ -507,150 +914,59 @@ class StreamCheckerApp:
         self.progress_bar["value"] = 0
         self.root.title(f"{APP_TITLE.split(' - ')[0]} - 检测中...")
         self.set_status_message("", duration=1)
-        for name in ["all", "valid", "invalid"]:
-            tree = getattr(self, f"tree_{name}")
-            for item in tree.get_children():
-                tree.delete(item)
+        self.result_store.clear()
+        for name in VIEW_NAMES:
+            self.views[name].reset()
             self.sort_state[name] = {"col": "原始序号", "rev": False}
+        self.update_filter_count()
         self.export_path_label.config(text="")
         self.last_export_path = None
 
-    def _create_result_dict(self, index, link_info):
-        return {
-            "index": index + 1,
-            "name": link_info["name"],
-            "url": link_info["url"],
-            "status": "无效",
-            "latency": "-",
-            "speed": "-",
-            "details": "",
-        }
-
-    def _test_speed(self, response_iterator, timeout):
-        try:
-            start_time = time.time()
-            downloaded_size = 0
-            for chunk in response_iterator:
-                downloaded_size += len(chunk)
-                if downloaded_size >= 256 * 1024:
-                    break
-                if time.time() - start_time > timeout / 2:
-                    return "N/A"
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 0:
-                speed_kbps = (downloaded_size / 1024) / elapsed_time
-                return f"{speed_kbps:.2f}"
-            return "∞"
-        except Exception:
-            return "N/A"
-
-    def check_url_deep(self, index, link_info, timeout, run_speed_test):
-        if self.stop_requested:
-            return
-        result = self._create_result_dict(index, link_info)
-        base_url = link_info["url"]
-        start_time = time.time()
-        try:
-            headers = {"User-Agent": "Mozilla/5.0"}
-            with requests.get(
-                base_url, headers=headers, timeout=timeout, stream=True
-            ) as r:
-                r.raise_for_status()
-                latency = int((time.time() - start_time) * 1000)
-                speed = "-"
-                if run_speed_test:
-                    content_type = r.headers.get("Content-Type", "").lower()
-                    if "mpegurl" in content_type or base_url.endswith(".m3u8"):
-                        playlist_content = r.text
-                        segment_url = None
-                        if not playlist_content.strip().startswith("#EXTM3U"):
-                            raise ValueError("非标准M3U8内容")
-                        for line in playlist_content.splitlines():
-                            line = line.strip()
-                            if line and not line.startswith("#"):
-                                segment_url = urljoin(base_url, line)
-                                break
-                        if not segment_url:
-                            raise ValueError("M3U8列表为空")
-                        with requests.get(
-                            segment_url, headers=headers, timeout=timeout, stream=True
-                        ) as seg_r:
-                            seg_r.raise_for_status()
-                            speed = self._test_speed(
-                                seg_r.iter_content(chunk_size=8192), timeout
-                            )
-                    else:
-                        speed = self._test_speed(
-                            r.iter_content(chunk_size=8192), timeout
-                        )
-                else:
-                    if not next(r.iter_content(chunk_size=1024), None):
-                        raise ValueError("无数据流")
-            result.update(
-                {
-                    "status": "有效",
-                    "latency": latency,
-                    "speed": speed,
-                    "details": f"OK ({r.status_code})",
-                }
-            )
-        except requests.exceptions.Timeout:
-            result["details"] = f"超时 (>{timeout}s)"
-        except requests.exceptions.HTTPError as e:
-            result["details"] = f"HTTP错误: {e.response.status_code}"
-        except requests.exceptions.RequestException:
-            result["details"] = "连接错误"
-        except ValueError as e:
-            result["details"] = str(e)
-        except Exception:
-            result["details"] = "未知解析错误"
-        if not self.stop_requested:
-            self.result_queue.put(result)
-
     def process_queue(self):
+        # 每个周期在时间预算内批量取出结果，只更新一次计数并重绘当前可见的行
+        store = self.result_store
+        deadline = time.perf_counter() + QUEUE_DRAIN_BUDGET
+        added = 0
         try:
-            while not self.result_queue.empty():
-                result = self.result_queue.get_nowait()
-                self.checked_links.set(self.checked_links.get() + 1)
-                values = (
-                    result["index"],
-                    result["name"],
-                    result["url"],
-                    result["status"],
-                    result["latency"],
-                    result["speed"],
-                    result["details"],
-                )
-                tag = "invalid"
-                if result["status"] == "有效":
-                    self.valid_links.set(self.valid_links.get() + 1)
-                    tag = "valid"
-                    self.tree_valid.insert("", END, values=values, tags=(tag,))
-                else:
-                    self.invalid_links.set(self.invalid_links.get() + 1)
-                    self.tree_invalid.insert("", END, values=values, tags=(tag,))
-                self.tree_all.insert("", END, values=values, tags=(tag,))
-                self.progress_bar["value"] = self.checked_links.get()
+            while True:
+                store.add(self.result_queue.get_nowait())
+                added += 1
+                if added % 256 == 0 and time.perf_counter() > deadline:
+                    break
         except queue.Empty:
             pass
-        finally:
-            if self.is_running and not self.stop_requested:
-                if self.checked_links.get() == self.total_links.get():
-                    self.is_running = False
-                    self.toggle_controls(False)
-                    self.export_button.config(state=NORMAL)
-                    self.root.title(f"{APP_TITLE.split(' - ')[0]} - 检测完成")
-                    for name in ["all", "valid", "invalid"]:
-                        self.sort_state[name]["rev"] = True
-                        self.sort_treeview_column(
-                            getattr(self, f"tree_{name}"), "原始序号", name
-                        )
-                    messagebox.showinfo(
-                        "完成",
-                        f"检测完成！结果已按原始序号排序。\n有效: {self.valid_links.get()}\n无效: {self.invalid_links.get()}",
-                    )
-                else:
-                    self.root.after(100, self.process_queue)
+        if added:
+            self.checked_links.set(len(store))
+            self.valid_links.set(store.valid_count)
+            self.invalid_links.set(store.invalid_count)
+            self.progress_bar["value"] = len(store)
+            self.update_filter_count()
+            self.refresh_current_view()
+        if self.is_running and not self.stop_requested:
+            self.total_links.set(self.engine.submitted)
+            self.progress_bar["maximum"] = max(self.engine.submitted, 1)
+            if self.engine.finished and self.result_queue.empty():
+                self.is_running = False
+                self._close_checkpoint(discard=True)
+                self._save_diff_state()
+                self.toggle_controls(False)
+                self.export_button.config(state=NORMAL)
+                self.root.title(f"{APP_TITLE.split(' - ')[0]} - 检测完成")
+                for name in VIEW_NAMES:
+                    self.sort_state[name]["rev"] = True
+                    self.sort_view(name, "原始序号")
+                messagebox.showinfo(
+                    "完成",
+                    f"检测完成！结果已按原始序号排序。\n有效: {self.valid_links.get()}\n无效: {self.invalid_links.get()}"
+                    + self._connection_summary(),
+                )
+            else:
+                self.root.after(QUEUE_TICK_MS, self.process_queue)
+
+    def _connection_summary(self):
+        if not self.engine or not self.engine.connection_stats:
+            return ""
+        return f"\n{self.engine.summary()}\n{self.engine.connection_stats.summary()}"
 
     def export_results(self):
         export_dir = self.export_dir.get().strip()
@@ -658,24 +974,14 @@ class StreamCheckerApp:
         if not export_dir or not base_name:
             messagebox.showerror("错误", "无法导出，请先选择一个源文件。")
             return
-        valid_path = os.path.join(export_dir, f"{base_name}_有效源.m3u")
-        invalid_path = os.path.join(export_dir, f"{base_name}_无效源.txt")
         try:
-
-            def export_tree(tree, file_path, is_m3u):
-                items = tree.get_children("")
-                with open(file_path, "w", encoding="utf-8") as f:
-                    if is_m3u:
-                        f.write("#EXTM3U\n")
-                    for item in items:
-                        v = tree.item(item, "values")
-                        if is_m3u:
-                            f.write(f"#EXTINF:-1,{v[1]}\n{v[2]}\n")
-                        else:
-                            f.write(f"{v[1]},{v[2]} # 错误: {v[6]}\n")
-
-            export_tree(self.tree_valid, valid_path, is_m3u=True)
-            export_tree(self.tree_invalid, invalid_path, is_m3u=False)
+            export.export_results(
+                self.result_store, export_dir, base_name, self.export_format.get()
+            )
+            if self.change_report:
+                export.write_change_report(
+                    export.report_path(export_dir, base_name), self.change_report
+                )
             self.last_export_path = export_dir
             self.export_path_label.config(text=f"导出位置: {export_dir}")
             messagebox.showinfo(
@@ -707,12 +1013,21 @@ class StreamCheckerApp:
             "退出", "检测正在进行中，确定要退出吗？"
         ):
             self.stop_checking()
+            self._close_result_cache()
             self.root.destroy()
         elif not self.is_running:
+            self._close_result_cache()
             self.root.destroy()
 
+    def _close_result_cache(self):
+        if self.result_cache:
+            self.result_cache.close()
+            self.result_cache = None
+
 
 if __name__ == "__main__":
+    # 打包为可执行文件时，多进程检测的子进程从这里进入
+    multiprocessing.freeze_support()
     root = ttk.Window(themename="litera")
     app = StreamCheckerApp(root)
     root.mainloop()
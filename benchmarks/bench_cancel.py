@@ -0,0 +1,273 @@
+# 停止耗时测试：让约 1000 个检测同时卡在不同阶段 (黑洞端口等待响应头、首字节很慢、
+# 持续测速中的低速数据流)，检测超时设得很长，然后调用 stop()，记录:
+#   停止耗时 (stop() 到 run() 返回)、返回后仍存活的线程数和仍打开的 socket 数
+# 每个引擎在独立子进程中运行，假源站运行在父进程，socket 数只统计检测进程本身。
+# 另外用同样的列表运行命令行程序，检测全部开始后发送 SIGINT (Ctrl+C)，记录从发出信号到
+# 输出中断提示 (引擎已停止) 的耗时和进程退出的耗时，退出码应为 130。
+# 单次结果受同一台机器上假源站的负载影响 (停止时上千个连接同时断开，假源站也要处理)，
+# 每项运行 --rounds 次取中位数。
+#
+# 用法: python benchmarks/bench_cancel.py
+#       python benchmarks/bench_cancel.py --engines thread,async,sharded --inflight 1000
+# 任一引擎的停止耗时中位数超过 --limit-ms (默认 200)、有未释放的 socket
+# 或 SIGINT 后退出码不是 130 时退出码为 1。
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_origin import FakeOrigin, url_for  # noqa: E402
+
+# 卡住检测的几种方式，按顺序轮流分配
+BEHAVIOURS = ("dead", "slow:60000", "throttle:64", "throttle:16")
+ENGINES = ("thread", "async", "sharded")
+# 等待检测全部开始的最长时间 (秒)
+WARMUP_DEADLINE = 30
+# 发送 SIGINT 后等待命令行程序退出的最长时间 (秒)，超过时结束进程，计为未达标
+EXIT_DEADLINE = 10
+
+
+def open_sockets():
+    # 当前进程打开的 socket 数 (Linux)；其他平台返回 None
+    fd_dir = "/proc/self/fd"
+    if not os.path.isdir(fd_dir):
+        return None
+    count = 0
+    for name in os.listdir(fd_dir):
+        try:
+            if os.readlink(os.path.join(fd_dir, name)).startswith("socket:"):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+def make_links(count, bases, dead_bases):
+    return [
+        {
+            "name": f"频道{i}",
+            "url": url_for(BEHAVIOURS[i % len(BEHAVIOURS)], i, bases, dead_bases),
+        }
+        for i in range(count)
+    ]
+
+
+def worker(args):
+    from iptv_check.engine import CheckEngine
+    from iptv_check.metrics import Metrics
+    from iptv_check.sharding import ShardedEngine
+
+    links = make_links(args.inflight, args.bases.split(","), args.dead_bases.split(","))
+    results = []
+    # 引擎的指标采样提供正在检测的条目数，多进程分片时由子进程回传
+    metrics = Metrics(interval=0.1)
+    options = dict(
+        timeout=args.timeout,
+        max_workers=args.inflight,
+        use_async=args.worker == "async",
+        async_concurrency=args.inflight,
+        run_speed_test=True,
+        sustain_seconds=args.timeout,
+        per_host_limit=0,
+        host_rate=0,
+        on_result=results.append,
+        metrics=metrics,
+    )
+    if args.worker == "sharded":
+        engine = ShardedEngine(processes=args.processes, **options)
+    else:
+        engine = CheckEngine(**options)
+    sockets_before = open_sockets()
+    threads_before = threading.active_count()
+    runner = threading.Thread(target=engine.run, args=(links,))
+    runner.start()
+
+    deadline = time.monotonic() + WARMUP_DEADLINE
+    active = 0
+    while time.monotonic() < deadline:
+        active = engine.gauges()["active"]
+        if active >= args.inflight:
+            break
+        time.sleep(0.05)
+    # 让已开始的请求都进入阻塞读取
+    time.sleep(0.5)
+    active = engine.gauges()["active"]
+
+    start = time.perf_counter()
+    engine.stop()
+    runner.join()
+    stop_ms = (time.perf_counter() - start) * 1000
+    metrics.close()
+    sockets_after = open_sockets()
+    print(
+        json.dumps(
+            {
+                "engine": args.worker,
+                "inflight": active,
+                "stop_ms": round(stop_ms, 1),
+                "results": len(results),
+                "threads_left": threading.active_count() - threads_before,
+                "sockets_left": (
+                    None if sockets_before is None else sockets_after - sockets_before
+                ),
+            },
+            ensure_ascii=False,
+        )
+    )
+
+
+def run_worker(engine, args, origin):
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", engine]
+    cmd += ["--inflight", str(args.inflight), "--timeout", str(args.timeout)]
+    cmd += ["--processes", str(args.processes)]
+    cmd += ["--bases", ",".join(origin.bases)]
+    cmd += ["--dead-bases", ",".join(origin.dead_bases)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def active_checks(metrics_path):
+    # 命令行程序写入的最近一次指标采样中正在检测的条目数
+    active = 0
+    try:
+        with open(metrics_path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("type") == "sample":
+                    active = record["gauges"].get("active", 0)
+    except (OSError, ValueError):  # 尚未创建或最后一行还没写完
+        pass
+    return active
+
+
+def run_sigint(engine, args, origin):
+    # 运行命令行程序，检测全部开始后发送 SIGINT；中断提示在引擎停止 (run() 返回) 之后输出
+    with tempfile.TemporaryDirectory() as work_dir:
+        playlist = os.path.join(work_dir, "cancel.m3u")
+        metrics_path = os.path.join(work_dir, "metrics.jsonl")
+        with open(playlist, "w", encoding="utf-8") as f:
+            f.write("#EXTM3U\n")
+            for link in make_links(args.inflight, origin.bases, origin.dead_bases):
+                f.write(f"#EXTINF:-1,{link['name']}\n{link['url']}\n")
+        cmd = [sys.executable, "-m", "iptv_check", playlist, "-q"]
+        cmd += ["-t", str(args.timeout), "-c", str(args.inflight)]
+        cmd += ["--speed-test", "--sustain", str(args.timeout)]
+        cmd += ["--per-host", "0", "--host-rate", "0", "--no-checkpoint"]
+        cmd += ["-o", work_dir, "--metrics-jsonl", metrics_path]
+        if engine == "sharded":
+            cmd += ["--processes", str(args.processes)]
+        else:
+            cmd += ["--engine", engine]
+        proc = subprocess.Popen(
+            cmd,
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+        try:
+            deadline = time.monotonic() + WARMUP_DEADLINE
+            active = 0
+            while time.monotonic() < deadline and proc.poll() is None:
+                active = active_checks(metrics_path)
+                if active >= args.inflight:
+                    break
+                time.sleep(0.05)
+            time.sleep(0.5)
+            killer = threading.Timer(EXIT_DEADLINE, proc.kill)
+            killer.start()
+            start = time.perf_counter()
+            proc.send_signal(signal.SIGINT)
+            stop_ms = None
+            for line in proc.stderr:
+                if stop_ms is None and "已由用户中断" in line:
+                    stop_ms = (time.perf_counter() - start) * 1000
+            proc.wait()
+            exit_ms = (time.perf_counter() - start) * 1000
+            killer.cancel()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+    return {
+        "inflight": active,
+        "stop_ms": None if stop_ms is None else round(stop_ms, 1),
+        "exit_ms": round(exit_ms, 1),
+        "returncode": proc.returncode,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="停止耗时测试")
+    parser.add_argument(
+        "--engines", default="thread,async", help="逗号分隔: " + ",".join(ENGINES)
+    )
+    parser.add_argument("--inflight", type=int, default=1000, help="同时进行的检测数")
+    parser.add_argument("--timeout", type=int, default=60, help="检测超时 (秒)")
+    parser.add_argument("--processes", type=int, default=2, help="sharded 的子进程数")
+    parser.add_argument("--origins", type=int, default=8, help="假源站监听的端口数")
+    parser.add_argument("--limit-ms", type=float, default=200, help="停止耗时上限")
+    parser.add_argument("--rounds", type=int, default=5, help="每项运行的次数")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--bases", help=argparse.SUPPRESS)
+    parser.add_argument("--dead-bases", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    engines = args.engines.split(",")
+    for name in engines:
+        if name not in ENGINES:
+            parser.error(f"未知引擎: {name}")
+    rounds = max(1, args.rounds)
+    origin = FakeOrigin(args.origins)
+    failed = False
+    try:
+        for engine in engines:
+            runs = [run_worker(engine, args, origin) for _ in range(rounds)]
+            stop_ms = statistics.median(run["stop_ms"] for run in runs)
+            threads_left = max(run["threads_left"] for run in runs)
+            sockets_left = max(run["sockets_left"] or 0 for run in runs)
+            ok = stop_ms <= args.limit_ms and not sockets_left
+            failed = failed or not ok
+            print(
+                f"{engine}: {runs[-1]['inflight']} 个检测进行中，"
+                f"停止耗时 {stop_ms:.1f} ms (最长 {max(r['stop_ms'] for r in runs)} ms)，"
+                f"剩余线程 {threads_left} 个，剩余 socket {sockets_left} 个"
+                + ("" if ok else "  [未达标]")
+            )
+
+            runs = [run_sigint(engine, args, origin) for _ in range(rounds)]
+            # 没有输出中断提示 (如未能停止) 时按无穷大计
+            stop_ms = statistics.median(
+                float("inf") if run["stop_ms"] is None else run["stop_ms"]
+                for run in runs
+            )
+            exit_ms = statistics.median(run["exit_ms"] for run in runs)
+            codes = sorted({run["returncode"] for run in runs})
+            ok = stop_ms <= args.limit_ms and codes == [130]
+            failed = failed or not ok
+            print(
+                f"{engine} (SIGINT): {runs[-1]['inflight']} 个检测进行中，"
+                f"停止耗时 {stop_ms:.1f} ms，退出耗时 {exit_ms:.1f} ms，"
+                f"退出码 {','.join(map(str, codes))}" + ("" if ok else "  [未达标]")
+            )
+    finally:
+        origin.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
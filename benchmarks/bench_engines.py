@@ -0,0 +1,126 @@
+# 对比线程池引擎与异步引擎的吞吐 (URLs/秒) 和峰值内存
+#
+# 用法: python benchmarks/bench_engines.py --links 5000 --dead-ratio 0.7 --timeout 3
+# 每个引擎在独立子进程中运行，桩服务器运行在父进程，因此峰值内存只统计引擎本身。
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_server import make_links, start_stub  # noqa: E402
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows 下没有 resource 模块
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def run_thread_engine(links, args):
+    from iptv_check import probe
+
+    results = []
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for index, link_info in enumerate(links):
+            executor.submit(
+                lambda i=index, l=link_info: results.append(
+                    probe.check_url_deep(i, l, args.timeout, args.speed_test)
+                )
+            )
+    return results
+
+
+def run_async_engine(links, args):
+    from iptv_check.async_engine import AsyncChecker
+
+    results = []
+    checker = AsyncChecker(
+        args.timeout,
+        args.speed_test,
+        concurrency=args.concurrency,
+        on_result=results.append,
+    )
+    checker.run(enumerate(links))
+    return results
+
+
+def worker(args):
+    links = make_links(args.links, args.dead_ratio, args.live_base, args.dead_base)
+    runner = run_async_engine if args.worker == "async" else run_thread_engine
+    start = time.perf_counter()
+    results = runner(links, args)
+    elapsed = time.perf_counter() - start
+    valid = sum(1 for r in results if r["status"] == "有效")
+    print(
+        json.dumps(
+            {
+                "engine": args.worker,
+                "links": len(links),
+                "results": len(results),
+                "valid": valid,
+                "elapsed_s": round(elapsed, 3),
+                "urls_per_s": round(len(results) / elapsed, 1) if elapsed else None,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="线程池 vs 异步引擎 基准测试")
+    parser.add_argument("--links", type=int, default=2000)
+    parser.add_argument("--dead-ratio", type=float, default=0.7, help="死链比例")
+    parser.add_argument("--timeout", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=100, help="线程池线程数")
+    parser.add_argument("--concurrency", type=int, default=2000, help="异步并发数")
+    parser.add_argument("--speed-test", action="store_true")
+    parser.add_argument("--engines", default="thread,async")
+    parser.add_argument("--json", help="将结果写入该 JSON 文件")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--live-base", help=argparse.SUPPRESS)
+    parser.add_argument("--dead-base", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    server, black_hole, live_base, dead_base = start_stub()
+    reports = []
+    try:
+        for engine in args.engines.split(","):
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", engine]
+            cmd += ["--live-base", live_base, "--dead-base", dead_base]
+            cmd += ["--links", str(args.links), "--dead-ratio", str(args.dead_ratio)]
+            cmd += ["--timeout", str(args.timeout), "--threads", str(args.threads)]
+            cmd += ["--concurrency", str(args.concurrency)]
+            if args.speed_test:
+                cmd.append("--speed-test")
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            report = json.loads(out.stdout.strip().splitlines()[-1])
+            reports.append(report)
+            print(
+                f"{engine:>6}: {report['results']}/{report['links']} 条, "
+                f"{report['elapsed_s']}s, {report['urls_per_s']} URLs/s, "
+                f"峰值内存 {report['peak_rss_mb']} MB"
+            )
+    finally:
+        server.shutdown()
+        black_hole.close()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
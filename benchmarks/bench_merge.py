@@ -0,0 +1,115 @@
+# 多源合并基准测试：用本地假源站生成若干个源文件，同一频道在各文件中以不同写法的名称
+# (如 “频道1”“频道-1 HD”“频道１（高清）”) 出现，共有 --mirrors 个镜像，其中 --good 个有效、
+# 其余为死链 (黑洞端口、404)。分别以不提前结束和每频道 K 个有效镜像即结束各运行一次，记录:
+#   实际检测的镜像数、跳过的镜像数、耗时、有有效镜像的频道数
+#
+# 用法: python benchmarks/bench_merge.py
+#       python benchmarks/bench_merge.py --channels 2000 --mirrors 15 --good 5 -k 2 --engine async
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_origin import FakeOrigin, url_for  # noqa: E402
+from iptv_check.engine import CheckEngine  # noqa: E402
+from iptv_check.merge import ChannelIndex, MirrorMerge  # noqa: E402
+
+# 同一频道在不同源文件中的几种写法，都应归入同一个频道
+NAME_VARIANTS = ("频道{0}", "频道-{0} HD", "频道{0}（高清）", "频道 {0} [1080P]")
+DEAD_BEHAVIOURS = ("dead", "status:404")
+
+
+def write_sources(directory, args, bases, dead_bases):
+    # 每个频道的镜像随机排列后轮流写入各个文件，相同参数每次生成相同的文件
+    rng = random.Random(1)
+    files = [[] for _ in range(args.files)]
+    serial = 0
+    for channel in range(args.channels):
+        behaviours = ["ts"] * args.good
+        behaviours += [
+            DEAD_BEHAVIOURS[i % len(DEAD_BEHAVIOURS)]
+            for i in range(args.mirrors - args.good)
+        ]
+        rng.shuffle(behaviours)
+        for mirror, behaviour in enumerate(behaviours):
+            name = NAME_VARIANTS[mirror % len(NAME_VARIANTS)].format(channel)
+            url = url_for(behaviour, serial, bases, dead_bases)
+            files[mirror % args.files].append(f"{name},{url}\n")
+            serial += 1
+    paths = []
+    for number, lines in enumerate(files):
+        path = os.path.join(directory, f"源{number}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        paths.append(path)
+    return paths
+
+
+def run(paths, good_mirrors, args):
+    index = ChannelIndex()
+    for path in paths:
+        index.add_file(path)
+    merge = MirrorMerge(index, good_mirrors)
+    engine = CheckEngine(
+        timeout=args.timeout,
+        max_workers=args.concurrency,
+        use_async=args.engine == "async",
+        async_concurrency=args.concurrency,
+        run_speed_test=False,
+        per_host_limit=0,
+        host_rate=0,
+        on_result=merge.on_result,
+        skip=merge.skip,
+    )
+    start = time.perf_counter()
+    engine.run(merge.links())
+    elapsed = time.perf_counter() - start
+    channels = index.channels.values()
+    return {
+        "channels": len(channels),
+        "covered": sum(1 for channel in channels if channel.good),
+        "checked": sum(channel.checked for channel in channels),
+        "skipped": merge.skipped,
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多源合并提前结束基准测试")
+    parser.add_argument("--channels", type=int, default=500)
+    parser.add_argument("--mirrors", type=int, default=10, help="每个频道的镜像数")
+    parser.add_argument("--good", type=int, default=4, help="每个频道的有效镜像数")
+    parser.add_argument("-k", type=int, default=3, help="每个频道需要的有效镜像数")
+    parser.add_argument("--files", type=int, default=4, help="镜像分散到的源文件数")
+    parser.add_argument("--engine", choices=("thread", "async"), default="thread")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--timeout", type=int, default=2)
+    parser.add_argument("--origins", type=int, default=16)
+    args = parser.parse_args()
+
+    origin = FakeOrigin(args.origins)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = write_sources(directory, args, origin.bases, origin.dead_bases)
+            # 要求的有效镜像数超过镜像总数时永远不会提前结束，即逐个检测全部镜像
+            for label, good_mirrors in (
+                ("全部检测", args.mirrors + 1),
+                (f"K={args.k}", args.k),
+            ):
+                stats = run(paths, good_mirrors, args)
+                print(
+                    f"{label}: {stats['channels']} 个频道，有效 {stats['covered']} 个，"
+                    f"检测 {stats['checked']} 个镜像，跳过 {stats['skipped']} 个，"
+                    f"用时 {stats['elapsed']:.1f}s"
+                )
+    finally:
+        origin.close()
+
+
+if __name__ == "__main__":
+    main()
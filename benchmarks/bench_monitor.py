@@ -0,0 +1,129 @@
+# 持续监测基准测试：本地假源站上的一组频道 (正常、时好时坏、404、死链) 按给定间隔监测若干轮，记录:
+#   请求分布: 假源站每秒收到的请求数，均匀分布时约为 频道数 / (间隔 × 0.9)；
+#             与不限开始速率 (一次发出全部检测) 的一轮对比
+#   历史: 每条样本占用的数据库空间、可用性统计的查询耗时，以及按可用率筛选出的稳定源数
+#
+# 用法: python benchmarks/bench_monitor.py
+#       python benchmarks/bench_monitor.py --channels 1000 --interval 60 --rounds 3
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_origin import FakeOrigin, OriginHandler, url_for  # noqa: E402
+from iptv_check.engine import CheckEngine  # noqa: E402
+from iptv_check.monitor import SPREAD, History, Monitor, select  # noqa: E402
+
+# 行为及其所占比例
+BEHAVIOURS = (("ts", 6), ("flaky:30", 2), ("status:404", 1), ("dead", 1))
+
+
+def make_links(count, bases, dead_bases):
+    behaviours = [kind for kind, weight in BEHAVIOURS for _ in range(weight)]
+    return [
+        {
+            "name": f"频道{i}",
+            "url": url_for(behaviours[i % len(behaviours)], i, bases, dead_bases),
+            "attrs": {"group-title": "重点" if i % 10 == 0 else "其他"},
+        }
+        for i in range(count)
+    ]
+
+
+def make_engine(args):
+    def make(on_result, start_rate):
+        return CheckEngine(
+            timeout=args.timeout,
+            max_workers=args.concurrency,
+            run_speed_test=False,
+            per_host_limit=0,
+            host_rate=0,
+            start_rate=start_rate,
+            on_result=on_result,
+        )
+
+    return make
+
+
+def spread(arrivals):
+    # (每秒最多请求数, 有请求的秒数)
+    buckets = Counter(int(at - arrivals[0]) for at in arrivals)
+    return max(buckets.values()), len(buckets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="持续监测基准测试")
+    parser.add_argument("--channels", type=int, default=300)
+    parser.add_argument("--interval", type=float, default=20, help="监测间隔 (秒)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=int, default=2)
+    parser.add_argument("--origins", type=int, default=4)
+    args = parser.parse_args()
+
+    origin = FakeOrigin(args.origins)
+    links = make_links(args.channels, origin.bases, origin.dead_bases)
+    even = args.channels / (args.interval * SPREAD)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            # 不限开始速率：全部检测一次发出
+            OriginHandler.arrivals = []
+            engine = make_engine(args)(None, 0)
+            engine.run(links)
+            peak, seconds = spread(OriginHandler.arrivals)
+            print(
+                f"{args.channels} 个频道，不限开始速率: 每秒最多 {peak} 个请求，"
+                f"分布在 {seconds}s 内"
+            )
+
+            path = os.path.join(directory, "monitor.db")
+            history = History(path)
+            OriginHandler.arrivals = []
+
+            def on_round(monitor, stats):
+                print(
+                    f"  第 {monitor.rounds} 轮: 检测 {stats['checked']} 条，"
+                    f"有效 {stats['valid']}，用时 {stats['elapsed']:.1f}s"
+                )
+
+            monitor = Monitor(
+                lambda: links,
+                make_engine(args),
+                history,
+                interval=args.interval,
+                priority=lambda link_info: link_info["attrs"]["group-title"] == "重点",
+                on_round=on_round,
+            )
+            print(f"监测 {args.rounds} 轮，间隔 {args.interval:g}s (抖动 ±10%):")
+            monitor.run(args.rounds)
+            peak, seconds = spread(OriginHandler.arrivals)
+            print(
+                f"  每秒最多 {peak} 个请求 (均匀分布为 {even:.1f} 个)，"
+                f"分布在 {seconds}s 内"
+            )
+
+            start = time.perf_counter()
+            channels = history.availability()
+            query = time.perf_counter() - start
+            samples = sum(channel.checks for channel in channels)
+            history.close()
+            size = os.path.getsize(path)
+            stable = select(channels, min_uptime=99)
+            flaky = select(channels, min_uptime=1)
+            print(
+                f"  历史: {samples} 条样本，数据库 {size / 1024:.0f} KB"
+                f" ({size / samples:.0f} B/条，含频道表)，可用性统计 {query * 1000:.0f}ms\n"
+                f"  可用率 ≥99%: {len(stable)} 个频道，有过有效结果: {len(flaky)} 个"
+            )
+    finally:
+        OriginHandler.arrivals = None
+        origin.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# 对比一次性解析 (parse_file) 与流式解析 (iter_playlist) 的首条结果耗时和峰值内存
+#
+# 用法: python benchmarks/bench_parser.py --entries 1000000
+# 每次运行都会重新生成测试用的 M3U 文件（1M 条约 120 MB），链接指向本次启动的桩服务器。
+# 每种模式在独立子进程中运行:
+#   first-result: 解析结果送入检测引擎 (指向本地桩服务器)，记录拿到第一条检测结果的耗时
+#   full-parse:   只解析不检测，遍历全部条目，记录总耗时与峰值内存
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_engines import peak_rss_mb  # noqa: E402
+from benchmarks.stub_server import start_stub  # noqa: E402
+
+
+def generate_playlist(path, entries, live_base):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("#EXTM3U\n")
+        for i in range(entries):
+            f.write(
+                f'#EXTINF:-1 tvg-id="ch{i}" tvg-logo="http://logo/{i}.png" '
+                f'group-title="分组{i % 50}",频道{i}\n{live_base}/live/{i}.ts\n'
+            )
+
+
+def load_entries(path, mode):
+    from iptv_check import playlist
+
+    if mode == "list":
+        return playlist.parse_file(path)
+    return playlist.iter_playlist(path)
+
+
+def worker(args):
+    from iptv_check.engine import CheckEngine
+
+    start = time.perf_counter()
+    report = {"mode": args.worker, "phase": args.phase}
+    entries = load_entries(args.file, args.worker)
+    if args.phase == "full-parse":
+        count = sum(1 for _ in entries)
+        report["entries"] = count
+        report["elapsed_s"] = round(time.perf_counter() - start, 3)
+    else:
+        first = threading.Event()
+
+        def on_result(result):
+            if not first.is_set():
+                report["first_result_s"] = round(time.perf_counter() - start, 3)
+                first.set()
+            engine.stop()
+
+        engine = CheckEngine(timeout=5, run_speed_test=False, on_result=on_result)
+        thread = threading.Thread(target=engine.run, args=(entries,), daemon=True)
+        thread.start()
+        first.wait(timeout=300)
+        engine.stop()
+    report["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="播放列表解析基准测试")
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--file", help="测试文件路径，默认放在系统临时目录")
+    parser.add_argument("--json", help="将结果写入该 JSON 文件")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--phase", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    server, black_hole, live_base, _ = start_stub()
+    path = args.file or os.path.join(
+        tempfile.gettempdir(), f"iptv_bench_{args.entries}.m3u"
+    )
+    print(f"生成 {args.entries} 条测试数据: {path}")
+    generate_playlist(path, args.entries, live_base)
+    reports = []
+    try:
+        for phase in ("first-result", "full-parse"):
+            for mode in ("list", "stream"):
+                cmd = [sys.executable, os.path.abspath(__file__), "--worker", mode]
+                cmd += ["--phase", phase, "--file", path]
+                out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+                report = json.loads(out.stdout.strip().splitlines()[-1])
+                reports.append(report)
+                timing = report.get("first_result_s", report.get("elapsed_s"))
+                print(
+                    f"{phase:>12} {mode:>6}: {timing}s, "
+                    f"峰值内存 {report['peak_rss_mb']} MB"
+                )
+    finally:
+        server.shutdown()
+        black_hole.close()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# 结果存储与导出基准测试：生成 --rows 条模拟检测结果 (约 40% 有效，无效的错误信息各不相同的
+# 字符串对象，与实际检测一致)，记录:
+#   内存: 保存为结果字典列表 (之前命令行的做法) 与写入 ResultStore 后各自占用的内存 (tracemalloc)
+#   写入、筛选、排序的耗时
+#   各导出格式的耗时与文件大小
+#
+# 用法: python benchmarks/bench_results.py --rows 100000
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from iptv_check import export  # noqa: E402
+from iptv_check.results import ResultStore  # noqa: E402
+
+INVALID_DETAILS = ("HTTP 404", "连接超时", "读取超时", "DNS解析失败", "HTTP 503")
+
+
+def generate_results(rows):
+    rng = random.Random(1)
+    for i in range(rows):
+        valid = rng.random() < 0.4
+        channel = i % 300
+        yield {
+            "index": i + 1,
+            "name": f"CCTV-{channel} 高清",
+            "url": f"http://stream{i % 97}.example.com:8080/live/ch{i}/index.m3u8",
+            "attrs": {
+                "tvg-id": f"ch{channel}",
+                "tvg-logo": f"http://logo.example.com/{channel}.png",
+                "group-title": "央视",
+            },
+            "status": "有效" if valid else "无效",
+            "latency": rng.randint(20, 3000) if valid else "-",
+            "speed": f"{rng.uniform(50, 5000):.2f}" if valid else "-",
+            # 每次格式化都得到新的字符串对象，与实际检测结果相同
+            "details": (
+                f"HTTP {200} | H.264 1920x1080"
+                if valid
+                else f"{rng.choice(INVALID_DETAILS)}"
+            ),
+            "codec": f"H.264/{'AAC'}" if valid else "",
+            "resolution": f"{1920}x{1080}" if valid else "",
+            "bitrate": 0,
+            "bytes": 1000,
+            "elapsed": 0.5,
+        }
+
+
+def traced(build):
+    # build() 构建的对象及其占用的内存 (字节)
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="结果存储与导出基准测试")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    rows = args.rows
+
+    results, dict_bytes = traced(lambda: list(generate_results(rows)))
+    del results
+    store, store_bytes = traced(lambda: ResultStore())
+    store_bytes = traced(lambda: [store.add(r) for r in generate_results(rows)])[1]
+    print(
+        f"{rows} 条结果\n"
+        f"  结果字典列表: {dict_bytes / 1e6:.1f} MB ({dict_bytes / rows:.0f} B/条)\n"
+        f"  ResultStore:  {store_bytes / 1e6:.1f} MB ({store_bytes / rows:.0f} B/条)"
+    )
+
+    store = ResultStore()
+    results = list(generate_results(rows))
+    add = timed(lambda: [store.add(r) for r in results])
+    del results
+    substring = timed(store.set_filter, "cctv-1")
+    regex = timed(store.set_filter, r"ch\d+5/", True)
+    store.set_filter("")
+    sort = timed(store.sort_view, "all", "速度(KB/s)")
+    text_sort = timed(store.sort_view, "all", "频道名称")
+    print(
+        f"  写入 {add:.2f}s，筛选 {substring * 1000:.0f}ms (正则 {regex * 1000:.0f}ms)，"
+        f"排序 {sort * 1000:.0f}ms (文本列首次 {text_sort * 1000:.0f}ms)"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for export_format in export.EXPORT_FORMATS:
+            if export_format == "parquet" and not export.PYARROW_AVAILABLE:
+                print("  parquet: 未安装 pyarrow，跳过")
+                continue
+            start = time.perf_counter()
+            paths = export.export_results(store, directory, "bench", export_format)
+            elapsed = time.perf_counter() - start
+            size = sum(os.path.getsize(path) for path in paths)
+            print(f"  导出 {export_format}: {elapsed:.2f}s，{size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
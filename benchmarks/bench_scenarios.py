@@ -0,0 +1,340 @@
+# 场景化基准测试：用本地假源站 (fake_origin.py) 按不同的行为组合生成 1k/10k/100k 条链接，
+# 走完整的检测引擎 (调度、去重、探测) 并模拟界面的结果队列消费，记录:
+#   URLs/秒、单条检测耗时 p50/p99、峰值内存、界面队列延迟 (结果入队到被界面取出) p50/p99/最大值
+#
+# 用法: python benchmarks/bench_scenarios.py --scenarios mixed,dead-heavy --scales 1k,10k \
+#           --json benchmarks/results/$(git rev-parse --short HEAD).json
+#       python benchmarks/bench_scenarios.py --scales 100k --compare 上次结果.json
+# 每次运行在独立子进程中进行，假源站运行在父进程，峰值内存只统计检测进程本身；
+# --processes 多进程分片时另外记录各分片子进程中最大的峰值内存。
+# 结果 JSON 中记录了当前提交，--compare 按 (场景, 规模, 引擎) 与之前保存的结果对比。
+import argparse
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_engines import peak_rss_mb  # noqa: E402
+from benchmarks.fake_origin import FakeOrigin, url_for  # noqa: E402
+
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000}
+# 场景: [(行为, 权重)]，行为的写法见 fake_origin.path_for
+SCENARIOS = {
+    "healthy": [("ts", 1)],
+    "hls": [("hls", 1)],
+    "dead-heavy": [("dead", 7), ("status:404", 2), ("ts", 1)],
+    "mixed": [
+        ("ts", 40),
+        ("hls", 20),
+        ("status:404", 10),
+        ("status:503", 5),
+        ("slow:300", 5),
+        ("dead", 10),
+        ("endless", 4),
+        ("throttle:128", 4),
+        ("html", 2),
+    ],
+}
+# 与 IPTV-Check.py 中 process_queue 的轮询间隔和每轮时间预算一致
+QUEUE_TICK_MS = 100
+QUEUE_DRAIN_BUDGET = 0.04
+
+
+def make_links(scenario, count, bases, dead_bases):
+    # 按权重交错分配行为，相同参数每次生成相同的链接
+    mix = SCENARIOS[scenario]
+    total = sum(weight for _, weight in mix)
+    credits = [0.0] * len(mix)
+    for i in range(count):
+        for k, (_, weight) in enumerate(mix):
+            credits[k] += weight / total
+        k = max(range(len(mix)), key=credits.__getitem__)
+        credits[k] -= 1
+        yield {"name": f"频道{i}", "url": url_for(mix[k][0], i, bases, dead_bases)}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class UiQueueSimulator:
+    # 按界面的方式消费结果：每 QUEUE_TICK_MS 轮询一次，在时间预算内批量写入 ResultStore
+    def __init__(self):
+        from iptv_check.results import ResultStore
+
+        self.queue = queue.Queue()
+        self.store = ResultStore()
+        self.lags = []
+        self.max_depth = 0
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def put(self, result):
+        self.queue.put((time.perf_counter(), result))
+
+    def _loop(self):
+        while True:
+            time.sleep(QUEUE_TICK_MS / 1000)
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+            deadline = time.perf_counter() + QUEUE_DRAIN_BUDGET
+            added = 0
+            try:
+                while True:
+                    queued_at, result = self.queue.get_nowait()
+                    self.store.add(result)
+                    self.lags.append(time.perf_counter() - queued_at)
+                    added += 1
+                    if added % 256 == 0 and time.perf_counter() > deadline:
+                        break
+            except queue.Empty:
+                if self.done.is_set():
+                    return
+
+    def finish(self):
+        self.done.set()
+        self._thread.join()
+
+
+def worker(args):
+    from iptv_check.engine import CheckEngine
+    from iptv_check.sharding import ShardedEngine
+
+    bases = args.bases.split(",")
+    dead_bases = args.dead_bases.split(",")
+    links = make_links(args.scenario, SCALES[args.scale], bases, dead_bases)
+    ui = UiQueueSimulator()
+    elapsed_times = []
+
+    def on_result(result):
+        elapsed_times.append(result["elapsed"])
+        ui.put(result)
+
+    use_async = args.worker == "async"
+    options = dict(
+        timeout=args.timeout,
+        max_workers=args.threads,
+        run_speed_test=args.speed_test,
+        use_async=use_async,
+        async_concurrency=args.concurrency,
+        on_result=on_result,
+        per_host_limit=args.per_host,
+        host_rate=args.host_rate,
+    )
+    if args.processes:
+        engine = ShardedEngine(processes=args.processes, **options)
+    else:
+        engine = CheckEngine(**options)
+    start = time.perf_counter()
+    engine.run(links)
+    elapsed = time.perf_counter() - start
+    ui.finish()
+    store = ui.store
+    print(
+        json.dumps(
+            {
+                "scenario": args.scenario,
+                "scale": args.scale,
+                "engine": args.worker,
+                "links": SCALES[args.scale],
+                "results": len(store),
+                "valid": store.valid_count,
+                "elapsed_s": round(elapsed, 3),
+                "urls_per_s": round(len(store) / elapsed, 1) if elapsed else None,
+                "result_p50_ms": _ms(percentile(elapsed_times, 0.5)),
+                "result_p99_ms": _ms(percentile(elapsed_times, 0.99)),
+                "peak_rss_mb": peak_rss_mb(),
+                "child_peak_rss_mb": child_peak_rss_mb() if args.processes else None,
+                "ui_lag_p50_ms": _ms(percentile(ui.lags, 0.5)),
+                "ui_lag_p99_ms": _ms(percentile(ui.lags, 0.99)),
+                "ui_lag_max_ms": _ms(max(ui.lags, default=None)),
+                "ui_queue_max": ui.max_depth,
+            },
+            ensure_ascii=False,
+        )
+    )
+
+
+def child_peak_rss_mb():
+    # 多进程分片时，已结束的子进程中峰值内存最大的一个
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def compare(runs, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(r["scenario"], r["scale"], r["engine"]): r for r in baseline["runs"]}
+    print(f"对比 {baseline_path} (提交 {str(baseline.get('commit'))[:10]}):")
+    matched = 0
+    for run in runs:
+        before = old.get((run["scenario"], run["scale"], run["engine"]))
+        if before is None:
+            continue
+        matched += 1
+        parts = []
+        for key in ("urls_per_s", "result_p99_ms", "peak_rss_mb", "ui_lag_p99_ms"):
+            if before.get(key) and run.get(key) is not None:
+                change = (run[key] - before[key]) * 100 / before[key]
+                parts.append(f"{key} {before[key]} -> {run[key]} ({change:+.1f}%)")
+        print(
+            f"  {run['scenario']}/{run['scale']}/{run['engine']}: " + "，".join(parts)
+        )
+    if not matched:
+        print("  没有相同场景、规模和引擎的结果")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="假源站场景基准测试")
+    parser.add_argument(
+        "--scenarios", default="mixed", help=f"逗号分隔: {','.join(SCENARIOS)}"
+    )
+    parser.add_argument(
+        "--scales", default="1k,10k", help=f"逗号分隔: {','.join(SCALES)}"
+    )
+    parser.add_argument("--engines", default="thread,async")
+    parser.add_argument("--timeout", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=100, help="线程池线程数")
+    parser.add_argument("--concurrency", type=int, default=2000, help="异步并发数")
+    parser.add_argument("--speed-test", action="store_true")
+    parser.add_argument(
+        "--processes", type=int, default=0, help="多进程分片的子进程数，0 表示不分片"
+    )
+    parser.add_argument(
+        "--origins", type=int, default=32, help="假源站监听的端口数 (即源站数)"
+    )
+    parser.add_argument("--per-host", type=int, default=6, help="单个源站的并发上限")
+    parser.add_argument(
+        "--host-rate",
+        type=float,
+        default=0,
+        help="单个源站每秒检测数上限，默认不限速以测量引擎本身的吞吐",
+    )
+    parser.add_argument("--json", help="将结果写入该 JSON 文件")
+    parser.add_argument("--compare", metavar="JSON", help="与之前保存的结果对比")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--scale", help=argparse.SUPPRESS)
+    parser.add_argument("--bases", help=argparse.SUPPRESS)
+    parser.add_argument("--dead-bases", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    scenarios, scales = args.scenarios.split(","), args.scales.split(",")
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"未知场景: {name}")
+    for name in scales:
+        if name not in SCALES:
+            parser.error(f"未知规模: {name}")
+    origin = FakeOrigin(args.origins)
+    runs = []
+    try:
+        for scenario in scenarios:
+            for scale in scales:
+                for engine in args.engines.split(","):
+                    cmd = [
+                        sys.executable,
+                        os.path.abspath(__file__),
+                        "--worker",
+                        engine,
+                    ]
+                    cmd += ["--scenario", scenario, "--scale", scale]
+                    cmd += ["--bases", ",".join(origin.bases)]
+                    cmd += ["--dead-bases", ",".join(origin.dead_bases)]
+                    cmd += ["--timeout", str(args.timeout)]
+                    cmd += ["--threads", str(args.threads)]
+                    cmd += ["--concurrency", str(args.concurrency)]
+                    cmd += ["--per-host", str(args.per_host)]
+                    cmd += ["--host-rate", str(args.host_rate)]
+                    cmd += ["--processes", str(args.processes)]
+                    if args.speed_test:
+                        cmd.append("--speed-test")
+                    out = subprocess.run(
+                        cmd, capture_output=True, text=True, check=True
+                    )
+                    run = json.loads(out.stdout.strip().splitlines()[-1])
+                    runs.append(run)
+                    print(
+                        f"{scenario}/{scale}/{engine}: {run['results']}/{run['links']} 条，"
+                        f"{run['elapsed_s']}s，{run['urls_per_s']} URLs/s，"
+                        f"检测耗时 p99 {run['result_p99_ms']} ms，"
+                        f"峰值内存 {run['peak_rss_mb']} MB，"
+                        f"界面队列延迟 p99 {run['ui_lag_p99_ms']} ms"
+                    )
+    finally:
+        origin.close()
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            key: getattr(args, key)
+            for key in (
+                "timeout",
+                "threads",
+                "concurrency",
+                "speed_test",
+                "origins",
+                "per_host",
+                "host_rate",
+                "processes",
+            )
+        },
+        "runs": runs,
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(runs, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# 订阅下载基准测试：本地 HTTP 服务器提供生成的大播放列表 (gzip 传输，带 ETag)，
+# 在独立子进程中依次记录:
+#   首次下载 (200): 下载 + 解压 + 解析 + 写入条目缓存的耗时和峰值内存
+#   再次下载 (304): 条件请求的耗时，以及读取缓存条目与重新解析本地文件的耗时对比
+#
+# 用法: python benchmarks/bench_subscription.py --entries 1000000
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_engines import peak_rss_mb  # noqa: E402
+from benchmarks.bench_parser import generate_playlist  # noqa: E402
+
+ETAG = '"bench"'
+
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    gz_path = None
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/x-mpegurl")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(os.path.getsize(self.gz_path)))
+        self.end_headers()
+        with open(self.gz_path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def worker(args):
+    from iptv_check import playlist
+    from iptv_check.subscription import Subscription
+
+    report = {}
+    subscription = Subscription(args.url, args.cache_dir)
+    start = time.perf_counter()
+    subscription.fetch()
+    report["fetch_s"] = round(time.perf_counter() - start, 3)
+    report["entries"] = subscription.entries
+    report["downloaded_kb"] = round(subscription.downloaded / 1024)
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    subscription = Subscription(args.url, args.cache_dir)
+    start = time.perf_counter()
+    subscription.fetch()
+    report["unchanged"] = subscription.unchanged
+    report["refetch_s"] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    count = sum(1 for _ in subscription.iter_entries())
+    report["read_cache_s"] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    assert count == sum(1 for _ in playlist.iter_playlist(args.file))
+    report["reparse_s"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订阅下载基准测试")
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "list.m3u")
+        generate_playlist(path, args.entries, "http://127.0.0.1:9")
+        PlaylistHandler.gz_path = f"{path}.gz"
+        with open(path, "rb") as src, gzip.open(
+            PlaylistHandler.gz_path, "wb", 6
+        ) as dst:
+            shutil.copyfileobj(src, dst)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        server = ThreadingHTTPServer(("127.0.0.1", 0), PlaylistHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker"]
+            cmd += ["--url", f"http://127.0.0.1:{server.server_address[1]}/list.m3u"]
+            cmd += ["--file", path, "--cache-dir", os.path.join(directory, "cache")]
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        finally:
+            server.shutdown()
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+    print(
+        f"{report['entries']} 条 ({size_mb:.0f} MB，gzip 传输 {report['downloaded_kb']} KB)\n"
+        f"  首次下载并解析: {report['fetch_s']}s，峰值内存 {report['peak_rss_mb']} MB\n"
+        f"  再次下载: {'304 未变化' if report['unchanged'] else '重新下载'}，"
+        f"{report['refetch_s']}s\n"
+        f"  读取条目缓存 {report['read_cache_s']}s，重新解析播放列表 {report['reparse_s']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# 断点续检与增量检测同时使用时的回归检查：
+#   第 1 次运行: 完整检测，保存增量状态
+#   第 2 次运行: 增量检测 (多数条目沿用上次结论，另有新增条目需要检测)，中途停止，保留断点日志
+#   第 3 次运行: 从断点日志续检并完整结束，保存增量状态
+# 检查第 3 次保存的状态：中断前沿用的条目保持第 1 次的记录 (检测时间不变、信息中没有 “[沿用]”)，
+# 中断前和续检时实际检测的条目都有记录；变更报告中只有新增的条目。
+#
+# 用法: python benchmarks/check_resume_diff.py
+# 检查不通过时退出码为 1。
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_origin import FakeOrigin, url_for  # noqa: E402
+from iptv_check.checkpoint import Checkpoint, replay  # noqa: E402
+from iptv_check.diff import CARRIED_MARK, STATE_FIELDS, DiffState  # noqa: E402
+from iptv_check.diff import entry_key  # noqa: E402
+from iptv_check.engine import CheckEngine  # noqa: E402
+
+DAY = 24 * 3600
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1e9
+
+    def __call__(self):
+        return self.now
+
+
+def make_links(count, new, bases, dead_bases):
+    # 第 2 次运行的条目：每隔几条是一条新增条目，中断时已推送的结果中既有沿用的也有实际检测的
+    links = []
+    for i in range(count + new):
+        behaviour = "status:404" if i % 5 == 0 else "ts"
+        prefix = "新频道" if i % 3 == 1 and i // 3 < new else "频道"
+        links.append(
+            {"name": f"{prefix}{i}", "url": url_for(behaviour, i, bases, dead_bases)}
+        )
+    return links
+
+
+def run(links, diff, checkpoint=None, stop_after=None):
+    # stop_after: 收到这么多条实际检测 (非沿用) 的结果后停止
+    results = []
+    engine = None
+
+    def on_result(result):
+        results.append(result)
+        probed = [r for r in results if not r["details"].endswith(CARRIED_MARK)]
+        if stop_after is not None and len(probed) >= stop_after:
+            engine.stop()
+
+    engine = CheckEngine(
+        timeout=2,
+        max_workers=4,
+        run_speed_test=False,
+        per_host_limit=0,
+        host_rate=0,
+        checkpoint=checkpoint,
+        diff=diff,
+        on_result=on_result,
+    )
+    engine.run(links)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="断点续检 + 增量检测回归检查")
+    parser.add_argument("--entries", type=int, default=60)
+    parser.add_argument("--new", type=int, default=12, help="第 2 次运行新增的条目数")
+    args = parser.parse_args()
+
+    origin = FakeOrigin(1)
+    clock = Clock()
+    problems = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            state = os.path.join(directory, "state.json")
+            journal = os.path.join(directory, "run.journal")
+            links = make_links(args.entries, args.new, origin.bases, origin.dead_bases)
+            old = [link for link in links if not link["name"].startswith("新")]
+
+            def diff_state():
+                # 不抽查、不到复查时间：上次有结论的条目全部沿用
+                return DiffState(
+                    state,
+                    valid_recheck=30 * DAY,
+                    sample_ratio=0,
+                    invalid_backoff=30 * DAY,
+                    clock=clock,
+                )
+
+            diff = diff_state()
+            run(old, diff)
+            diff.save()
+            first = diff.current
+
+            clock.now += DAY
+            checkpoint = Checkpoint(journal)
+            partial = run(links, diff_state(), checkpoint, stop_after=args.new // 2)
+            checkpoint.close()
+            carried = sum(r["details"].endswith(CARRIED_MARK) for r in partial)
+            probed = len(partial) - carried
+
+            clock.now += DAY
+            checkpoint = Checkpoint(journal, replay(journal))
+            diff = diff_state()
+            run(links, diff, checkpoint)
+            checkpoint.discard()
+            diff.save()
+            with open(state, encoding="utf-8") as f:
+                saved = json.load(f)["entries"]
+            report = diff.report()
+
+            checked_at = len(STATE_FIELDS) + 1
+            for link in links:
+                key = entry_key(link["name"], link["url"])
+                record = saved.get(key)
+                if record is None:
+                    problems.append(f"{link['name']}: 状态中没有记录")
+                    continue
+                if record[len(STATE_FIELDS)].endswith(CARRIED_MARK):
+                    problems.append(f"{link['name']}: 信息中保留了 “[沿用]”")
+                if key in first and record[checked_at] != first[key][checked_at]:
+                    problems.append(f"{link['name']}: 沿用的结论检测时间被改写")
+            added = {name for name, _ in report["added"]}
+            expected = {link["name"] for link in links if link["name"].startswith("新")}
+            if added != expected:
+                problems.append(f"新增条目不符: {sorted(added ^ expected)}")
+            for section in ("newly_dead", "newly_alive", "removed"):
+                if report[section]:
+                    problems.append(f"变更报告 {section} 不应有条目: {report[section]}")
+    finally:
+        origin.close()
+
+    print(
+        f"{len(links)} 个条目，中断前推送 {len(partial)} 条"
+        f" (沿用 {carried}，检测 {probed})，断点续检还原 {checkpoint.restored} 条"
+    )
+    for problem in problems[:20]:
+        print(f"  {problem}")
+    print("通过" if not problems else f"未通过: {len(problems)} 处问题")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
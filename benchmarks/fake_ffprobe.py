@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# 模拟 ffprobe 的命令行，用于在没有安装 ffmpeg 的环境中测试 ffprobe 验证阶段。
+#
+# 用法: python -m iptv_check.cli list.m3u --ffprobe --ffprobe-path "python benchmarks/fake_ffprobe.py"
+# 按 URL 决定输出：含 "hang" 时一直不退出 (测试超时和停止)，含 "nodecode" 时视频解码帧数为 0，
+# 含 "dead" 或 "404" 时以错误退出，其余输出 H.264/AAC 1920x1080。
+# 环境变量 FAKE_FFPROBE_DELAY 为每次调用的额外耗时 (秒)。
+import json
+import os
+import sys
+import time
+
+
+def main(argv):
+    url = argv[-1] if argv else ""
+    time.sleep(float(os.environ.get("FAKE_FFPROBE_DELAY", "0")))
+    if "hang" in url:
+        time.sleep(3600)
+    if "dead" in url or "404" in url:
+        print(f"{url}: Server returned 404 Not Found", file=sys.stderr)
+        return 1
+    frames = "0" if "nodecode" in url else "50"
+    output = {
+        "streams": [
+            {
+                "index": 0,
+                "codec_name": "h264",
+                "codec_type": "video",
+                "width": 1920,
+                "height": 1080,
+                "nb_read_frames": frames,
+            },
+            {"index": 1, "codec_name": "aac", "codec_type": "audio"},
+        ],
+        "format": {"format_name": "mpegts", "bit_rate": "4500000"},
+    }
+    print(json.dumps(output, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,158 @@
+# 可按路径配置行为的本地假直播源站，供 bench_scenarios.py 使用。
+# 行为写在路径里，服务器本身无状态，任意数量的链接都不占额外内存:
+#   /ts/<id>.ts                 正常 TS 数据 (约 64 KB)
+#   /slow/<毫秒>/<id>.ts        延迟指定时间后才返回响应头 (首字节慢)
+#   /status/<状态码>/<id>.ts     返回指定状态码，如 404、503
+#   /endless/<id>.ts            没有 Content-Length、永不结束的 TS 数据流
+#   /throttle/<KB/s>/<id>.ts    按指定带宽持续发送 TS 数据 (模拟直播流)
+#   /stall/<毫秒>/<id>.ts       以 256 KB/s 持续发送，每发送 1 秒暂停指定时间 (播放卡顿)
+#   /html/<id>.ts               返回网页 (如运营商的登录页)
+#   /flaky/<百分比>/<id>.ts      按指定概率返回 502，否则返回正常 TS 数据 (时好时坏的源)
+#   /hls/<id>/master.m3u8       主播放列表 -> 两个码率的媒体列表 -> 各 3 个 TS 分片
+# 源站可以监听多个端口，检测引擎按 “主机:端口” 调度，多个端口相当于多个源站；
+# 每个源站另有一个只接受连接、从不回复的 “黑洞” 端口，模拟分散在各处的死链超时。
+# OriginHandler.arrivals 设为列表时记录每个请求到达的时间 (time.monotonic())。
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from benchmarks.stub_server import (
+    SEGMENT_BODY,
+    TS_PAYLOAD,
+    BlackHoleServer,
+    StubHTTPServer,
+)
+
+STREAM_CHUNK = TS_PAYLOAD * 44  # 约 8 KB
+STALL_RATE = 256 * 1024
+HLS_VARIANTS = (800000, 3000000)
+HLS_SEGMENTS = 3
+HTML_BODY = b"<!DOCTYPE html><html><body>login</body></html>"
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    arrivals = None
+
+    def do_GET(self):
+        if self.arrivals is not None:
+            self.arrivals.append(time.monotonic())
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        kind = parts[0]
+        try:
+            if kind == "ts":
+                self._send(200, "video/mp2t", SEGMENT_BODY)
+            elif kind == "slow":
+                time.sleep(int(parts[1]) / 1000)
+                self._send(200, "video/mp2t", SEGMENT_BODY)
+            elif kind == "status":
+                self._send(int(parts[1]), "text/plain", b"error")
+            elif kind == "endless":
+                self._stream(0)
+            elif kind == "throttle":
+                self._stream(int(parts[1]) * 1024)
+            elif kind == "stall":
+                self._stream(STALL_RATE, int(parts[1]) / 1000)
+            elif kind == "flaky":
+                if random.random() * 100 < int(parts[1]):
+                    self._send(502, "text/plain", b"bad gateway")
+                else:
+                    self._send(200, "video/mp2t", SEGMENT_BODY)
+            elif kind == "html":
+                self._send(200, "text/html; charset=utf-8", HTML_BODY)
+            elif kind == "hls":
+                self._hls(parts[1], parts[2:])
+            else:
+                self._send(404, "text/plain", b"not found")
+        except (ValueError, IndexError):
+            self._send(400, "text/plain", b"bad path")
+
+    def _hls(self, name, rest):
+        if rest == ["master.m3u8"]:
+            body = "#EXTM3U\n" + "".join(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={bw}\n/hls/{name}/{bw}/index.m3u8\n"
+                for bw in HLS_VARIANTS
+            )
+            self._send(200, "application/vnd.apple.mpegurl", body.encode())
+        elif len(rest) == 2 and rest[1] == "index.m3u8":
+            # 直播列表：没有 EXT-X-ENDLIST，序号随时间推进
+            sequence = int(time.time() // 2)
+            body = f"#EXTM3U\n#EXT-X-MEDIA-SEQUENCE:{sequence}\n" + "".join(
+                f"#EXTINF:2.0,\n{sequence + i}.ts\n" for i in range(HLS_SEGMENTS)
+            )
+            self._send(200, "application/vnd.apple.mpegurl", body.encode())
+        elif len(rest) == 2 and rest[1].endswith(".ts"):
+            self._send(200, "video/mp2t", SEGMENT_BODY)
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _stream(self, rate, pause=0):
+        # 没有 Content-Length，一直发送直到客户端断开；rate 为每秒字节数，0 表示不限速，
+        # pause 大于 0 时每发送 1 秒的数据暂停 pause 秒
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp2t")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        sent, start = 0, time.monotonic()
+        try:
+            while True:
+                self.wfile.write(STREAM_CHUNK)
+                sent += len(STREAM_CHUNK)
+                if pause and sent % rate < len(STREAM_CHUNK):
+                    self.wfile.flush()
+                    time.sleep(pause)
+                    start += pause
+                if rate:
+                    ahead = sent / rate - (time.monotonic() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except OSError:  # 客户端读够数据后断开
+            pass
+
+    def _send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOrigin:
+    def __init__(self, origins=1, host="127.0.0.1"):
+        self.servers = []
+        for _ in range(max(1, origins)):
+            server = StubHTTPServer((host, 0), OriginHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        self.bases = [f"http://{host}:{s.server_address[1]}" for s in self.servers]
+        self.black_holes = [BlackHoleServer(host) for _ in self.servers]
+        self.dead_bases = [f"http://{host}:{b.port}" for b in self.black_holes]
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        for black_hole in self.black_holes:
+            black_hole.close()
+
+
+def path_for(behaviour, index):
+    # behaviour 如 "ts"、"slow:300"、"status:503"、"throttle:128"、"stall:1500"、
+    # "flaky:30"、"hls"、"dead" (黑洞)
+    kind, _, param = behaviour.partition(":")
+    if kind == "hls":
+        return f"/hls/{index}/master.m3u8"
+    if param:
+        return f"/{kind}/{param}/{index}.ts"
+    return f"/{kind}/{index}.ts"
+
+
+def url_for(behaviour, index, bases, dead_bases):
+    if behaviour == "dead":
+        return f"{dead_bases[index % len(dead_bases)]}/dead/{index}.ts"
+    return bases[index % len(bases)] + path_for(behaviour, index)
@@ -0,0 +1,194 @@
+# 基准测试用的本地桩服务器：一个普通 HTTP 源 + 一个“黑洞”端口（只接受连接不回复，模拟死链超时）
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TS_PAYLOAD = b"\x47" + b"\x00" * 187
+SEGMENT_BODY = TS_PAYLOAD * 350  # 约 64 KB
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/master/") and path.endswith(".m3u8"):
+            # 主播放列表：高/低两个码率的变体
+            name = path[len("/master/") : -len(".m3u8")]
+            body = (
+                "#EXTM3U\n"
+                f"#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360\n"
+                f"/live/{name}_low.m3u8\n"
+                f"#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080\n"
+                f"/live/{name}_high.m3u8\n"
+            ).encode()
+            self._send(200, "application/vnd.apple.mpegurl", body)
+        elif path.startswith("/live/") and path.endswith(".m3u8"):
+            name = path[len("/live/") : -len(".m3u8")]
+            body = f"#EXTM3U\n#EXTINF:10,\n{name}.ts\n".encode()
+            self._send(200, "application/vnd.apple.mpegurl", body)
+        elif path.startswith("/live/"):
+            self._send(200, "video/mp2t", SEGMENT_BODY)
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 4096
+
+    def handle_error(self, request, client_address):
+        pass  # 客户端断开长连接时的 ConnectionResetError 无需输出
+
+
+class BlackHoleServer:
+    def __init__(self, host="127.0.0.1"):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, 0))
+        self.sock.listen(4096)
+        self.port = self.sock.getsockname()[1]
+        self._held = []
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self._held.append(conn)  # 持有连接但从不回复
+
+    def close(self):
+        self.sock.close()
+        for conn in self._held:
+            conn.close()
+
+
+class StreamProtocolStub:
+    # 非 HTTP 协议桩: /live/ 路径的 RTSP DESCRIBE 返回 SDP，其余 404；RTMP 端口完成 S0+S1+S2 握手
+    SDP = b"v=0\r\ns=stub\r\nm=video 0 RTP/AVP 96\r\n"
+
+    def __init__(self, host="127.0.0.1"):
+        self.rtsp = self._listen(host, self._serve_rtsp)
+        self.rtmp = self._listen(host, self._serve_rtmp)
+        self.rtsp_base = f"rtsp://{host}:{self.rtsp.getsockname()[1]}"
+        self.rtmp_base = f"rtmp://{host}:{self.rtmp.getsockname()[1]}"
+
+    def _listen(self, host, handler):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, 0))
+        sock.listen(1024)
+
+        def accept_loop():
+            while True:
+                try:
+                    conn, _ = sock.accept()
+                except OSError:
+                    return
+                threading.Thread(target=handler, args=(conn,), daemon=True).start()
+
+        threading.Thread(target=accept_loop, daemon=True).start()
+        return sock
+
+    def _serve_rtsp(self, conn):
+        with conn, conn.makefile("rb") as f:
+            while True:
+                lines = []
+                while True:
+                    line = f.readline()
+                    if not line:
+                        return
+                    if line in (b"\r\n", b"\n"):
+                        break
+                    lines.append(line.decode("latin-1").strip())
+                method, url = lines[0].split(" ")[:2]
+                cseq = next(
+                    (l.split(":", 1)[1].strip() for l in lines if l.startswith("CSeq")),
+                    "0",
+                )
+                if method == "OPTIONS":
+                    head, body = "200 OK\r\nPublic: OPTIONS, DESCRIBE", b""
+                elif "/live/" in url:
+                    head = "200 OK\r\nContent-Type: application/sdp"
+                    body = self.SDP
+                else:
+                    head, body = "404 Not Found", b""
+                conn.sendall(
+                    f"RTSP/1.0 {head}\r\nCSeq: {cseq}\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+
+    def _serve_rtmp(self, conn):
+        with conn:
+            try:
+                c0c1 = b""
+                while len(c0c1) < 1537:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        return
+                    c0c1 += chunk
+                conn.sendall(b"\x03" + bytes(1536) + c0c1[1:1537])
+                conn.recv(4096)
+            except OSError:
+                pass
+
+    def close(self):
+        self.rtsp.close()
+        self.rtmp.close()
+
+
+def start_multicast_sender(group, port, iface="127.0.0.1", interval=0.05):
+    # 在 iface (默认回环) 上持续发送 RTP 包，供组播探测使用；返回停止用的 Event
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(iface))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    stop = threading.Event()
+    packet = b"\x80\x21" + bytes(10) + TS_PAYLOAD * 7  # RTP 头 + 7 个 TS 包
+
+    def send_loop():
+        while not stop.wait(interval):
+            try:
+                sock.sendto(packet, (group, port))
+            except OSError:
+                pass
+        sock.close()
+
+    threading.Thread(target=send_loop, daemon=True).start()
+    return stop
+
+
+def start_stub(host="127.0.0.1"):
+    server = StubHTTPServer((host, 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    black_hole = BlackHoleServer(host)
+    live_base = f"http://{host}:{server.server_address[1]}"
+    dead_base = f"http://{host}:{black_hole.port}"
+    return server, black_hole, live_base, dead_base
+
+
+def make_links(count, dead_ratio, live_base, dead_base):
+    # 按比例交错生成有效/死链，其中一半有效链接为 m3u8
+    links, acc, live = [], 0.0, 0
+    for i in range(count):
+        acc += dead_ratio
+        if acc >= 1:
+            acc -= 1
+            url = f"{dead_base}/dead/{i}.ts"
+        else:
+            live += 1
+            ext = "m3u8" if live % 2 else "ts"
+            url = f"{live_base}/live/{i}.{ext}"
+        links.append({"name": f"频道{i}", "url": url})
+    return links
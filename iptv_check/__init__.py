@@ -0,0 +1 @@
+# IPTV-Check 检测核心，不依赖 tkinter，供 GUI、命令行 (python -m iptv_check) 和基准测试共用
@@ -0,0 +1,10 @@
+import gc
+import sys
+
+from .cli import main
+
+code = main()
+# 退出时解释器会把已加载的全部对象再遍历回收一遍 (检测上千个源之后要一百毫秒左右)，
+# 冻结后直接退出，Ctrl+C 之后不再额外等待
+gc.freeze()
+sys.exit(code)
@@ -0,0 +1,532 @@
+import asyncio
+import itertools
+import logging
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import hls, protocols, throughput
+from .metrics import add_timing
+from .probe import (
+    RANGE_HEADERS,
+    RANGE_PROBE_BYTES,
+    StreamRead,
+    add_ttfb,
+    create_result,
+    hls_verdict,
+    is_m3u8,
+    mark_valid,
+    ok_details,
+)
+from .scheduler import DEFAULT_WINDOW, HostScheduler
+from .session import HEADERS, ConnectionStats
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp 为可选依赖，未安装时只能使用线程池引擎
+    aiohttp = None
+
+AIOHTTP_AVAILABLE = aiohttp is not None
+DEFAULT_CONCURRENCY = 500
+# 每次在线程池中从解析器取出的条目数：解析、缓存查询和预解析 DNS 都不占用事件循环
+FETCH_BATCH = 256
+
+logger = logging.getLogger(__name__)
+
+
+if AIOHTTP_AVAILABLE:
+
+    class CachedResolver(aiohttp.abc.AbstractResolver):
+        # 让 aiohttp 使用共享的 DnsCache，与预解析阶段共用解析结果
+        def __init__(self, dns_cache):
+            self.dns_cache = dns_cache
+            self._fallback = aiohttp.ThreadedResolver()
+
+        async def resolve(self, host, port=0, family=socket.AF_UNSPEC):
+            addresses = self.dns_cache.cached(host)
+            if addresses is False:
+                addresses = await asyncio.wrap_future(self.dns_cache.submit(host))
+            if addresses is False:
+                # 暂时性解析错误没有缓存，与未使用缓存时一样现场解析
+                return await self._fallback.resolve(host, port, family)
+            if not addresses:
+                raise OSError(f"DNS解析失败: {host}")
+            results = []
+            for address in addresses:
+                addr_family = socket.AF_INET6 if ":" in address else socket.AF_INET
+                if family in (socket.AF_UNSPEC, addr_family):
+                    results.append(
+                        {
+                            "hostname": host,
+                            "host": address,
+                            "port": port,
+                            "family": addr_family,
+                            "proto": 0,
+                            "flags": socket.AI_NUMERICHOST,
+                        }
+                    )
+            if not results:
+                raise OSError(f"DNS解析失败: {host}")
+            return results
+
+        async def close(self):
+            await self._fallback.close()
+
+
+# 在单个事件循环中同时保持成千上万个检测请求，由主机调度器限制总并发和每主机并发
+class AsyncChecker:
+    def __init__(
+        self,
+        timeout,
+        run_speed_test,
+        concurrency=DEFAULT_CONCURRENCY,
+        on_result=None,
+        limit_per_host=0,
+        scheduler=None,
+        dns_cache=None,
+        hls_policy=hls.DEFAULT_POLICY,
+        hls_samples=hls.DEFAULT_SAMPLES,
+        hls_budget=hls.DEFAULT_BYTE_BUDGET,
+        udpxy=None,
+        multicast_iface="0.0.0.0",
+        sustain_seconds=0,
+        stall_threshold=throughput.DEFAULT_STALL_THRESHOLD,
+        bandwidth=None,
+        skip=None,
+    ):
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("异步引擎需要安装 aiohttp: pip install aiohttp")
+        self.timeout = timeout
+        self.run_speed_test = run_speed_test
+        self.concurrency = max(1, int(concurrency))
+        self.on_result = on_result
+        self.limit_per_host = limit_per_host
+        # 未指定调度器时只限制总并发，不限制单个主机的并发和速率
+        self.scheduler = scheduler or HostScheduler(
+            self.concurrency, per_host_limit=0, rate=0
+        )
+        self.dns_cache = dns_cache
+        self.hls_policy, self.hls_samples = hls_policy, hls_samples
+        self.hls_budget = hls_budget
+        self.udpxy, self.multicast_iface = udpxy, multicast_iface
+        # 持续播放测速的时长 (0 为突发测速) 和卡顿阈值，以及共用的带宽预算
+        self.sustain_seconds, self.stall_threshold = sustain_seconds, stall_threshold
+        self.bandwidth = bandwidth
+        # 单个 HTTP 检测的总时长上限：aiohttp 的 sock_read 只限制两次读取之间的间隔，
+        # 逐字节慢慢发送响应头或数据的源站仍可无限期占用一个并发名额。每个请求 (主列表、
+        # 子列表、每个抽样分片) 最多 timeout 秒，另加持续测速的时长
+        requests = 3 + (hls_samples if run_speed_test else 0)
+        self.deadline = timeout * requests + (sustain_seconds if run_speed_test else 0)
+        # skip(index, link_info) 返回 True 时该条目已由调用方处理，不再检测
+        self.skip = skip
+        self.stats = ConnectionStats()
+        self.stop_requested = False
+        self._check = self.check_url_deep
+        self._loop = None
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+    def run(self, items, quick=False):
+        # items 为 (原始序号, 链接信息) 序列；阻塞运行，直到全部检测完成或被 stop() 中断。
+        # quick 为 True 时使用快速检测 (HEAD / Range GET)
+        self._check = self.check_url_simple if quick else self.check_url_deep
+        asyncio.run(self._run(items))
+
+    def stop(self):
+        # 可在任意线程调用，取消所有正在进行的检测
+        self.stop_requested = True
+        with self._lock:
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:  # 事件循环已结束
+                pass
+
+    def _trace_config(self):
+        # 通过 aiohttp 的追踪钩子统计连接复用和新建连接的耗时 (TCP 与 TLS 无法分开)，
+        # 结果写入每个请求的 trace_request_ctx
+        async def on_create_start(session, ctx, params):
+            ctx.connect_start = time.perf_counter()
+
+        async def on_create(session, ctx, params):
+            self._record_connection(ctx, False)
+            request_ctx = ctx.trace_request_ctx
+            if isinstance(request_ctx, dict) and "timings" in request_ctx:
+                add_timing(
+                    request_ctx["timings"],
+                    "connect",
+                    time.perf_counter() - ctx.connect_start,
+                )
+
+        async def on_reuse(session, ctx, params):
+            self._record_connection(ctx, True)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(on_create_start)
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    def _record_connection(self, ctx, reused):
+        request_ctx = ctx.trace_request_ctx
+        if isinstance(request_ctx, dict):
+            request_ctx["reused"] = reused
+            self.stats.record_connection(request_ctx.get("host", ""), reused)
+
+    def _cancel_tasks(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _run(self, items):
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+        resolver = {}
+        if self.dns_cache is not None:
+            resolver = {
+                "resolver": CachedResolver(self.dns_cache),
+                "use_dns_cache": False,
+            }
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=30,
+            **resolver,
+        )
+        client_timeout = aiohttp.ClientTimeout(
+            sock_connect=self.timeout, sock_read=self.timeout
+        )
+        try:
+            async with aiohttp.ClientSession(
+                connector=connector,
+                timeout=client_timeout,
+                headers=HEADERS,
+                trace_configs=[self._trace_config()],
+            ) as session:
+                try:
+                    await self._dispatch(session, iter(items))
+                except asyncio.CancelledError:
+                    # Ctrl+C 时 asyncio.run 取消的是本协程：先取消正在进行的检测再关闭会话，
+                    # 否则各检测要先处理连接被关闭的错误，之后才被 asyncio.run 取消
+                    self.stop_requested = True
+                    self._cancel_tasks()
+                    if self._tasks:
+                        await asyncio.gather(*self._tasks, return_exceptions=True)
+                    raise
+                if self._tasks:
+                    await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            with self._lock:
+                self._loop = None
+
+    async def _dispatch(self, session, items):
+        # 由调度器决定下一个开始检测的条目；只有调度器放行时才创建任务，
+        # 内存中的任务数不超过并发上限
+        scheduler = self.scheduler
+        wakeup = asyncio.Event()  # 有检测结束或有新条目进入调度器
+        space = asyncio.Event()  # 调度器中的待检条目已低于预读窗口
+        feeder = asyncio.create_task(self._feed(items, wakeup, space))
+        try:
+            while not self.stop_requested:
+                task = scheduler.take()
+                if task is None:
+                    if feeder.done() and scheduler.pending == 0:
+                        feeder.result()  # 解析器出错时在此抛出
+                        return
+                    wakeup.clear()
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), scheduler.delay())
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if scheduler.pending <= DEFAULT_WINDOW - FETCH_BATCH:
+                    space.set()
+                host, (index, link_info) = task
+                task = asyncio.create_task(
+                    self._guarded_check(session, wakeup, host, index, link_info)
+                )
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            feeder.cancel()
+
+    async def _feed(self, items, wakeup, space):
+        # 在线程池中分批读取解析器，预读至多 DEFAULT_WINDOW 条交给调度器
+        loop = asyncio.get_running_loop()
+        scheduler = self.scheduler
+        while not self.stop_requested:
+            if scheduler.pending > DEFAULT_WINDOW - FETCH_BATCH:
+                space.clear()
+                await space.wait()
+                continue
+            batch = await loop.run_in_executor(None, _next_batch, items, FETCH_BATCH)
+            for entry in batch:
+                scheduler.add(entry[1]["url"], entry)
+            wakeup.set()
+            if len(batch) < FETCH_BATCH:
+                return
+
+    async def _guarded_check(self, session, wakeup, host, index, link_info):
+        result = {}
+        try:
+            if self.skip is not None and self.skip(index, link_info):
+                return
+            try:
+                result = await self._probe(session, index, link_info)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # 各检测函数已处理预期的错误，到这里的是程序错误：记录下来，结果计为无效
+                logger.exception("检测出错: %s", link_info["url"])
+                result = create_result(index, link_info)
+                result["details"] = "未知解析错误"
+            if not self.stop_requested and self.on_result is not None:
+                try:
+                    self.on_result(result)
+                except Exception:
+                    logger.exception("处理检测结果出错: %s", link_info["url"])
+        finally:
+            self.scheduler.release(host, result)
+            wakeup.set()
+
+    async def _probe(self, session, index, link_info):
+        # 按协议分发：udpxy 改写后的地址和 HTTP 源走 aiohttp，RTSP/RTMP/组播用原生探测
+        url = link_info["url"]
+        proxied = protocols.udpxy_url(url, self.udpxy)
+        if proxied:
+            result = await self._check(session, index, dict(link_info, url=proxied))
+            result["url"] = url
+            return result
+        if protocols.is_native(url):
+            return await protocols.check_native(
+                index,
+                link_info,
+                self.timeout,
+                self.dns_cache,
+                multicast_iface=self.multicast_iface,
+            )
+        return await self._check(session, index, link_info)
+
+    async def _analyze_hls(self, session, url, text, timings, budget):
+        # 异步传输层，抽样规则见 hls.walk；不测速时只验证能取到分片数据
+        samples = self.hls_samples if self.run_speed_test else 0
+        report = hls.HlsReport(self.hls_budget)
+        steps = hls.walk(url, text, report, self.hls_policy, samples)
+        chunk_size = hls.CHUNK_SIZE
+        if budget is not None:
+            chunk_size = budget.chunk_size(chunk_size)
+        while True:
+            try:
+                kind, target, read = next(steps)
+            except StopIteration:
+                return report
+            info = {"host": urlsplit(target).hostname or "", "timings": timings}
+            async with session.get(target, trace_request_ctx=info) as r:
+                r.raise_for_status()
+                if kind == hls.PLAYLIST:
+                    await self._read_playlist(r, read)
+                    if budget is not None:
+                        await budget.throttle_async(read.size)
+                    continue
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    done = read.feed(chunk)
+                    if budget is not None:
+                        await budget.throttle_async(len(chunk))
+                    if done:
+                        break
+                read.content_type = r.headers.get("Content-Type", "")
+                read.content_length = r.content_length or 0
+
+    async def _read_playlist(self, response, read):
+        # 异步传输层按 hls.PlaylistRead 读取整个列表，返回文本
+        async for chunk in response.content.iter_chunked(hls.CHUNK_SIZE):
+            read.feed(chunk)
+        return read.text()
+
+    async def _read_stream(self, response, read, budget):
+        # 异步传输层，判定规则见 probe.StreamRead。持续测速时到测速截止即关闭连接，
+        # 阻塞中的读取随之结束 (截止前的等待计为卡顿)。不对每次读取套 wait_for：
+        # 读取完成与任务取消同时发生时 wait_for 会吞掉取消，停止检测要等到测速结束
+        chunk_size = read.chunk_size
+        if budget is not None:
+            chunk_size = budget.chunk_size(chunk_size)
+        remaining = read.remaining()
+        deadline = None
+        if remaining is not None:
+            deadline = asyncio.get_running_loop().call_later(remaining, response.close)
+        try:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                done = read.feed(chunk)
+                if budget is not None:
+                    read.pause(await budget.throttle_async(len(chunk)))
+                if done:
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if not self.run_speed_test:
+                raise
+            read.fail()
+        finally:
+            if deadline is not None:
+                deadline.cancel()
+
+    async def check_url_deep(self, session, index, link_info):
+        # 测速时先等待带宽预算，等待时间不计入延迟和检测耗时
+        budget = self.bandwidth if self.run_speed_test else None
+        if budget is None:
+            return await self._bounded(
+                self._check_url_deep(session, index, link_info, None), index, link_info
+            )
+        if not await budget.acquire_async():
+            result = create_result(index, link_info)
+            result["details"] = "检测已停止"
+            return result
+        result = None
+        try:
+            result = await self._bounded(
+                self._check_url_deep(session, index, link_info, budget),
+                index,
+                link_info,
+            )
+        finally:
+            rate = None
+            if result is not None and result["bytes"]:
+                rate = result["bytes"] / result["elapsed"]
+            budget.release(rate)
+        return result
+
+    async def _bounded(self, check, index, link_info):
+        # 在 deadline 内完成检测，否则取消并计为超时
+        start_time = time.time()
+        try:
+            return await asyncio.wait_for(check, self.deadline)
+        except asyncio.TimeoutError:
+            result = create_result(index, link_info)
+            result["details"] = f"超时 (总时长>{self.deadline:g}s)"
+            result["elapsed"] = time.time() - start_time
+            return result
+
+    async def _check_url_deep(self, session, index, link_info, budget):
+        # 与 probe.check_url_deep 保持相同的判定规则和错误信息
+        result = create_result(index, link_info)
+        base_url = link_info["url"]
+        timings = result["timings"] = {}
+        start_time = time.time()
+        conn_info = {
+            "host": urlsplit(base_url).hostname or "",
+            "reused": False,
+            "timings": timings,
+        }
+        try:
+            async with session.get(base_url, trace_request_ctx=conn_info) as r:
+                r.raise_for_status()
+                latency = int((time.time() - start_time) * 1000)
+                self.stats.record_latency(conn_info["reused"], latency)
+                add_ttfb(timings, latency)
+                content_type = r.headers.get("Content-Type", "")
+                if is_m3u8(base_url, content_type):
+                    report = await self._analyze_hls(
+                        session,
+                        base_url,
+                        await self._read_playlist(r, hls.PlaylistRead(self.hls_budget)),
+                        timings,
+                        budget,
+                    )
+                    speed, extra_details = hls_verdict(
+                        result, report, self.run_speed_test
+                    )
+                else:
+                    read = StreamRead(
+                        self.run_speed_test,
+                        self.timeout,
+                        self.sustain_seconds,
+                        self.stall_threshold,
+                    )
+                    await self._read_stream(r, read, budget)
+                    speed, extra_details = read.finish(result, content_type)
+                status_code = r.status
+            mark_valid(
+                result,
+                latency,
+                speed,
+                ok_details(status_code, conn_info["reused"]) + extra_details,
+            )
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            result["details"] = f"超时 (>{self.timeout}s)"
+        except aiohttp.ClientResponseError as e:
+            result["details"] = f"HTTP错误: {e.status}"
+        except aiohttp.ClientError:
+            result["details"] = "连接错误"
+        except ValueError as e:
+            result["details"] = str(e)
+        except Exception:
+            result["details"] = "未知解析错误"
+        result["elapsed"] = time.time() - start_time
+        return result
+
+    async def check_url_simple(self, session, index, link_info):
+        return await self._bounded(
+            self._check_url_simple(session, index, link_info), index, link_info
+        )
+
+    async def _check_url_simple(self, session, index, link_info):
+        # 与 probe.check_url_simple 保持相同的判定规则和错误信息
+        result = create_result(index, link_info)
+        url = link_info["url"]
+        timings = result["timings"] = {}
+        start_time = time.time()
+        conn_info = {
+            "host": urlsplit(url).hostname or "",
+            "reused": False,
+            "timings": timings,
+        }
+        try:
+            try:
+                async with session.head(
+                    url, allow_redirects=True, trace_request_ctx=conn_info
+                ) as r:
+                    r.raise_for_status()
+                method = "HEAD"
+            except aiohttp.ClientResponseError:
+                conn_info["reused"] = False
+                async with session.get(
+                    url, headers=RANGE_HEADERS, trace_request_ctx=conn_info
+                ) as r:
+                    r.raise_for_status()
+                    # 服务器忽略 Range 时返回完整数据流，同样只取第一块
+                    chunk = await r.content.read(RANGE_PROBE_BYTES)
+                    if not chunk:
+                        raise ValueError("无数据流")
+                    result["bytes"] = len(chunk)
+                method = "Range"
+            latency = int((time.time() - start_time) * 1000)
+            self.stats.record_latency(conn_info["reused"], latency)
+            add_ttfb(timings, latency)
+            details = ok_details(r.status, conn_info["reused"])
+            result.update(
+                {
+                    "status": "有效",
+                    "latency": latency,
+                    "details": f"{details} ({method})",
+                }
+            )
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            result["details"] = f"超时 (>{self.timeout}s)"
+        except aiohttp.ClientResponseError as e:
+            result["details"] = f"HTTP错误: {e.status}"
+        except aiohttp.ClientError:
+            result["details"] = "连接错误"
+        except ValueError as e:
+            result["details"] = str(e)
+        except Exception:
+            result["details"] = "未知解析错误"
+        result["elapsed"] = time.time() - start_time
+        return result
+
+
+def _next_batch(items, count):
+    return list(itertools.islice(items, count))
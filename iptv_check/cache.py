@@ -0,0 +1,141 @@
+# 跨运行的检测结果缓存 (SQLite)，以规范化 URL 为键。每条结论记录检测时影响结论的选项 (mode，
+# 如是否测速、持续测速时长、ffprobe 验证)，选项不同时视为未命中，重新检测后覆盖。
+# 有效/无效结果分别设置有效期，超过 max_entries 条时按最近访问时间 (LRU) 淘汰。
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .urls import normalize_url
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".iptv_check", "cache.db")
+DEFAULT_VALID_TTL = 6 * 3600
+DEFAULT_INVALID_TTL = 3600
+DEFAULT_MAX_ENTRIES = 500000
+# 每累计多少次写入提交一次事务并检查是否需要淘汰
+COMMIT_EVERY = 500
+
+# 结果中属于条目本身或检测开销而非检测结论的字段，不写入缓存
+ENTRY_FIELDS = ("index", "name", "url", "attrs", "bytes", "elapsed")
+
+
+def result_outcome(result):
+    return {k: v for k, v in result.items() if k not in ENTRY_FIELDS}
+
+
+class ResultCache:
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        valid_ttl=DEFAULT_VALID_TTL,
+        invalid_ttl=DEFAULT_INVALID_TTL,
+        max_entries=DEFAULT_MAX_ENTRIES,
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.valid_ttl, self.invalid_ttl = valid_ttl, invalid_ttl
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " url TEXT PRIMARY KEY,"
+            " valid INTEGER NOT NULL,"
+            " outcome TEXT NOT NULL,"
+            " checked_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " mode TEXT NOT NULL DEFAULT '')"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        if "mode" not in columns:
+            # 旧版本的缓存没有记录检测选项，其中的结论都视为选项不同
+            self._conn.execute(
+                "ALTER TABLE results ADD COLUMN mode TEXT NOT NULL DEFAULT ''"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)"
+        )
+
+    def get(self, url, now=None, mode=""):
+        # 返回以相同选项 (mode) 得到的未过期缓存结论 (dict)，没有、已过期或选项不同时返回 None
+        now = now or time.time()
+        key = normalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT valid, outcome, checked_at, mode FROM results WHERE url = ?",
+                (key,),
+            ).fetchone()
+            if row is None or row[3] != mode or now - row[2] > self._ttl(row[0]):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE url = ?", (now, key)
+            )
+            self._after_write()
+            self.hits += 1
+        return json.loads(row[1])
+
+    def put(self, url, result, now=None, mode=""):
+        now = now or time.time()
+        outcome = result_outcome(result)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results"
+                " (url, valid, outcome, checked_at, accessed_at, mode)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_url(url),
+                    int(result["status"] == "有效"),
+                    json.dumps(outcome, ensure_ascii=False),
+                    now,
+                    now,
+                    mode,
+                ),
+            )
+            self._after_write()
+
+    def _ttl(self, valid):
+        return self.valid_ttl if valid else self.invalid_ttl
+
+    def _after_write(self):
+        self._pending_writes += 1
+        if self._pending_writes >= COMMIT_EVERY:
+            self._commit()
+
+    def _commit(self):
+        self._pending_writes = 0
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE url IN ("
+                " SELECT url FROM results ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def purge_expired(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM results WHERE (valid = 1 AND checked_at < ?)"
+                " OR (valid = 0 AND checked_at < ?)",
+                (now - self.valid_ttl, now - self.invalid_ttl),
+            )
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+    def summary(self):
+        return f"结果缓存: 命中 {self.hits} 条，未命中 {self.misses} 条"
@@ -0,0 +1,110 @@
+# 协作式取消：每次运行一个 CancelToken，传给检测的每个阶段。
+# cancel() 立即关闭 (shutdown) 所有登记过的 socket，阻塞在连接、读取上的工作线程随即返回，
+# 各阶段之间和数据读取循环中再检查 cancelled，停止检测时不必等待超时。
+# 只有 DNS 解析和 TLS 握手无法从其他线程打断 (最长为检测超时)，引擎不等待这两种情况。
+import socket
+import threading
+import weakref
+from contextlib import contextmanager
+
+
+class Cancelled(Exception):
+    # 检测已被取消
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        # socket 关闭后自动从集合中消失，不需要注销
+        self._sockets = weakref.WeakSet()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout=None):
+        # 等待至多 timeout 秒，返回是否已取消；可代替 time.sleep 做可中断的等待
+        return self._event.wait(timeout)
+
+    def socket(self, family=-1, type=-1, proto=-1):
+        # 新建 socket (仍需 track() 登记)：取消之后从它读取直接抛出 Cancelled，
+        # 而不是返回 EOF 或连接错误再由 http.client/urllib3/requests 逐层转换
+        return _CancellableSocket(self, family, type, proto)
+
+    def track(self, sock):
+        # 登记 socket，取消时将其 shutdown；已经取消时立即关闭并抛出 Cancelled
+        with self._lock:
+            if not self._event.is_set():
+                self._sockets.add(sock)
+                return sock
+        _shutdown(sock)
+        raise Cancelled()
+
+    @contextmanager
+    def callback(self, function):
+        # 在 with 块内取消时调用 function (在调用 cancel() 的线程中执行)；
+        # 进入时已经取消则立即调用
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                self._callbacks.append(function)
+        if not registered:
+            function()
+        try:
+            yield
+        finally:
+            if registered:
+                with self._lock:
+                    try:
+                        self._callbacks.remove(function)
+                    except ValueError:  # cancel() 已取走
+                        pass
+
+    def cancel(self):
+        # 可在任意线程调用，可重复调用
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            sockets = list(self._sockets)
+            callbacks, self._callbacks = self._callbacks, []
+        for sock in sockets:
+            _shutdown(sock)
+        for function in callbacks:
+            try:
+                function()
+            except Exception:  # 如对应的事件循环已经结束
+                pass
+
+
+class _CancellableSocket(socket.socket):
+    __slots__ = ("_cancel",)
+
+    def __init__(self, cancel, family, type, proto):
+        super().__init__(family, type, proto)
+        self._cancel = cancel
+
+    def recv_into(self, *args):
+        try:
+            size = super().recv_into(*args)
+        except OSError:
+            self._cancel.check()
+            raise
+        self._cancel.check()
+        return size
+
+
+def _shutdown(sock):
+    # 只 shutdown 不 close：文件描述符仍归原线程所有，由它在出错后正常关闭，
+    # 不会出现描述符被重用后误关其他连接的情况
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:  # 尚未连接或已经关闭
+        pass
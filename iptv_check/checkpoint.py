@@ -0,0 +1,137 @@
+# 断点续检：检测结果逐条追加写入日志文件，按 “源文件哈希 + 条目序号” 对应。
+# 检测中断 (停止、关闭窗口、崩溃) 后重新开始时，只检测日志中没有的条目。
+# 每条记录是一行 JSON 数组，不含频道名称和 URL (续检时由源文件重新解析得到)，
+# 重放时整个文件一次解析，十万条在一秒内完成。
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .probe import create_result
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(
+    os.path.expanduser("~"), ".iptv_check", "checkpoints"
+)
+JOURNAL_VERSION = 1
+# 距上次 fsync 超过多少秒时在下一次写入后再做一次
+FSYNC_INTERVAL = 2.0
+# 每条记录保存的字段，顺序即 JSON 数组中的顺序 (序号之后)
+RECORD_FIELDS = ("status", "latency", "speed", "codec", "resolution", "bitrate")
+
+
+def source_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def journal_path(source_path, directory=DEFAULT_CHECKPOINT_DIR):
+    return os.path.join(directory, f"{source_hash(source_path)}.journal")
+
+
+def replay(path):
+    # 读取日志，返回 {条目序号 (从 0 开始): 记录}；文件不存在或格式不符时返回空字典。
+    # 崩溃时最后一行可能只写了一半，丢弃即可
+    try:
+        # 半行记录可能截断在多字节字符中间
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return {}
+    lines = text.split("\n")
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return {}
+    if not isinstance(header, dict) or header.get("version") != JOURNAL_VERSION:
+        return {}
+    body = lines[1:-1]
+    try:
+        records = json.loads("[" + ",".join(body) + "]")
+    except ValueError:
+        # 中间有损坏的行时逐行解析，跳过无法解析的行
+        records = []
+        for line in body:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return {record[0]: record for record in records if isinstance(record, list)}
+
+
+class Checkpoint:
+    # records 为 replay() 读出的已有记录：非空时续检并在日志后追加，否则清空重新开始。
+    # record() 可在多个检测线程中同时调用
+    def __init__(self, path, records=None, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.records = records or {}
+        self.restored = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if self.records:
+            _drop_partial_line(path)
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+            self._file.write(json.dumps({"version": JOURNAL_VERSION}) + "\n")
+        self._synced_at = clock()
+
+    def restore(self, index, link_info):
+        # 日志中已有该条目时返回还原的结果，否则返回 None
+        record = self.records.get(index)
+        if record is None:
+            return None
+        result = create_result(index, link_info)
+        result.update(zip(RECORD_FIELDS, record[1:]))
+        result["details"] = record[-1]
+        self.restored += 1
+        return result
+
+    def record(self, result):
+        values = [result["index"] - 1]
+        values += [result.get(field, "") for field in RECORD_FIELDS]
+        values.append(result["details"])
+        line = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            if self.clock() - self._synced_at >= FSYNC_INTERVAL:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced_at = self.clock()
+
+    def close(self):
+        # 保留日志，供下次续检
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        # 检测已完整结束，日志不再需要
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _drop_partial_line(path):
+    # 截掉崩溃时写了一半的最后一行，新记录从新的一行开始
+    with open(path, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        tail = f.read()
+        end = tail.rfind(b"\n")
+        if end != len(tail) - 1:
+            f.truncate(size - len(tail) + end + 1)
@@ -0,0 +1,822 @@
+# 无界面批量检测入口，可用于服务器或定时任务:
+#   python -m iptv_check 直播源.m3u 其他源.txt -o 导出目录 -t 8 -c 50 --speed-test
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from .async_engine import AIOHTTP_AVAILABLE, DEFAULT_CONCURRENCY
+from .cache import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_INVALID_TTL,
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_VALID_TTL,
+    ResultCache,
+)
+from .checkpoint import DEFAULT_CHECKPOINT_DIR, Checkpoint, journal_path, replay
+from .diff import (
+    DEFAULT_INVALID_BACKOFF,
+    DEFAULT_SAMPLE_RATIO,
+    DEFAULT_VALID_RECHECK,
+    DiffState,
+    state_path,
+)
+from .dns_cache import DEFAULT_NEGATIVE_TTL, DEFAULT_POSITIVE_TTL, DnsCache
+from .engine import DEFAULT_THREADS, DEFAULT_TIMEOUT, CheckEngine
+from .export import (
+    DEFAULT_EXPORT_FORMAT,
+    EXPORT_FORMATS,
+    PYARROW_AVAILABLE,
+    export_results,
+    report_path,
+    write_change_report,
+)
+from .ffprobe import (
+    DEFAULT_PROBE_TIMEOUT,
+    DEFAULT_PROBE_WORKERS,
+    FFPROBE_ENV,
+    find_ffprobe,
+)
+from .merge import (
+    DEFAULT_GOOD_MIRRORS,
+    ChannelIndex,
+    MirrorMerge,
+    expand_inputs,
+    merge_paths,
+    write_merged_m3u,
+    write_missing_txt,
+)
+from .metrics import Metrics, MetricsServer
+from .monitor import (
+    DEFAULT_HISTORY_PATH,
+    DEFAULT_INTERVAL,
+    DEFAULT_JITTER,
+    DEFAULT_RETENTION_DAYS,
+    DEFAULT_WINDOW_DAYS,
+    MONITOR_BASE_NAME,
+    History,
+    Monitor,
+    monitor_paths,
+    select,
+    write_availability_csv,
+    write_stable_m3u,
+)
+from .hls import (
+    DEFAULT_BYTE_BUDGET,
+    DEFAULT_POLICY,
+    DEFAULT_SAMPLES,
+    VARIANT_POLICIES,
+)
+from .playlist import iter_playlist, open_playlist
+from .results import VIEW_NAMES, ResultStore
+from .throughput import DEFAULT_STALL_THRESHOLD, DEFAULT_SUSTAIN_SECONDS
+from .scheduler import DEFAULT_HOST_RATE, DEFAULT_PER_HOST_LIMIT
+from .sharding import DEFAULT_PROCESSES, ShardedEngine
+from .subscription import (
+    DEFAULT_FETCH_TIMEOUT,
+    DEFAULT_SUBSCRIPTION_DIR,
+    Subscription,
+    is_remote,
+    source_name,
+)
+
+PROGRESS_INTERVAL = 5  # 进度输出间隔(秒)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="iptv_check", description="电视直播源检测工具 (命令行模式)"
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="一个或多个 .m3u/.txt 源文件或 http(s) 订阅地址 (合并模式下还可以是目录)",
+    )
+    parser.add_argument(
+        "--merge",
+        type=int,
+        nargs="?",
+        const=DEFAULT_GOOD_MIRRORS,
+        default=0,
+        metavar="K",
+        help="多源合并: 把所有输入按频道名称合并，每个频道找到 K 个有效镜像后跳过其余镜像"
+        f" (不写 K 时为 {DEFAULT_GOOD_MIRRORS})，导出按速度和延迟排序的合并列表",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="导出目录，默认与源文件相同目录 (订阅为当前目录)"
+    )
+    parser.add_argument(
+        "--export-format",
+        choices=EXPORT_FORMATS,
+        default=DEFAULT_EXPORT_FORMAT,
+        help="导出格式: m3u 为有效源 .m3u + 无效源 .txt，"
+        "json / csv / parquet 为包含全部结果的表格 (parquet 需要 pyarrow)",
+    )
+    parser.add_argument(
+        "-t", "--timeout", type=int, default=DEFAULT_TIMEOUT, help="超时(秒)"
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        help=f"并发数，线程池默认 {DEFAULT_THREADS}，异步引擎默认 {DEFAULT_CONCURRENCY}",
+    )
+    parser.add_argument(
+        "--engine", choices=("thread", "async"), default="thread", help="检测引擎"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="?",
+        const=DEFAULT_PROCESSES,
+        default=0,
+        metavar="N",
+        help="多进程分片: 按源站把链接分给 N 个子进程检测，并发数为各进程合计"
+        f" (不写 N 时为 CPU 核数 {DEFAULT_PROCESSES}，默认不分片)",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=DEFAULT_PER_HOST_LIMIT,
+        metavar="N",
+        help="单个主机的最大并发数，0 表示不限制",
+    )
+    parser.add_argument(
+        "--host-rate",
+        type=float,
+        default=DEFAULT_HOST_RATE,
+        metavar="R",
+        help="单个主机每秒最多发起的检测数，0 表示不限速",
+    )
+    parser.add_argument(
+        "--no-pre-resolve",
+        action="store_true",
+        help="不预先解析主机名 (默认解析失败的条目直接判为无效)",
+    )
+    parser.add_argument(
+        "--dns-ttl",
+        type=float,
+        default=DEFAULT_POSITIVE_TTL,
+        metavar="SEC",
+        help="DNS 解析成功结果的缓存时长(秒)",
+    )
+    parser.add_argument(
+        "--dns-negative-ttl",
+        type=float,
+        default=DEFAULT_NEGATIVE_TTL,
+        metavar="SEC",
+        help="DNS 解析失败结果的缓存时长(秒)",
+    )
+    parser.add_argument(
+        "--hls-variant",
+        choices=VARIANT_POLICIES,
+        default=DEFAULT_POLICY,
+        help="m3u8 主播放列表按 BANDWIDTH 选择哪个变体: 最高/最低/全部",
+    )
+    parser.add_argument(
+        "--hls-samples",
+        type=int,
+        default=DEFAULT_SAMPLES,
+        metavar="N",
+        help="速度测试时每个变体抽样下载的分片数",
+    )
+    parser.add_argument(
+        "--hls-budget",
+        type=int,
+        default=DEFAULT_BYTE_BUDGET // 1024,
+        metavar="KB",
+        help="每个 m3u8 源最多下载的数据量(KB)",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="快速检测: 只发 HEAD 请求 (不支持时改用 1 KB 的 Range 请求)，不读取数据流",
+    )
+    parser.add_argument(
+        "--two-stage",
+        action="store_true",
+        help="两阶段检测: 先快速检测全部链接，只对通过的链接做深度检测",
+    )
+    parser.add_argument("--speed-test", action="store_true", help="进行速度测试(慢)")
+    parser.add_argument(
+        "--sustain",
+        type=float,
+        nargs="?",
+        const=DEFAULT_SUSTAIN_SECONDS,
+        default=0,
+        metavar="SEC",
+        help=f"持续播放测速: 每个源下载 SEC 秒 (默认 {DEFAULT_SUSTAIN_SECONDS})，"
+        "记录最低/平均速度和卡顿次数，隐含 --speed-test",
+    )
+    parser.add_argument(
+        "--stall-threshold",
+        type=float,
+        default=DEFAULT_STALL_THRESHOLD,
+        metavar="SEC",
+        help="持续测速时两次收到数据的间隔超过该值计为一次卡顿",
+    )
+    parser.add_argument(
+        "--bandwidth-budget",
+        type=float,
+        default=0,
+        metavar="MBPS",
+        help="所有测速合计的带宽上限 (Mbps)：按上限控制读取速度，接近上限时新的测速排队等待，"
+        "0 表示不限制",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=DEFAULT_CACHE_PATH,
+        metavar="PATH",
+        help=f"启用跨运行结果缓存 (SQLite)，默认位置 {DEFAULT_CACHE_PATH}",
+    )
+    parser.add_argument(
+        "--cache-valid-ttl",
+        type=float,
+        default=DEFAULT_VALID_TTL / 60,
+        metavar="MIN",
+        help="有效结果缓存时长(分钟)",
+    )
+    parser.add_argument(
+        "--cache-invalid-ttl",
+        type=float,
+        default=DEFAULT_INVALID_TTL / 60,
+        metavar="MIN",
+        help="无效结果缓存时长(分钟)",
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="缓存最多保留的条目数，超出后淘汰最久未访问的",
+    )
+    parser.add_argument(
+        "--udpxy",
+        metavar="URL",
+        help="udpxy 地址 (如 http://192.168.1.1:4022)，udp/rtp 组播源改为经 udpxy 检测",
+    )
+    parser.add_argument(
+        "--multicast-iface",
+        default="0.0.0.0",
+        metavar="IP",
+        help="直接加入组播时使用的本机网卡地址",
+    )
+    parser.add_argument(
+        "--ffprobe",
+        action="store_true",
+        help="深度检测通过后再用 ffprobe 解码验证 (需要安装 ffmpeg)",
+    )
+    parser.add_argument(
+        "--ffprobe-path",
+        metavar="CMD",
+        help=f"ffprobe 命令，默认取环境变量 {FFPROBE_ENV} 或 PATH 中的 ffprobe",
+    )
+    parser.add_argument(
+        "--ffprobe-workers",
+        type=int,
+        default=DEFAULT_PROBE_WORKERS,
+        help="同时运行的 ffprobe 进程数",
+    )
+    parser.add_argument(
+        "--ffprobe-timeout",
+        type=float,
+        default=DEFAULT_PROBE_TIMEOUT,
+        help="单个 ffprobe 进程的超时(秒)，超时后强制结束",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="增量检测：与该文件上次的结果对比，只检测新增/变更和到期复查的条目，并输出变更报告",
+    )
+    parser.add_argument(
+        "--diff-state",
+        metavar="PATH",
+        help="增量检测状态文件，默认按源文件路径保存在用户目录下 (只检测一个文件时可用)",
+    )
+    parser.add_argument(
+        "--valid-recheck",
+        type=float,
+        default=DEFAULT_VALID_RECHECK / 3600,
+        metavar="HOURS",
+        help="未变化的有效条目的复查间隔(小时)",
+    )
+    parser.add_argument(
+        "--sample-ratio",
+        type=float,
+        default=DEFAULT_SAMPLE_RATIO,
+        help="每次随机抽查未到期有效条目的比例",
+    )
+    parser.add_argument(
+        "--invalid-backoff",
+        type=float,
+        default=DEFAULT_INVALID_BACKOFF / 3600,
+        metavar="HOURS",
+        help="无效条目首次复查的等待时间(小时)，之后每次连续失败翻倍",
+    )
+    parser.add_argument(
+        "--subscription-dir",
+        default=DEFAULT_SUBSCRIPTION_DIR,
+        help="订阅的条目缓存目录，订阅未变化 (304) 时直接读取缓存",
+    )
+    parser.add_argument(
+        "--fetch-timeout",
+        type=float,
+        default=DEFAULT_FETCH_TIMEOUT,
+        metavar="SEC",
+        help="下载订阅的超时(秒)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="从上次中断处继续，只检测断点日志中没有的条目",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        default=DEFAULT_CHECKPOINT_DIR,
+        help="断点日志目录，检测完整结束后日志自动删除",
+    )
+    parser.add_argument("--no-checkpoint", action="store_true", help="不记录断点日志")
+    parser.add_argument(
+        "--metrics-jsonl",
+        metavar="PATH",
+        help="把各阶段耗时、错误分类和排队数采样逐行以 JSON 追加写入该文件",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="检测期间在该端口以 Prometheus 文本格式提供 /metrics",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Prometheus 指标端点监听的地址",
+    )
+    parser.add_argument(
+        "--monitor",
+        type=float,
+        nargs="?",
+        const=DEFAULT_INTERVAL,
+        default=0,
+        metavar="SECONDS",
+        help="持续监测: 每隔 SECONDS 秒 (不写时为 "
+        f"{DEFAULT_INTERVAL}) 重新检测全部输入，检测均匀分布在间隔内，记录可用性历史，"
+        "每轮结束后导出稳定源 .m3u 和可用性 .csv",
+    )
+    parser.add_argument(
+        "--monitor-jitter",
+        type=float,
+        default=DEFAULT_JITTER,
+        help="监测间隔的随机抖动比例，实际间隔为 SECONDS × (1 ± 抖动)",
+    )
+    parser.add_argument(
+        "--monitor-priority",
+        metavar="REGEX",
+        help="重点频道: 名称或 group-title 匹配该正则的频道每轮优先检测 (排在上次失败的频道之后)",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=0, help="监测的轮数，0 为一直运行直到中断"
+    )
+    parser.add_argument(
+        "--history", default=DEFAULT_HISTORY_PATH, help="监测历史数据库路径"
+    )
+    parser.add_argument(
+        "--history-days",
+        type=float,
+        default=DEFAULT_RETENTION_DAYS,
+        help="监测历史保留天数",
+    )
+    parser.add_argument(
+        "--uptime-window",
+        type=float,
+        default=DEFAULT_WINDOW_DAYS,
+        metavar="DAYS",
+        help="可用率和平均延迟的统计范围 (天)",
+    )
+    parser.add_argument(
+        "--min-uptime",
+        type=float,
+        default=0,
+        metavar="PERCENT",
+        help="稳定源的最低可用率 (%%)，如 99 表示统计范围内至少 99%% 的检测有效",
+    )
+    parser.add_argument(
+        "--max-latency",
+        type=int,
+        default=0,
+        metavar="MS",
+        help="稳定源的最高平均延迟 (毫秒)，0 为不限",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出检测进度")
+    return parser
+
+
+class _Progress:
+    def __init__(self, quiet):
+        self.quiet = quiet
+        self.engine = None
+        self.checked = self.valid = 0
+        self.lock = threading.Lock()
+        self.last_print = time.time()
+
+    def add(self, result):
+        with self.lock:
+            self.checked += 1
+            if result["status"] == "有效":
+                self.valid += 1
+            now = time.time()
+            if not self.quiet and now - self.last_print >= PROGRESS_INTERVAL:
+                self.last_print = now
+                print(
+                    f"  已检 {self.checked}/{self.engine.submitted}，有效 {self.valid}",
+                    file=sys.stderr,
+                )
+
+
+def build_engine(args, on_result, cache=None, dns_cache=None, metrics=None, **extra):
+    # 按命令行参数创建检测引擎；extra 为断点日志、增量状态等与单个源文件相关的参数
+    use_async = args.engine == "async"
+    concurrency = args.concurrency or (
+        DEFAULT_CONCURRENCY if use_async else DEFAULT_THREADS
+    )
+    options = dict(
+        timeout=args.timeout,
+        max_workers=concurrency,
+        deep_check=not args.quick,
+        two_stage=args.two_stage,
+        run_speed_test=args.speed_test or bool(args.sustain),
+        use_async=use_async,
+        async_concurrency=concurrency,
+        on_result=on_result,
+        cache=cache,
+        per_host_limit=args.per_host,
+        host_rate=args.host_rate,
+        dns_cache=dns_cache,
+        pre_resolve=not args.no_pre_resolve,
+        hls_policy=args.hls_variant,
+        hls_samples=args.hls_samples,
+        hls_budget=args.hls_budget * 1024,
+        udpxy=args.udpxy,
+        multicast_iface=args.multicast_iface,
+        sustain_seconds=args.sustain,
+        stall_threshold=args.stall_threshold,
+        bandwidth_limit=args.bandwidth_budget * 1e6 / 8,
+        verify_ffprobe=args.ffprobe,
+        ffprobe_path=args.ffprobe_path,
+        ffprobe_workers=args.ffprobe_workers,
+        ffprobe_timeout=args.ffprobe_timeout,
+        metrics=metrics,
+        **extra,
+    )
+    if args.processes:
+        return ShardedEngine(processes=args.processes, **options)
+    return CheckEngine(**options)
+
+
+def fetch_subscription(url, args):
+    subscription = Subscription(url, args.subscription_dir, args.fetch_timeout)
+    subscription.fetch()
+    print(f"{url}: {subscription.summary()}", file=sys.stderr)
+    return subscription
+
+
+def check_file(path, args, cache=None, dns_cache=None, metrics=None):
+    # 订阅地址先下载为条目缓存，之后与本地源文件相同：断点日志、增量状态都以缓存文件为源
+    subscription, source = None, path
+    if is_remote(path):
+        subscription = fetch_subscription(path, args)
+        source = subscription.entries_path
+        links = subscription.open()
+    else:
+        links = open_playlist(path)
+    if links is None:
+        print(f"{path}: 未找到任何直播源", file=sys.stderr)
+        return False
+    print(f"{path}: 开始检测 (边解析边检测)...", file=sys.stderr)
+    diff = None
+    # 订阅总是记录增量状态；订阅未变化 (304) 时即使没有 --diff 也沿用上次的结果
+    if args.diff or subscription is not None:
+        diff = DiffState(
+            args.diff_state or state_path(source),
+            valid_recheck=args.valid_recheck * 3600,
+            sample_ratio=args.sample_ratio,
+            invalid_backoff=args.invalid_backoff * 3600,
+            reuse=args.diff or subscription.unchanged,
+        )
+    checkpoint = None
+    if not args.no_checkpoint:
+        journal = journal_path(source, args.checkpoint_dir)
+        checkpoint = Checkpoint(journal, replay(journal) if args.resume else None)
+        if checkpoint.records:
+            print(
+                f"{path}: 断点续检，跳过已检测的 {len(checkpoint.records)} 条",
+                file=sys.stderr,
+            )
+    store = ResultStore()
+    progress = _Progress(args.quiet)
+    lock = threading.Lock()
+
+    def on_result(result):
+        with lock:
+            store.add(result)
+        progress.add(result)
+
+    engine = build_engine(
+        args, on_result, cache, dns_cache, metrics, checkpoint=checkpoint, diff=diff
+    )
+    progress.engine = engine
+    start_time = time.time()
+    completed = False
+    try:
+        engine.run(links)
+        completed = True
+    except KeyboardInterrupt:
+        engine.stop()
+        print("已由用户中断，导出已完成的结果", file=sys.stderr)
+    finally:
+        # 完整结束时删除断点日志，否则保留供 --resume 使用
+        if checkpoint is not None:
+            if completed:
+                checkpoint.discard()
+            else:
+                checkpoint.close()
+                print(f"{path}: 检测进度已保存，使用 --resume 继续", file=sys.stderr)
+
+    for view in VIEW_NAMES:
+        store.sort_view(view, "原始序号")
+    if subscription is not None:
+        export_dir, base_name = args.output_dir or os.getcwd(), subscription.name
+    else:
+        export_dir = args.output_dir or os.path.dirname(os.path.abspath(path))
+        base_name = os.path.splitext(os.path.basename(path))[0]
+    exported = "\n".join(
+        f"  已导出: {file_path}"
+        for file_path in export_results(
+            store, export_dir, base_name, args.export_format
+        )
+    )
+    # 只有完整结束的运行才更新增量状态，中断时上次的状态保持不变
+    if diff is not None and completed:
+        diff.save()
+    if args.diff and completed:
+        report_file = report_path(export_dir, base_name)
+        write_change_report(report_file, diff.report())
+        exported += f"\n  已导出: {report_file}"
+    summary_text = engine.summary().replace("\n", "\n  ")
+    stats_text = engine.connection_stats.summary().replace("\n", "\n  ")
+    state = "完成" if completed else "已中断"
+    print(
+        f"{path}: {state}，用时 {time.time() - start_time:.1f}s，"
+        f"有效 {store.valid_count}，无效 {store.invalid_count}\n"
+        f"  {summary_text}\n"
+        f"  {stats_text}\n"
+        f"{exported}",
+        file=sys.stderr,
+    )
+    if not completed:  # 已导出完成的结果，其余输入不再检测
+        raise KeyboardInterrupt
+    return True
+
+
+def check_merged(args, cache=None, dns_cache=None, metrics=None):
+    # 合并模式：所有输入建成一个频道索引后一起检测，不记录断点日志和增量状态
+    index = ChannelIndex()
+    paths = list(expand_inputs(args.inputs))
+    for path in paths:
+        if is_remote(path):
+            subscription = fetch_subscription(path, args)
+            index.add_entries(subscription.iter_entries())
+        else:
+            index.add_file(path)
+    if not index.channels:
+        print("合并: 未找到任何直播源", file=sys.stderr)
+        return False
+    print(
+        f"合并: {index.files} 个文件，{len(index.channels)} 个频道，"
+        f"{index.mirrors} 个镜像，开始检测...",
+        file=sys.stderr,
+    )
+    merge = MirrorMerge(index, args.merge)
+    progress = _Progress(args.quiet)
+
+    def on_result(result):
+        merge.on_result(result)
+        progress.add(result)
+
+    engine = build_engine(args, on_result, cache, dns_cache, metrics, skip=merge.skip)
+    progress.engine = engine
+    start_time = time.time()
+    completed = False
+    try:
+        engine.run(merge.links())
+        completed = True
+    except KeyboardInterrupt:
+        engine.stop()
+        print("已由用户中断，导出已完成的结果", file=sys.stderr)
+
+    export_dir = args.output_dir
+    if not export_dir:
+        first = paths[0]
+        export_dir = os.getcwd() if is_remote(first) else os.path.dirname(first)
+        export_dir = os.path.abspath(export_dir)
+    merged_path, missing_path = merge_paths(export_dir)
+    write_merged_m3u(merged_path, merge)
+    write_missing_txt(missing_path, merge)
+    summary_text = engine.summary().replace("\n", "\n  ")
+    stats_text = engine.connection_stats.summary().replace("\n", "\n  ")
+    state = "完成" if completed else "已中断"
+    print(
+        f"合并: {state}，用时 {time.time() - start_time:.1f}s\n"
+        f"  {merge.summary()}\n"
+        f"  {summary_text}\n"
+        f"  {stats_text}\n"
+        f"  已导出: {merged_path}\n  已导出: {missing_path}",
+        file=sys.stderr,
+    )
+    if not completed:
+        raise KeyboardInterrupt
+    return True
+
+
+def check_monitored(args, dns_cache=None, metrics=None):
+    # 监测模式：每轮重新读取全部输入 (订阅地址做条件请求)，检测结果写入可用性历史，
+    # 每轮结束后按可用率和平均延迟筛选导出；不使用结果缓存、断点日志和增量状态
+    paths = list(expand_inputs(args.inputs))
+
+    def load():
+        for path in paths:
+            try:
+                if is_remote(path):
+                    yield from fetch_subscription(path, args).iter_entries()
+                else:
+                    yield from iter_playlist(path)
+            except (OSError, ValueError) as e:
+                # 某个输入本轮读取失败时跳过，不影响其他输入，也不记为无效
+                print(f"{path}: 出错: {e}", file=sys.stderr)
+
+    priority = None
+    if args.monitor_priority:
+        pattern = re.compile(args.monitor_priority, re.IGNORECASE)
+
+        def priority(link_info):
+            group = (link_info.get("attrs") or {}).get("group-title", "")
+            return bool(pattern.search(link_info["name"]) or pattern.search(group))
+
+    export_dir = args.output_dir
+    if not export_dir:
+        first = paths[0]
+        export_dir = os.getcwd() if is_remote(first) else os.path.dirname(first)
+        export_dir = os.path.abspath(export_dir)
+    base_name = MONITOR_BASE_NAME
+    if len(paths) == 1:
+        base_name = paths[0]
+        if is_remote(base_name):
+            base_name = source_name(base_name)
+        else:
+            base_name = os.path.splitext(os.path.basename(base_name))[0]
+    stable_path, availability_path = monitor_paths(export_dir, base_name)
+
+    def on_round(monitor, stats):
+        channels = history.availability(args.uptime_window)
+        stable = select(channels, args.min_uptime, args.max_latency)
+        write_stable_m3u(stable_path, stable)
+        write_availability_csv(availability_path, channels, args.uptime_window)
+        next_round = ""
+        if monitor.next_round_at is not None:
+            next_round = time.strftime(
+                "，下一轮 %H:%M:%S", time.localtime(monitor.next_round_at)
+            )
+        print(
+            f"监测: 第 {monitor.rounds} 轮完成，检测 {stats['checked']} 条，"
+            f"有效 {stats['valid']}，用时 {stats['elapsed']:.1f}s；"
+            f"稳定源 {len(stable)}/{len(channels)} 个{next_round}",
+            file=sys.stderr,
+        )
+        if not args.quiet:
+            print(
+                f"  已导出: {stable_path}\n  已导出: {availability_path}",
+                file=sys.stderr,
+            )
+
+    history = History(args.history, args.history_days)
+    monitor = Monitor(
+        load,
+        lambda on_result, start_rate: build_engine(
+            args, on_result, None, dns_cache, metrics, start_rate=start_rate
+        ),
+        history,
+        interval=args.monitor,
+        jitter=args.monitor_jitter,
+        priority=priority,
+        on_round=on_round,
+    )
+    print(
+        f"监测: {len(paths)} 个输入，每 {args.monitor:g}s 检测一轮，历史 {args.history}",
+        file=sys.stderr,
+    )
+    try:
+        monitor.run(args.rounds)
+    except KeyboardInterrupt:
+        monitor.stop()
+        print("监测已由用户中断", file=sys.stderr)
+    finally:
+        history.close()
+    return True
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.engine == "async" and not AIOHTTP_AVAILABLE:
+        print("错误: 异步引擎需要安装 aiohttp: pip install aiohttp", file=sys.stderr)
+        return 2
+    if args.export_format == "parquet" and not PYARROW_AVAILABLE:
+        print(
+            "错误: 导出 Parquet 需要安装 pyarrow: pip install pyarrow", file=sys.stderr
+        )
+        return 2
+    if args.ffprobe and find_ffprobe(args.ffprobe_path) is None:
+        print(
+            "错误: 找不到 ffprobe，请安装 ffmpeg 或用 --ffprobe-path 指定",
+            file=sys.stderr,
+        )
+        return 2
+    if args.monitor and (args.merge or args.diff or args.resume or args.cache):
+        print(
+            "错误: 监测模式不支持 --merge、--diff、--resume 和 --cache", file=sys.stderr
+        )
+        return 2
+    if args.monitor and args.two_stage:
+        print("错误: 监测模式不支持 --two-stage", file=sys.stderr)
+        return 2
+    if args.monitor_priority:
+        try:
+            re.compile(args.monitor_priority)
+        except re.error as e:
+            print(
+                f"错误: --monitor-priority 不是有效的正则表达式: {e}", file=sys.stderr
+            )
+            return 2
+    if args.merge and (args.diff or args.resume):
+        print("错误: 合并模式不支持 --diff 和 --resume", file=sys.stderr)
+        return 2
+    if args.diff_state and len(args.inputs) > 1:
+        print("错误: --diff-state 只能用于单个源文件", file=sys.stderr)
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    cache = None
+    if args.cache:
+        cache = ResultCache(
+            args.cache,
+            valid_ttl=args.cache_valid_ttl * 60,
+            invalid_ttl=args.cache_invalid_ttl * 60,
+            max_entries=args.cache_max_entries,
+        )
+    # 多个源文件共用一个 DNS 缓存和一份指标，指标按整个运行累计
+    metrics, server = None, None
+    if args.metrics_jsonl or args.metrics_port is not None:
+        metrics = Metrics(args.metrics_jsonl)
+    if args.metrics_port is not None:
+        server = MetricsServer(metrics, args.metrics_port, args.metrics_host)
+        print(f"指标端点: {server.url}", file=sys.stderr)
+    dns_cache = DnsCache(
+        positive_ttl=args.dns_ttl,
+        negative_ttl=args.dns_negative_ttl,
+        metrics=metrics,
+    )
+    ok = True
+    try:
+        if args.monitor:
+            try:
+                ok = check_monitored(args, dns_cache, metrics)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                print(f"监测: 出错: {e}", file=sys.stderr)
+                ok = False
+        elif args.merge:
+            try:
+                ok = check_merged(args, cache, dns_cache, metrics)
+            except (OSError, ValueError) as e:
+                print(f"合并: 出错: {e}", file=sys.stderr)
+                ok = False
+        else:
+            for path in args.inputs:
+                try:
+                    ok = check_file(path, args, cache, dns_cache, metrics) and ok
+                except (OSError, ValueError) as e:
+                    print(f"{path}: 出错: {e}", file=sys.stderr)
+                    ok = False
+    except KeyboardInterrupt:
+        # 被中断的运行已导出部分结果，以 128 + SIGINT 退出，与 shell 的约定一致
+        return 130
+    finally:
+        dns_cache.close()
+        if cache:
+            cache.close()
+        if server:
+            server.close()
+        if metrics:
+            metrics.close()
+    return 0 if ok else 1
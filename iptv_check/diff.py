@@ -0,0 +1,183 @@
+# 增量检测：与同一源文件上一次运行的结果按 (频道名称, URL) 的哈希对比。
+# 新增或变更的条目立即检测；未变化的有效条目按较长的间隔复查，并每次随机抽查一部分；
+# 上次无效的条目按连续失败次数指数退避后再复查。其余条目沿用上次的结果，
+# 运行结束后输出合并结果和变更报告 (新失效、恢复、新增、移除)。
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from .probe import create_result
+
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".iptv_check", "diff")
+STATE_VERSION = 1
+# 未变化的有效条目多久复查一次 (秒)，以及每次运行随机抽查的比例
+DEFAULT_VALID_RECHECK = 3 * 24 * 3600
+DEFAULT_SAMPLE_RATIO = 0.05
+# 无效条目第 n 次连续失败后等待 base * 2^(n-1) 秒再复查，不超过上限
+DEFAULT_INVALID_BACKOFF = 12 * 3600
+MAX_INVALID_BACKOFF = 7 * 24 * 3600
+# 状态记录: 检测结论字段 + [检测时间, 连续失败次数, 频道名称, URL]
+STATE_FIELDS = ("status", "latency", "speed", "codec", "resolution", "bitrate")
+CARRIED_MARK = " [沿用]"
+CACHE_MARK = " [缓存]"
+REPORT_SECTIONS = (
+    ("newly_dead", "新失效"),
+    ("newly_alive", "恢复"),
+    ("added", "新增"),
+    ("removed", "移除"),
+)
+
+
+def entry_key(name, url):
+    return hashlib.sha1(f"{name}\n{url}".encode("utf-8")).hexdigest()[:16]
+
+
+def state_path(source_path, directory=DEFAULT_STATE_DIR):
+    # 按源文件路径区分：每天覆盖下载的同名文件对应同一份状态
+    name = hashlib.sha1(os.path.abspath(source_path).encode("utf-8")).hexdigest()
+    return os.path.join(directory, f"{name}.json")
+
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+        return {}
+    return data.get("entries") or {}
+
+
+class DiffState:
+    def __init__(
+        self,
+        path,
+        valid_recheck=DEFAULT_VALID_RECHECK,
+        sample_ratio=DEFAULT_SAMPLE_RATIO,
+        invalid_backoff=DEFAULT_INVALID_BACKOFF,
+        clock=time.time,
+        rng=None,
+        reuse=True,
+    ):
+        self.path = path
+        # reuse 为 False 时只记录本次结果 (供下次运行对比)，不沿用上次的结论
+        self.reuse = reuse
+        self.valid_recheck, self.sample_ratio = valid_recheck, sample_ratio
+        self.invalid_backoff = invalid_backoff
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.previous = load_state(path)
+        self.current = {}  # 本次运行的状态，运行完整结束后保存
+        self.carried = self.rechecked = 0
+        self._carried_keys = set()
+        self._lock = threading.Lock()
+
+    def carry(self, index, link_info):
+        # 不需要复查时返回沿用上次结论的结果，需要检测时返回 None
+        if not self.reuse:
+            return None
+        key = entry_key(link_info["name"], link_info["url"])
+        record = self.previous.get(key)
+        if record is None or self._due(record):
+            return None
+        result = create_result(index, link_info)
+        result.update(zip(STATE_FIELDS, record))
+        result["details"] = record[len(STATE_FIELDS)] + CARRIED_MARK
+        with self._lock:
+            self._carried_keys.add(key)
+            self.current[key] = record
+            self.carried += 1
+        return result
+
+    def _due(self, record):
+        status = record[0]
+        checked_at, failures = record[len(STATE_FIELDS) + 1 : len(STATE_FIELDS) + 3]
+        age = self.clock() - checked_at
+        if status == "有效":
+            return age >= self.valid_recheck or self.rng.random() < self.sample_ratio
+        wait = self.invalid_backoff * 2 ** max(failures - 1, 0)
+        return age >= min(wait, MAX_INVALID_BACKOFF)
+
+    def restore(self, result):
+        # 断点续检还原的结果：中断前沿用的结论仍按沿用记录，保持原来的检测时间；
+        # 中断前实际检测过的按检测结果记录
+        key = entry_key(result["name"], result["url"])
+        if result["details"].endswith(CARRIED_MARK):
+            with self._lock:
+                record = self.previous.get(key)
+                if record is not None:
+                    self._carried_keys.add(key)
+                    self.current[key] = record
+                    self.carried += 1
+                    return
+        self.observe(result)
+
+    def observe(self, result):
+        # 记录本次检测得到的结论；沿用的结果保持原来的检测时间
+        key = entry_key(result["name"], result["url"])
+        valid = result["status"] == "有效"
+        details = result["details"]
+        for mark in (CACHE_MARK, CARRIED_MARK):
+            if details.endswith(mark):
+                details = details[: -len(mark)]
+        with self._lock:
+            if key in self._carried_keys:
+                return
+            previous = self.previous.get(key)
+            failures = 0
+            if not valid:
+                failures = 1
+                if previous is not None and previous[0] != "有效":
+                    failures += previous[len(STATE_FIELDS) + 2]
+            if previous is not None and key not in self.current:
+                self.rechecked += 1
+            self.current[key] = [result.get(field, "") for field in STATE_FIELDS] + [
+                details,
+                self.clock(),
+                failures,
+                result["name"],
+                result["url"],
+            ]
+
+    def report(self):
+        # 返回 {分类: [(频道名称, URL)]}，分类见 REPORT_SECTIONS
+        report = {name: [] for name, _ in REPORT_SECTIONS}
+        for key, record in self.current.items():
+            entry = tuple(record[-2:])
+            previous = self.previous.get(key)
+            if previous is None:
+                report["added"].append(entry)
+            elif previous[0] == "有效" and record[0] != "有效":
+                report["newly_dead"].append(entry)
+            elif previous[0] != "有效" and record[0] == "有效":
+                report["newly_alive"].append(entry)
+        for key, previous in self.previous.items():
+            if key not in self.current:
+                report["removed"].append(tuple(previous[-2:]))
+        for entries in report.values():
+            entries.sort()
+        return report
+
+    def save(self):
+        # 原子写入：先写临时文件再替换，中途崩溃不会留下损坏的状态
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": STATE_VERSION, "entries": self.current},
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        os.replace(temp_path, self.path)
+
+    def summary(self, report=None):
+        report = report or self.report()
+        counts = "，".join(
+            f"{label} {len(report[name])} 条" for name, label in REPORT_SECTIONS
+        )
+        return f"增量检测: 沿用 {self.carried} 条，复查 {self.rechecked} 条；{counts}"
@@ -0,0 +1,143 @@
+# 共享 DNS 缓存：同一主机名在一次检测中只解析一次，解析成功/失败分别缓存一段时间。
+# 只缓存确定的失败 (主机名不存在)；暂时性错误 (如 EAI_AGAIN、SERVFAIL) 重试一次，仍失败时不缓存。
+# 解析函数可替换 (resolver(host) -> [IP, ...]，失败时抛出 OSError)，便于用本地桩测试。
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_POSITIVE_TTL = 300
+DEFAULT_NEGATIVE_TTL = 60
+# 预解析阶段同时进行的解析数
+DEFAULT_RESOLVE_WORKERS = 32
+# 表示主机名确定不存在的错误码，其余解析错误视为暂时性的
+NOT_FOUND_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+
+
+def system_resolver(host):
+    infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+class StaticResolver:
+    # 按固定表解析，表中没有的主机视为解析失败；delay 模拟解析耗时
+    def __init__(self, mapping, delay=0):
+        self.mapping = mapping
+        self.delay = delay
+
+    def __call__(self, host):
+        if self.delay:
+            time.sleep(self.delay)
+        addresses = self.mapping.get(host)
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [addresses] if isinstance(addresses, str) else list(addresses)
+
+
+def is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class DnsCache:
+    def __init__(
+        self,
+        resolver=system_resolver,
+        positive_ttl=DEFAULT_POSITIVE_TTL,
+        negative_ttl=DEFAULT_NEGATIVE_TTL,
+        workers=DEFAULT_RESOLVE_WORKERS,
+        clock=time.monotonic,
+        metrics=None,
+    ):
+        self.resolver = resolver
+        # 可选的 Metrics，记录每次实际解析的耗时
+        self.metrics = metrics
+        self.positive_ttl, self.negative_ttl = positive_ttl, negative_ttl
+        self.workers = workers
+        self.clock = clock
+        self.lookups = self.hits = self.failures = 0
+        self._entries = {}  # 主机 -> (IP 列表或 None, 过期时间)
+        self._pending = {}  # 主机 -> 正在解析的 Future，同一主机的并发请求共用一次解析
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def cached(self, host):
+        # 只查缓存：返回 IP 列表、None (已知解析失败) 或 False (没有未过期的记录)
+        if is_ip_address(host):
+            return [host]
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is not None and self.clock() < entry[1]:
+                self.hits += 1
+                return entry[0]
+        return False
+
+    def submit(self, host):
+        # 在后台解析，返回 Future，结果为 IP 列表、None (解析失败) 或 False (暂时无法解析，
+        # 结果未缓存，由检测时自行解析)
+        addresses = self.cached(host)
+        if addresses is not False:
+            future = Future()
+            future.set_result(addresses)
+            return future
+        with self._lock:
+            future = self._pending.get(host)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="dns"
+                    )
+                future = self._executor.submit(self._lookup, host)
+                self._pending[host] = future
+        return future
+
+    def resolve(self, host):
+        return self.submit(host).result()
+
+    def prefetch(self, hosts):
+        # 并发解析一批主机，返回 {主机: IP 列表、None 或 False}
+        futures = {host: self.submit(host) for host in set(hosts)}
+        return {host: future.result() for host, future in futures.items()}
+
+    def _lookup(self, host):
+        start = time.perf_counter()
+        addresses = self._resolve(host)
+        if addresses is False:
+            addresses = self._resolve(host)
+        if self.metrics is not None:
+            self.metrics.observe("dns", time.perf_counter() - start)
+        ttl = self.positive_ttl if addresses else self.negative_ttl
+        with self._lock:
+            self.lookups += 1
+            if not addresses:
+                self.failures += 1
+            if addresses is not False:
+                self._entries[host] = (addresses, self.clock() + ttl)
+            self._pending.pop(host, None)
+        return addresses
+
+    def _resolve(self, host):
+        # 返回 IP 列表；主机名确定不存在时返回 None，暂时性错误返回 False
+        try:
+            return self.resolver(host) or None
+        except UnicodeError:  # 主机名无法编码
+            return None
+        except socket.gaierror as e:
+            return None if e.errno in NOT_FOUND_ERRORS else False
+        except OSError:
+            return False
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def summary(self):
+        return (
+            f"DNS: 解析 {self.lookups} 个主机，失败 {self.failures} 个，"
+            f"缓存命中 {self.hits} 次"
+        )
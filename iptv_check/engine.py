@@ -0,0 +1,565 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import getproxies
+
+from . import hls, probe, protocols, throughput
+from .async_engine import DEFAULT_CONCURRENCY, AsyncChecker
+from .cancel import CancelToken
+from .dns_cache import DnsCache
+from .ffprobe import DEFAULT_PROBE_TIMEOUT, DEFAULT_PROBE_WORKERS, FfprobePool
+from .scheduler import (
+    DEFAULT_HOST_RATE,
+    DEFAULT_PER_HOST_LIMIT,
+    DEFAULT_WINDOW,
+    HostScheduler,
+    host_of,
+)
+from .session import SessionPool
+from .urls import normalize_url
+
+DEFAULT_TIMEOUT = 8
+DEFAULT_THREADS = 30
+# 调度器空闲等待的最长时间 (秒)，用于及时发现解析结束或停止请求
+DISPATCH_POLL = 0.5
+# 预解析阶段最多提前多少条提交主机名解析
+DNS_LOOKAHEAD = 1000
+# 检测档位：快速检测 (HEAD / Range GET) 与深度检测
+TIER_QUICK, TIER_DEEP = "quick", "deep"
+# skip 判定跳过的条目的信息栏内容
+SKIPPED_DETAILS = "已跳过"
+
+
+# 与界面无关的检测引擎：GUI 与命令行共用，结果通过 on_result 回调逐条推送
+class CheckEngine:
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        max_workers=DEFAULT_THREADS,
+        deep_check=True,
+        two_stage=False,
+        run_speed_test=True,
+        use_async=False,
+        async_concurrency=DEFAULT_CONCURRENCY,
+        on_result=None,
+        cache=None,
+        per_host_limit=DEFAULT_PER_HOST_LIMIT,
+        host_rate=DEFAULT_HOST_RATE,
+        start_rate=0,
+        dns_cache=None,
+        pre_resolve=True,
+        hls_policy=hls.DEFAULT_POLICY,
+        hls_samples=hls.DEFAULT_SAMPLES,
+        hls_budget=hls.DEFAULT_BYTE_BUDGET,
+        udpxy=None,
+        multicast_iface="0.0.0.0",
+        sustain_seconds=0,
+        stall_threshold=throughput.DEFAULT_STALL_THRESHOLD,
+        bandwidth_limit=0,
+        verify_ffprobe=False,
+        ffprobe_path=None,
+        ffprobe_workers=DEFAULT_PROBE_WORKERS,
+        ffprobe_timeout=DEFAULT_PROBE_TIMEOUT,
+        checkpoint=None,
+        diff=None,
+        metrics=None,
+        skip=None,
+    ):
+        self.timeout = timeout
+        self.max_workers = max(1, int(max_workers))
+        # 两阶段：先对全部链接做快速检测，只有通过的链接再做深度检测
+        self.two_stage = two_stage
+        self.tier = TIER_DEEP if deep_check or two_stage else TIER_QUICK
+        self.run_speed_test = run_speed_test
+        self.use_async = use_async
+        self.async_concurrency = async_concurrency
+        self.on_result = on_result
+        self.cache = cache
+        self.per_host_limit, self.host_rate = per_host_limit, host_rate
+        # 全部主机合计每秒最多开始的检测数 (0 为不限)，用于把检测均匀分布在一段时间内
+        self.start_rate = start_rate
+        # m3u8 源的变体选择策略、测速时抽样的分片数和每个源的下载量上限
+        self.hls_options = {
+            "hls_policy": hls_policy,
+            "hls_samples": hls_samples,
+            "hls_budget": hls_budget,
+        }
+        # 非 HTTP 源：udp/rtp 可经 udpxy 转为 HTTP 检测，否则在 multicast_iface 上加入组播
+        self.udpxy, self.multicast_iface = udpxy, multicast_iface
+        # 测速方式：sustain_seconds 大于 0 时为持续播放测速；bandwidth_limit (字节/秒)
+        # 为所有测速合计的带宽上限，0 表示不限制，预算在 run() 中创建
+        self.speed_options = {
+            "sustain_seconds": sustain_seconds,
+            "stall_threshold": stall_threshold,
+        }
+        self.bandwidth_limit = bandwidth_limit
+        self.bandwidth = None
+        # ffprobe 验证与 HTTP 检测同时进行：深度检测通过的结果交给 ffprobe 进程池，
+        # 验证完成后才推送。进程池在 run() 中创建，找不到 ffprobe 时抛出 RuntimeError
+        self.verify_ffprobe = verify_ffprobe
+        self.ffprobe_options = {
+            "path": ffprobe_path,
+            "workers": ffprobe_workers,
+            "timeout": ffprobe_timeout,
+        }
+        self.verifier = None
+        # 影响检测结论的选项，随结论写入结果缓存；缓存中以其他选项得到的结论不沿用
+        # (如之前未测速的结论没有速度，未经 ffprobe 验证)
+        self.cache_mode = _cache_mode(
+            run_speed_test, sustain_seconds, verify_ffprobe, hls_policy, hls_samples
+        )
+        # 断点续检日志：已记录的条目直接还原，新结果逐条追加；由调用方负责关闭或删除
+        self.checkpoint = checkpoint
+        # 增量检测状态 (DiffState)：不需要复查的条目沿用上次结论，所有结果都记入本次状态
+        self.diff = diff
+        # 可选的 Metrics：记录实际检测的各阶段耗时和结论分类，运行期间定时采样排队数
+        self.metrics = metrics
+        # 可选的 skip(link_info)：检测开始前调用，返回 True 时不再检测该条目，
+        # 直接推送信息栏为“已跳过”的无效结果 (不写入缓存、断点日志和增量状态)
+        self.skip = skip
+        # 未传入 DNS 缓存时每次运行新建一个，运行结束后关闭
+        self.dns_cache, self._owns_dns_cache = dns_cache, dns_cache is None
+        # 使用代理时由代理服务器解析主机名，本地解析失败不代表链接无效
+        self.pre_resolve = pre_resolve and not getproxies()
+        self.stop_requested = False
+        # stop() 时取消：断开线程池引擎所有正在进行的请求，工作线程立即返回
+        self.cancel = CancelToken()
+        # submitted: 已从解析器取出的链接数；finished: 全部链接已提交且检测结束
+        self.submitted, self.finished = 0, False
+        # 运行内去重：同一规范化 URL 只检测一次，结果分发给所有引用它的条目
+        self._lock = threading.Lock()
+        self._inflight = {}  # URL -> 等待该 URL 结果的 [(序号, 链接信息)]
+        self._done = {}  # URL -> 已完成的检测结果
+        self.probed, self.dedup_hits, self.cache_hits = 0, 0, 0
+        self.dns_failures, self.skipped = 0, 0
+        # 各档位的检测次数、下载字节数和累计耗时；survivors 为快速检测通过、等待深度检测的条目，
+        # promoted 为其数量 (多进程分片时由各子进程的统计累加)
+        self.tier_stats = {TIER_QUICK: [0, 0, 0.0], TIER_DEEP: [0, 0, 0.0]}
+        self.survivors, self.promoted = [], 0
+        self.executor, self.async_checker = None, None
+        self.session_pool, self.connection_stats = None, None
+        self.scheduler = None
+
+    def run(self, links):
+        # 阻塞运行，直到全部链接检测完成或被 stop() 中断。
+        # links 可以是生成器，引擎按需读取，不会一次性载入内存
+        if self.dns_cache is None:
+            self.dns_cache = DnsCache(metrics=self.metrics)
+        items = self._admit(links)
+        if self.pre_resolve:
+            items = self._pre_resolve(items)
+        try:
+            self._start()
+            if self.metrics is not None:
+                self.metrics.start(self.gauges)
+            if self.two_stage:
+                # 第二阶段要等快速检测全部结束后才开始，通过的条目暂存在内存中
+                self._run(items, TIER_QUICK)
+                if not self.stop_requested:
+                    self._run(iter(self.survivors), TIER_DEEP)
+            else:
+                self._run(items, self.tier)
+            if self.verifier:
+                # HTTP 检测已结束，等待仍在排队或运行的 ffprobe 验证
+                self.verifier.close(wait=True)
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.stop()
+            if self.verifier:
+                self.verifier.close(wait=False)
+            if self.session_pool:
+                self.session_pool.close()
+            if self._owns_dns_cache:
+                self.dns_cache.close()
+            self.finished = True
+
+    def _admit(self, links):
+        # 只把本次运行中未出现过、且缓存中没有未过期结果的 URL 交给检测
+        for index, link_info in enumerate(links):
+            self.submitted += 1
+            if self.stop_requested:
+                return
+            key = normalize_url(link_info["url"])
+            restored = None
+            if self.checkpoint is not None:
+                restored = self.checkpoint.restore(index, link_info)
+            if restored is not None:
+                with self._lock:
+                    self._done.setdefault(key, restored)
+                self._emit(restored, restored=True)
+                continue
+            # 沿用的结论不参与去重，同一 URL 的新增条目仍然立即检测
+            carried = None
+            if self.diff is not None:
+                carried = self.diff.carry(index, link_info)
+            if carried is not None:
+                self._emit(carried)
+                continue
+            with self._lock:
+                done = self._done.get(key)
+                if done is None and key in self._inflight:
+                    self._inflight[key].append((index, link_info))
+                    self.dedup_hits += 1
+                    continue
+            if done is not None:
+                self.dedup_hits += 1
+                self._emit(_fan_out(done, index, link_info))
+                continue
+            cached = None
+            if self.cache:
+                cached = self.cache.get(link_info["url"], mode=self.cache_mode)
+            if cached is not None:
+                self.cache_hits += 1
+                result = dict(probe.create_result(index, link_info), **cached)
+                result["details"] = f"{result['details']} [缓存]"
+                with self._lock:
+                    self._done[key] = result
+                self._emit(result)
+                continue
+            with self._lock:
+                self._inflight[key] = []
+            yield index, link_info
+
+    def _pre_resolve(self, items):
+        # 预解析阶段：提前最多 DNS_LOOKAHEAD 条并发解析主机名，按原顺序放行；
+        # 主机名确定不存在的条目直接判为无效，不占用检测名额，暂时无法解析的照常检测
+        window = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(window) < DNS_LOOKAHEAD:
+                entry = next(items, None)
+                if entry is None:
+                    exhausted = True
+                    break
+                host = host_of(entry[1]["url"])
+                window.append((self.dns_cache.submit(host) if host else None, entry))
+            if not window:
+                return
+            future, entry = window.popleft()
+            if future is not None and not self._wait_resolved(future):
+                return
+            if future is None or future.result() is not None:
+                yield entry
+            else:
+                self.dns_failures += 1
+                result = probe.create_result(*entry)
+                result["details"] = "DNS解析失败"
+                self._on_probe_result(result)
+
+    def _wait_resolved(self, future):
+        # 等待主机名解析结束；停止时不等待仍在进行的解析，返回 False
+        if not future.done():
+            resolved = threading.Event()
+            future.add_done_callback(lambda _: resolved.set())
+            with self.cancel.callback(resolved.set):
+                resolved.wait()
+        return not self.cancel.cancelled
+
+    def _skipped(self, index, link_info):
+        # 检测开始前询问 skip：跳过时推送结果给该条目和等待同一 URL 的重复条目，返回 True
+        if self.skip is None or not self.skip(link_info):
+            return False
+        key = normalize_url(link_info["url"])
+        with self._lock:
+            waiters = self._inflight.pop(key, ())
+            self.skipped += 1 + len(waiters)
+        for entry in [(index, link_info), *waiters]:
+            result = probe.create_result(*entry)
+            result["details"] = SKIPPED_DETAILS
+            if not self.stop_requested and self.on_result is not None:
+                self.on_result(result)
+        return True
+
+    def _on_tier_result(self, tier, result):
+        stats = self.tier_stats[tier]
+        with self._lock:
+            stats[0] += 1
+            stats[1] += result["bytes"]
+            stats[2] += result["elapsed"]
+        # 各阶段耗时不随结果保存 (缓存、断点日志、界面都不需要)
+        timings = result.pop("timings", None)
+        if self.metrics is not None:
+            self.metrics.observe_result(result, timings, tier)
+        # RTSP/RTMP/组播没有深度检测，第一阶段的结果即为最终结果
+        if (
+            self.two_stage
+            and tier == TIER_QUICK
+            and result["status"] == "有效"
+            and not self._is_native(result["url"])
+        ):
+            link_info = {k: result[k] for k in ("name", "url", "attrs")}
+            with self._lock:
+                self.survivors.append((result["index"] - 1, link_info))
+                self.promoted += 1
+            return
+        if self.verifier and tier == TIER_DEEP and result["status"] == "有效":
+            url = protocols.udpxy_url(result["url"], self.udpxy)
+            self.verifier.submit(
+                result, lambda verified: self._on_probe_result(verified, tier), url
+            )
+            return
+        self._on_probe_result(result, tier)
+
+    def _on_probe_result(self, result, tier=TIER_DEEP):
+        key = normalize_url(result["url"])
+        with self._lock:
+            waiters = self._inflight.pop(key, ())
+            self._done[key] = result
+            # 推送结果时才计数，停止时中途放弃的检测不计入
+            if not self.stop_requested:
+                self.probed += 1
+        if self.stop_requested:
+            return
+        if self.metrics is not None:
+            self.metrics.count_outcome(result)
+        # 快速检测判为有效的结果不写入缓存，以免之后的深度检测直接沿用
+        if self.cache and (tier == TIER_DEEP or result["status"] != "有效"):
+            self.cache.put(result["url"], result, mode=self.cache_mode)
+        self._emit(result)
+        for index, link_info in waiters:
+            self._emit(_fan_out(result, index, link_info))
+
+    def _emit(self, result, restored=False):
+        # restored 为从断点日志还原的结果：不再写入日志，增量状态按中断前的结论还原
+        if self.stop_requested:
+            return
+        if not restored and self.checkpoint is not None:
+            self.checkpoint.record(result)
+        if self.diff is not None:
+            if restored:
+                self.diff.restore(result)
+            else:
+                self.diff.observe(result)
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _start(self):
+        # 同一主机的条目由调度器交错、限速，总并发为线程数或异步并发数；
+        # 调度器和连接池在两个阶段之间共用
+        if self.verify_ffprobe and self.tier == TIER_DEEP:
+            self.verifier = FfprobePool(metrics=self.metrics, **self.ffprobe_options)
+        if self.bandwidth_limit and self.run_speed_test and self.tier == TIER_DEEP:
+            self.bandwidth = throughput.BandwidthBudget(self.bandwidth_limit)
+        self.scheduler = HostScheduler(
+            self.async_concurrency if self.use_async else self.max_workers,
+            per_host_limit=self.per_host_limit,
+            rate=self.host_rate,
+            start_rate=self.start_rate,
+        )
+        if self.use_async:
+            self.async_checker = AsyncChecker(
+                self.timeout,
+                self.run_speed_test,
+                concurrency=self.async_concurrency,
+                scheduler=self.scheduler,
+                dns_cache=self.dns_cache,
+                udpxy=self.udpxy,
+                multicast_iface=self.multicast_iface,
+                bandwidth=self.bandwidth,
+                skip=self._skipped if self.skip else None,
+                **self.speed_options,
+                **self.hls_options,
+            )
+            self.connection_stats = self.async_checker.stats
+        else:
+            # 每主机保持的长连接数与线程数一致
+            self.session_pool = SessionPool(
+                pool_per_host=self.max_workers,
+                dns_cache=self.dns_cache,
+                cancel=self.cancel,
+            )
+            self.connection_stats = self.session_pool.stats
+
+    def _run(self, links, tier):
+        if self.use_async:
+            self.async_checker.on_result = lambda result: self._on_tier_result(
+                tier, result
+            )
+            self.async_checker.run(links, quick=tier == TIER_QUICK)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self.executor = executor
+            try:
+                self._dispatch(executor, iter(links), tier)
+            except BaseException:
+                # Ctrl+C 等：线程池退出时会等待所有工作线程，先取消正在进行的检测，
+                # 否则要等每个检测各自超时
+                self.stop()
+                raise
+
+    def _dispatch(self, executor, links, tier):
+        # 从解析器预读至多 DEFAULT_WINDOW 条交给调度器，调度器放行一条就提交一条，
+        # 正在检测的任务数不超过线程数，解析器随检测进度推进
+        scheduler = self.scheduler
+        exhausted = False
+        while not self.stop_requested:
+            while not exhausted and scheduler.pending < DEFAULT_WINDOW:
+                entry = next(links, None)
+                if entry is None:
+                    exhausted = True
+                else:
+                    scheduler.add(entry[1]["url"], entry)
+            if exhausted and scheduler.pending == 0:
+                return
+            task = scheduler.acquire(timeout=DISPATCH_POLL)
+            if task is None or self.stop_requested:
+                continue
+            host, (index, link_info) = task
+            try:
+                executor.submit(self._check, tier, host, index, link_info)
+            except RuntimeError:  # stop() 已关闭线程池
+                return
+
+    def _check(self, tier, host, index, link_info):
+        result = {}
+        try:
+            if self.stop_requested or self._skipped(index, link_info):
+                return
+            result = self._probe(tier, index, link_info)
+            # 停止时中途放弃的检测不再统计和推送，工作线程尽快退出
+            if not self.stop_requested:
+                self._on_tier_result(tier, result)
+        finally:
+            self.scheduler.release(host, result)
+
+    def _probe(self, tier, index, link_info):
+        url = link_info["url"]
+        proxied = protocols.udpxy_url(url, self.udpxy)
+        if proxied:
+            result = self._probe(tier, index, dict(link_info, url=proxied))
+            result["url"] = url
+            return result
+        if protocols.is_native(url):
+            return protocols.check_native_sync(
+                index,
+                link_info,
+                self.timeout,
+                self.dns_cache,
+                cancel=self.cancel,
+                multicast_iface=self.multicast_iface,
+            )
+        if tier == TIER_QUICK:
+            return probe.check_url_simple(
+                index,
+                link_info,
+                self.timeout,
+                session_pool=self.session_pool,
+                cancel=self.cancel,
+            )
+        return probe.check_url_deep(
+            index,
+            link_info,
+            self.timeout,
+            self.run_speed_test,
+            session_pool=self.session_pool,
+            bandwidth=self.bandwidth,
+            cancel=self.cancel,
+            **self.speed_options,
+            **self.hls_options,
+        )
+
+    def _is_native(self, url):
+        return protocols.is_native(url) and not protocols.udpxy_url(url, self.udpxy)
+
+    def gauges(self):
+        # 供指标采样：调度器中排队和正在检测的条目数、并发上限，以及等待 ffprobe 验证的数量
+        scheduler = self.scheduler
+        return {
+            "submitted": self.submitted,
+            "queued": scheduler.pending if scheduler else 0,
+            "active": scheduler.active if scheduler else 0,
+            "workers": scheduler.total_limit if scheduler else 0,
+            "ffprobe_pending": self.verifier.pending if self.verifier else 0,
+        }
+
+    def summary(self):
+        text = f"去重: 实际检测 {self.probed} 个 URL，重复条目 {self.dedup_hits} 条"
+        if self.cache:
+            text += f"，缓存命中 {self.cache_hits} 条"
+        if self.dns_failures:
+            text += f"，DNS解析失败 {self.dns_failures} 条"
+        if self.skipped:
+            text += f"，跳过 {self.skipped} 条"
+        if self.checkpoint is not None and self.checkpoint.restored:
+            text += f"，断点续检还原 {self.checkpoint.restored} 条"
+        if self.diff is not None:
+            text += f"\n{self.diff.summary()}"
+        if self.scheduler:
+            text += f"\n{self.scheduler.summary()}"
+        tier_text = self.tier_summary()
+        if tier_text:
+            text += f"\n{tier_text}"
+        if self.verifier:
+            text += f"\n{self.verifier.summary()}"
+        if self.bandwidth:
+            text += f"\n{self.bandwidth.summary()}"
+        if self.metrics is not None:
+            text += f"\n{self.metrics.summary()}"
+        if self.dns_cache:
+            text += f"\n{self.dns_cache.summary()}"
+        return text
+
+    def tier_summary(self):
+        quick, deep = self.tier_stats[TIER_QUICK], self.tier_stats[TIER_DEEP]
+        if not quick[0]:
+            return ""
+        text = f"快速检测: {quick[0]} 个 URL，下载 {_kb(quick[1])}，累计耗时 {quick[2]:.1f}s"
+        if not self.two_stage:
+            return text
+        dropped = quick[0] - self.promoted
+        text += (
+            f"，淘汰 {dropped} 个\n深度检测: {deep[0]} 个 URL，"
+            f"下载 {_kb(deep[1])}，累计耗时 {deep[2]:.1f}s"
+        )
+        if deep[0]:
+            # 被淘汰的条目跳过了深度检测，按通过条目的深度检测平均开销估算；
+            # 快速检测本身的开销见上一行，未从中扣除
+            saved_bytes = dropped * deep[1] / deep[0]
+            saved_time = dropped * deep[2] / deep[0]
+            text += (
+                f"\n跳过深度检测 {dropped} 个，估计节省: 下载 {_kb(saved_bytes)}，"
+                f"检测耗时 {saved_time:.1f}s"
+            )
+        return text
+
+    def stop(self):
+        self.stop_requested = True
+        self.cancel.cancel()
+        if self.scheduler:
+            self.scheduler.wake()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.async_checker:
+            self.async_checker.stop()
+        if self.verifier:
+            self.verifier.stop()
+        if self.bandwidth:
+            self.bandwidth.close()
+
+
+def _cache_mode(run_speed_test, sustain_seconds, verify_ffprobe, hls_policy, samples):
+    # 持续测速时长和 HLS 抽样分片数只在测速时影响结论
+    if not run_speed_test:
+        sustain_seconds, samples = 0, 0
+    return (
+        f"speed={int(bool(run_speed_test))} sustain={sustain_seconds:g} "
+        f"ffprobe={int(bool(verify_ffprobe))} hls={hls_policy}/{samples}"
+    )
+
+
+def _fan_out(result, index, link_info):
+    # 复制检测结论，换成另一个条目的序号、名称、URL 和属性
+    return dict(
+        result,
+        index=index + 1,
+        name=link_info["name"],
+        url=link_info["url"],
+        attrs=link_info.get("attrs") or {},
+    )
+
+
+def _kb(size):
+    return f"{size / 1024:.0f} KB"
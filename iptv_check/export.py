@@ -0,0 +1,172 @@
+import csv
+import importlib.util
+import json
+import os
+import time
+
+from .diff import REPORT_SECTIONS
+from .playlist import format_extinf
+from .results import RECORD_FIELDS
+
+EXPORT_FORMATS = ("m3u", "json", "csv", "parquet")
+DEFAULT_EXPORT_FORMAT = "m3u"
+# pyarrow 为可选依赖，只在导出 Parquet 时才导入 (导入较慢，不拖慢启动)
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+# 写文件的缓冲区大小，以及每次 writelines 拼接的行数
+WRITE_BUFFER = 1024 * 1024
+BATCH_ROWS = 4096
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def export_paths(export_dir, base_name):
+    valid_path = os.path.join(export_dir, f"{base_name}_有效源.m3u")
+    invalid_path = os.path.join(export_dir, f"{base_name}_无效源.txt")
+    return valid_path, invalid_path
+
+
+def table_path(export_dir, base_name, export_format):
+    return os.path.join(export_dir, f"{base_name}_检测结果.{export_format}")
+
+
+def report_path(export_dir, base_name):
+    return os.path.join(export_dir, f"{base_name}_变更报告.txt")
+
+
+def _batches(lines):
+    # 每 BATCH_ROWS 行拼成一批交给 writelines，减少逐行 write 的调用开销
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_lines(file_path, lines, header=""):
+    with open(file_path, "w", encoding="utf-8", buffering=WRITE_BUFFER) as f:
+        f.write(header)
+        for batch in _batches(lines):
+            f.writelines(batch)
+
+
+def write_valid_m3u(file_path, records):
+    # records 为 ResultStore.records() 产出的元组
+    _write_lines(
+        file_path,
+        (
+            f"{format_extinf(record[1], record[10])}\n{record[2]}\n"
+            for record in records
+        ),
+        "#EXTM3U\n",
+    )
+
+
+def write_invalid_txt(file_path, records):
+    _write_lines(
+        file_path,
+        (f"{record[1]},{record[2]} # 错误: {record[9]}\n" for record in records),
+    )
+
+
+def write_json(file_path, records):
+    # 一个 JSON 数组，每个结果一个对象 (字段见 RECORD_FIELDS)，每行一个元素，逐条写出
+    encode = _JSON_ENCODER.encode
+    lines = (
+        ("[\n" if number == 0 else ",\n") + encode(dict(zip(RECORD_FIELDS, record)))
+        for number, record in enumerate(records)
+    )
+    with open(file_path, "w", encoding="utf-8", buffering=WRITE_BUFFER) as f:
+        empty = True
+        for batch in _batches(lines):
+            f.writelines(batch)
+            empty = False
+        f.write("[]\n" if empty else "\n]\n")
+
+
+def write_csv(file_path, records):
+    # 带 BOM 的 UTF-8，Excel 可直接打开；#EXTINF 属性以 JSON 文本写入 attrs 列
+    encode = _JSON_ENCODER.encode
+    with open(
+        file_path, "w", encoding="utf-8-sig", newline="", buffering=WRITE_BUFFER
+    ) as f:
+        writer = csv.writer(f)
+        writer.writerow(RECORD_FIELDS)
+        rows = (
+            record[:10] + (encode(record[10]) if record[10] else "",)
+            for record in records
+        )
+        for batch in _batches(rows):
+            writer.writerows(batch)
+
+
+def write_parquet(file_path, records):
+    # 按 BATCH_ROWS 行一组写入，内存占用与结果数无关；
+    # 速度中不是数字的值 (如 "∞") 写为空，attrs 为 JSON 文本
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("导出 Parquet 需要安装 pyarrow: pip install pyarrow")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("index", pa.int64()),
+            ("name", pa.string()),
+            ("url", pa.string()),
+            ("status", pa.dictionary(pa.int8(), pa.string())),
+            ("latency", pa.int64()),
+            ("speed", pa.float64()),
+            ("codec", pa.dictionary(pa.int32(), pa.string())),
+            ("resolution", pa.dictionary(pa.int32(), pa.string())),
+            ("bitrate", pa.int64()),
+            ("details", pa.dictionary(pa.int32(), pa.string())),
+            ("attrs", pa.string()),
+        ]
+    )
+    encode = _JSON_ENCODER.encode
+    with pq.ParquetWriter(file_path, schema) as writer:
+        for batch in _batches(records):
+            columns = [list(column) for column in zip(*batch)]
+            columns[5] = [
+                speed if isinstance(speed, float) else None for speed in columns[5]
+            ]
+            columns[10] = [encode(attrs) if attrs else None for attrs in columns[10]]
+            arrays = [
+                (
+                    pa.array(column).dictionary_encode()
+                    if pa.types.is_dictionary(field.type)
+                    else pa.array(column, type=field.type)
+                )
+                for column, field in zip(columns, schema)
+            ]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+
+TABLE_WRITERS = {"json": write_json, "csv": write_csv, "parquet": write_parquet}
+
+
+def export_results(store, export_dir, base_name, export_format=DEFAULT_EXPORT_FORMAT):
+    # 按各视图当前的排序直接从 ResultStore 导出，返回写出的文件路径。
+    # m3u: 有效源导出为可直接播放的 .m3u，无效源连同错误信息导出为 .txt；
+    # json / csv / parquet: 全部结果写入一个表格文件
+    if export_format == "m3u":
+        valid_path, invalid_path = export_paths(export_dir, base_name)
+        write_valid_m3u(valid_path, store.records(store.views["valid"]))
+        write_invalid_txt(invalid_path, store.records(store.views["invalid"]))
+        return valid_path, invalid_path
+    file_path = table_path(export_dir, base_name, export_format)
+    TABLE_WRITERS[export_format](file_path, store.records(store.views["all"]))
+    return (file_path,)
+
+
+def write_change_report(file_path, report):
+    # 增量检测的变更报告，每个分类下每行一个 “频道名称,URL”
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(f"# 变更报告 {time.strftime('%Y-%m-%d %H:%M')}\n")
+        for name, label in REPORT_SECTIONS:
+            entries = report[name]
+            f.write(f"\n## {label} ({len(entries)})\n")
+            for channel, url in entries:
+                f.write(f"{channel},{url}\n")
+    return file_path
@@ -0,0 +1,239 @@
+# 可选的 ffprobe 验证：对已通过深度检测的链接再用 ffprobe 解封装并解码开头几秒，
+# 找出能下载但无法解码的源。子进程数量有上限，超时或停止检测时强制结束。
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_FFPROBE = "ffprobe"
+# 也可以通过环境变量指定 ffprobe 命令，如 "python benchmarks/fake_ffprobe.py"
+FFPROBE_ENV = "IPTV_FFPROBE"
+DEFAULT_PROBE_WORKERS = 4
+DEFAULT_PROBE_TIMEOUT = 20
+# 每个源解码多少秒的数据
+DECODE_SECONDS = 2
+
+CODEC_NAMES = {
+    "h264": "H.264",
+    "hevc": "HEVC",
+    "mpeg2video": "MPEG-2",
+    "mpeg4": "MPEG-4",
+    "cavs": "AVS",
+    "avs2": "AVS2",
+    "av1": "AV1",
+    "vp9": "VP9",
+    "aac": "AAC",
+    "aac_latm": "AAC",
+    "mp2": "MP2",
+    "mp3": "MP3",
+    "ac3": "AC-3",
+    "eac3": "E-AC-3",
+    "opus": "Opus",
+}
+
+
+def find_ffprobe(path=None):
+    # 返回 ffprobe 的命令参数列表，找不到时返回 None
+    command = path or os.environ.get(FFPROBE_ENV) or DEFAULT_FFPROBE
+    argv = shlex.split(command, posix=os.name != "nt")
+    if not argv:
+        return None
+    executable = shutil.which(argv[0])
+    return [executable] + argv[1:] if executable else None
+
+
+def build_command(argv, url, timeout):
+    return argv + [
+        "-v",
+        "error",
+        "-hide_banner",
+        "-rw_timeout",
+        str(int(timeout * 1_000_000)),
+        "-read_intervals",
+        f"%+{DECODE_SECONDS}",
+        "-count_frames",
+        "-show_format",
+        "-show_streams",
+        "-print_format",
+        "json",
+        url,
+    ]
+
+
+def parse_output(text):
+    # 返回 {"codec", "resolution", "bitrate" (kb/s，未知为 0), "frames"}；
+    # 没有音视频流或视频解码不出画面时抛出 ValueError
+    try:
+        data = json.loads(text or "{}")
+    except ValueError:
+        raise ValueError("ffprobe: 输出无法解析") from None
+    streams = data.get("streams") or []
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    if video is None and audio is None:
+        raise ValueError("ffprobe: 未找到音视频流")
+    frames = _int(video.get("nb_read_frames")) if video else None
+    if video is not None and frames == 0:
+        raise ValueError("ffprobe: 视频无法解码")
+    codec = "/".join(
+        _codec_name(stream) for stream in (video, audio) if stream is not None
+    )
+    resolution = ""
+    if video and video.get("width") and video.get("height"):
+        resolution = f"{video['width']}x{video['height']}"
+    bit_rate = _int((data.get("format") or {}).get("bit_rate"))
+    if not bit_rate and video:
+        bit_rate = _int(video.get("bit_rate"))
+    return {
+        "codec": codec,
+        "resolution": resolution,
+        "bitrate": (bit_rate or 0) // 1000,
+        "frames": frames,
+    }
+
+
+def _codec_name(stream):
+    name = stream.get("codec_name") or ""
+    return CODEC_NAMES.get(name, name.upper())
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class FfprobePool:
+    # 最多 workers 个 ffprobe 进程同时运行。submit() 不阻塞，验证完成后在工作线程中
+    # 调用 callback(result)；stop() 结束所有正在运行的进程，之后不再回调
+    def __init__(
+        self,
+        path=None,
+        workers=DEFAULT_PROBE_WORKERS,
+        timeout=DEFAULT_PROBE_TIMEOUT,
+        metrics=None,
+    ):
+        self.argv = find_ffprobe(path)
+        if self.argv is None:
+            raise RuntimeError(f"找不到 ffprobe: {path or DEFAULT_FFPROBE}")
+        self.timeout = timeout
+        self.metrics = metrics
+        self.stopped = False
+        self.verified = self.rejected = self.timeouts = 0
+        self.pending = 0  # 已提交、尚未验证完的数量
+        self._processes = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(workers)), thread_name_prefix="ffprobe"
+        )
+
+    def submit(self, result, callback, url=None):
+        # url 为实际交给 ffprobe 的地址 (如 udpxy 改写后的地址)，默认为结果中的 URL
+        with self._lock:
+            self.pending += 1
+        try:
+            self._executor.submit(self._verify, result, callback, url)
+        except RuntimeError:  # 已停止
+            pass
+
+    def _verify(self, result, callback, url):
+        try:
+            self._run(result, callback, url)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _run(self, result, callback, url):
+        if self.stopped:
+            return
+        start_time = time.time()
+        try:
+            process = subprocess.Popen(
+                build_command(self.argv, url or result["url"], self.timeout),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                # Windows 下不弹出控制台窗口
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            )
+        except OSError:
+            self._reject(result, "ffprobe 启动失败")
+            callback(result)
+            return
+        with self._lock:
+            self._processes.add(process)
+        if self.stopped:  # stop() 可能发生在进程启动和登记之间
+            process.kill()
+        try:
+            stdout, stderr = process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            stdout, stderr = None, b""
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        if self.stopped:
+            return
+        result["elapsed"] += time.time() - start_time
+        if self.metrics is not None:
+            self.metrics.observe("ffprobe", time.time() - start_time)
+        if stdout is None:
+            with self._lock:
+                self.timeouts += 1
+            self._reject(result, f"ffprobe 超时 (>{self.timeout}s)")
+        elif process.returncode != 0:
+            self._reject(result, _error_line(stderr))
+        else:
+            try:
+                self._accept(result, parse_output(stdout.decode("utf-8", "ignore")))
+            except ValueError as e:
+                self._reject(result, str(e))
+        callback(result)
+
+    def _accept(self, result, info):
+        with self._lock:
+            self.verified += 1
+        result["codec"] = info["codec"] or result["codec"]
+        result["resolution"] = info["resolution"] or result["resolution"]
+        result["bitrate"] = info["bitrate"]
+        suffix = f"码率 {info['bitrate'] / 1000:.1f}M" if info["bitrate"] else "OK"
+        result["details"] += f" | ffprobe {suffix}"
+
+    def _reject(self, result, details):
+        with self._lock:
+            self.rejected += 1
+        result.update({"status": "无效", "latency": "-", "speed": "-"})
+        result["details"] = details
+
+    def close(self, wait=True):
+        # wait 为 True 时等待已提交的验证全部完成
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def stop(self):
+        self.stopped = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def summary(self):
+        return (
+            f"ffprobe: 通过 {self.verified} 个，未通过 {self.rejected} 个"
+            f"，其中超时 {self.timeouts} 个"
+        )
+
+
+def _error_line(stderr):
+    # ffprobe 出错时取 stderr 的最后一行作为错误信息
+    lines = (stderr or b"").decode("utf-8", "ignore").strip().splitlines()
+    return f"ffprobe: {lines[-1][:120]}" if lines else "ffprobe: 无法打开"
@@ -0,0 +1,305 @@
+# HLS 分析：解析主播放列表 (master playlist)，按 BANDWIDTH 选择变体并跟随到媒体播放列表，
+# 抽样下载若干分片，用 “分片时长 / 下载耗时” 得到实时率 (>=1 表示下载速度跟得上播放)。
+# 每个直播源的下载量受 byte_budget 限制，单个列表 (含顶层列表) 另有 MAX_PLAYLIST_BYTES 上限。
+import re
+import time
+from urllib.parse import urljoin
+
+from . import ts_inspect
+
+DEFAULT_POLICY = "highest"
+VARIANT_POLICIES = ("highest", "lowest", "all")
+DEFAULT_SAMPLES = 2
+DEFAULT_BYTE_BUDGET = 4 * 1024 * 1024
+# 主播放列表最多嵌套几层
+MAX_DEPTH = 3
+CHUNK_SIZE = 16 * 1024
+# 单个 m3u8 列表最多读取的数据量，超过时判为无效 (源站返回无限长的 “列表” 时不会一直读下去)
+MAX_PLAYLIST_BYTES = 1024 * 1024
+
+_ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attributes(text):
+    return {k: v.strip('"') for k, v in _ATTR_RE.findall(text)}
+
+
+def parse_playlist(base_url, text):
+    # 返回 {"variants": [{"bandwidth", "url", "resolution"}], "segments": [(时长, URL)], "endlist"}
+    if not text.strip().startswith("#EXTM3U"):
+        raise ValueError("非标准M3U8内容")
+    variants, segments = [], []
+    stream_inf, duration, endlist = None, None, False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            stream_inf = parse_attributes(line.split(":", 1)[1])
+        elif line.startswith("#EXTINF:"):
+            try:
+                duration = float(line[8:].split(",", 1)[0])
+            except ValueError:
+                duration = None
+        elif line.startswith("#EXT-X-ENDLIST"):
+            endlist = True
+        elif not line.startswith("#"):
+            url = urljoin(base_url, line)
+            if stream_inf is not None:
+                try:
+                    bandwidth = int(stream_inf.get("BANDWIDTH", 0))
+                except ValueError:
+                    bandwidth = 0
+                variants.append(
+                    {
+                        "bandwidth": bandwidth,
+                        "url": url,
+                        "resolution": stream_inf.get("RESOLUTION", ""),
+                    }
+                )
+            else:
+                segments.append((duration, url))
+            stream_inf, duration = None, None
+    if not variants and not segments:
+        raise ValueError("M3U8列表为空")
+    return {"variants": variants, "segments": segments, "endlist": endlist}
+
+
+def choose_variants(variants, policy=DEFAULT_POLICY):
+    ordered = sorted(variants, key=lambda v: v["bandwidth"])
+    if policy == "lowest":
+        return ordered[:1]
+    if policy == "all":
+        return ordered[::-1]
+    return ordered[-1:]
+
+
+def pick_segments(playlist, samples):
+    # 直播取最新的分片 (播放器从列表末尾附近开始播放)，点播取开头的分片
+    segments = playlist["segments"]
+    count = max(1, samples)
+    return segments[:count] if playlist["endlist"] else segments[-count:]
+
+
+class HlsReport:
+    # 累计一个直播源的 HLS 抽样结果，并负责字节预算
+    def __init__(self, byte_budget=DEFAULT_BYTE_BUDGET):
+        self.remaining = byte_budget
+        self.bytes = 0
+        self.variants = []  # [(BANDWIDTH, 实时率或 None, 分片字节数, 下载耗时)]
+        # 第一个分片开头的数据及其 Content-Type，供内容识别
+        self.sniff, self.sniff_type = b"", ""
+        self.segment_seconds = []  # 每个抽样分片的下载耗时
+        self._reset_variant()
+
+    def _reset_variant(self):
+        self.media_seconds = self.download_seconds = 0.0
+        self.segment_bytes = 0
+
+    def spend(self, size):
+        self.bytes += size
+        self.remaining -= size
+
+    def chunk_limit(self):
+        return max(0, self.remaining)
+
+    def add_segment(self, duration, size, elapsed, complete, content_length):
+        # 被预算截断的分片按已下载比例折算时长；长度未知时无法折算，只计入字节
+        self.segment_bytes += size
+        self.segment_seconds.append(elapsed)
+        if not duration:
+            return
+        if not complete:
+            if not content_length:
+                return
+            duration *= size / content_length
+        self.media_seconds += duration
+        self.download_seconds += elapsed
+
+    def finish_variant(self, bandwidth):
+        rtf = None
+        if self.media_seconds and self.download_seconds:
+            rtf = self.media_seconds / self.download_seconds
+        self.variants.append(
+            (bandwidth, rtf, self.segment_bytes, self.download_seconds)
+        )
+        self._reset_variant()
+
+    @property
+    def rtf(self):
+        # 多个变体时取最差的一个
+        rates = [rtf for _, rtf, _, _ in self.variants if rtf is not None]
+        return min(rates) if rates else None
+
+    def speed_bytes(self):
+        # 用于速度测试的 (下载字节数, 耗时)
+        size = sum(v[2] for v in self.variants)
+        elapsed = sum(v[3] for v in self.variants)
+        return size, elapsed
+
+    def details(self):
+        if not self.variants:
+            return ""
+        parts = []
+        rtf = self.rtf
+        if rtf is not None:
+            parts.append(f"实时率 {rtf:.1f}x" + (" (实时率不足)" if rtf < 1 else ""))
+        if len(self.variants) > 1:
+            playable = sum(1 for _, r, _, _ in self.variants if r is None or r >= 1)
+            parts.append(f"变体 {playable}/{len(self.variants)}")
+        bandwidth = self.variants[0][0]
+        if len(self.variants) == 1 and bandwidth:
+            parts.append(f"码率 {bandwidth / 1e6:.1f}M")
+        return " | HLS " + " ".join(parts) if parts else ""
+
+
+def parse_length(value):
+    # Content-Length 缺失或无法解析 (非数字、多个值以逗号合并) 时为 0，即长度未知
+    try:
+        return max(0, int(value or 0))
+    except ValueError:
+        return 0
+
+
+class PlaylistRead:
+    # 一个列表的读取状态：传输层把收到的数据块依次交给 feed()，读完后由 text() 取得内容。
+    # 最多读取 limit (剩余字节预算) 和 MAX_PLAYLIST_BYTES 中较小者，超过时抛出 ValueError
+    def __init__(self, limit):
+        self.limit = min(limit, MAX_PLAYLIST_BYTES)
+        self.chunks, self.size = [], 0
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.limit:
+            raise ValueError("M3U8列表过大")
+        self.chunks.append(chunk)
+
+    def text(self):
+        return b"".join(self.chunks).decode("utf-8", errors="ignore")
+
+
+class SegmentRead:
+    # 一个分片的读取状态：传输层把收到的数据块依次交给 feed()，返回 True 时停止读取，
+    # 读取结束后填写 content_type 和 content_length (未知时为 0)
+    def __init__(self, report, probe_only):
+        # probe_only 时只验证分片能返回数据，取到第一块即可
+        self.limit = 1 if probe_only else report.chunk_limit()
+        self.sniffer = None if probe_only or report.sniff else ts_inspect.Sniffer()
+        self.first = b""
+        self.size, self.complete = 0, True
+        self.content_type, self.content_length = "", 0
+        self.start = time.time()
+
+    def feed(self, chunk):
+        if not self.first:
+            self.first = chunk
+        self.size += len(chunk)
+        if self.sniffer is not None:
+            self.sniffer.feed(chunk)
+        if self.size >= self.limit:
+            self.complete = False
+            return True
+        return False
+
+
+PLAYLIST, SEGMENT = "playlist", "segment"
+
+
+def walk(url, text, report, policy=DEFAULT_POLICY, samples=DEFAULT_SAMPLES):
+    # 与传输层无关的抽样流程 (生成器)，两个引擎共用：
+    #   产出 (PLAYLIST, URL, PlaylistRead)：传输层按 PlaylistRead 读取整个子列表后 send(None)；
+    #   产出 (SEGMENT, URL, SegmentRead)：传输层按 SegmentRead 读取分片后 send(None)。
+    # 请求失败时由传输层直接抛出异常。samples 为 0 时只验证第一个分片能返回数据，不计算实时率
+    report.spend(len(text))
+    yield from _walk_playlist(parse_playlist(url, text), 0, report, policy, samples)
+
+
+def _walk_playlist(playlist, depth, report, policy, samples, bandwidth=0):
+    if playlist["variants"]:
+        if depth >= MAX_DEPTH:
+            raise ValueError("M3U8嵌套过深")
+        for variant in choose_variants(playlist["variants"], policy):
+            if report.remaining <= 0:
+                break
+            read = PlaylistRead(report.chunk_limit())
+            yield PLAYLIST, variant["url"], read
+            report.spend(read.size)
+            child = parse_playlist(variant["url"], read.text())
+            yield from _walk_playlist(
+                child, depth + 1, report, policy, samples, variant["bandwidth"]
+            )
+        return
+    for duration, segment_url in pick_segments(playlist, samples):
+        if report.remaining <= 0:
+            break
+        read = SegmentRead(report, not samples)
+        yield SEGMENT, segment_url, read
+        if not read.size:
+            raise ValueError("无数据流")
+        report.spend(read.size)
+        if not samples:
+            report.sniff, report.sniff_type = read.first, read.content_type
+            return
+        if read.sniffer is not None:
+            report.sniff, report.sniff_type = read.sniffer.data, read.content_type
+        report.add_segment(
+            duration,
+            read.size,
+            time.time() - read.start,
+            read.complete,
+            read.content_length,
+        )
+    report.finish_variant(bandwidth)
+
+
+def read_playlist(response, read, cancel=None):
+    # 同步传输层按 PlaylistRead 读取整个列表 (requests 的流式响应)，返回文本
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if cancel is not None:
+            cancel.check()
+        read.feed(chunk)
+    return read.text()
+
+
+def analyze(
+    pool,
+    url,
+    text,
+    timeout,
+    policy=DEFAULT_POLICY,
+    samples=DEFAULT_SAMPLES,
+    byte_budget=DEFAULT_BYTE_BUDGET,
+    bandwidth=None,
+    cancel=None,
+):
+    # 同步传输层，使用共享连接池；bandwidth 为测速共用的 BandwidthBudget，按上限控制读取速度；
+    # cancel (CancelToken) 在每个请求前和读取分片时检查
+    report = HlsReport(byte_budget)
+    steps = walk(url, text, report, policy, samples)
+    chunk_size = CHUNK_SIZE if bandwidth is None else bandwidth.chunk_size(CHUNK_SIZE)
+    while True:
+        try:
+            kind, target, read = next(steps)
+        except StopIteration:
+            return report
+        if cancel is not None:
+            cancel.check()
+        if kind == PLAYLIST:
+            with pool.get(target, timeout=timeout, stream=True) as r:
+                r.raise_for_status()
+                read_playlist(r, read, cancel)
+            if bandwidth is not None:
+                bandwidth.throttle(read.size, cancel)
+            continue
+        with pool.get(target, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if cancel is not None:
+                    cancel.check()
+                done = read.feed(chunk)
+                if bandwidth is not None:
+                    bandwidth.throttle(len(chunk), cancel)
+                if done:
+                    break
+            read.content_type = r.headers.get("Content-Type", "")
+            read.content_length = parse_length(r.headers.get("Content-Length"))
@@ -0,0 +1,201 @@
+# 多源合并：一次读入多个源文件 (或目录下的全部源文件)，按规范化的频道名称建立索引，
+# 同一频道在各文件中的 URL 合并为它的镜像列表 (跨文件按规范化 URL 去重)。
+# 检测时各频道的镜像轮流送入引擎，某个频道已有 K 个有效镜像后，其余尚未开始的镜像直接跳过；
+# 导出的 .m3u 每个频道只保留有效镜像，按速度和延迟排序。
+import os
+import re
+import threading
+import unicodedata
+
+from .engine import SKIPPED_DETAILS
+from .playlist import format_extinf, iter_playlist
+from .urls import normalize_url
+
+DEFAULT_GOOD_MIRRORS = 3
+PLAYLIST_SUFFIXES = (".m3u", ".m3u8", ".txt")
+MERGE_BASE_NAME = "合并"
+# 括号内的附注，如 “(备用)”“[1080P]”“【高清】”
+_BRACKETS_RE = re.compile(r"[(\[【][^)\]】]*[)\]】]")
+# 清晰度、编码标记，不同源对同一频道的写法往往只差在这里
+_QUALITY_RE = re.compile(
+    r"(?<![A-Z0-9])(?:FHD|UHD|HD|SD|4K|8K|2160P|1080[PI]|720P|576[PI]|480P"
+    r"|HEVC|H\.?265|H\.?264)(?![A-Z0-9])|超高清|超清|高清|标清|蓝光"
+)
+_SEPARATORS_RE = re.compile(r"[\s\-_.·|:]+")
+
+
+def channel_key(name):
+    # 规范化频道名称作为索引键: “CCTV-1 高清”“cctv1 (HD)”“ＣＣＴＶ１” 都得到 “CCTV1”。
+    # 没有名称的条目返回空字符串，由调用方按 URL 单独成组
+    if not name or name == "N/A":
+        return ""
+    text = unicodedata.normalize("NFKC", name).upper()
+    stripped = _BRACKETS_RE.sub("", text)
+    stripped = _SEPARATORS_RE.sub("", _QUALITY_RE.sub("", stripped))
+    # 整个名称都是附注或标记时保留原文
+    return stripped or _SEPARATORS_RE.sub("", text)
+
+
+def expand_inputs(paths):
+    # 目录按文件名顺序递归展开为其中的源文件，文件和订阅地址原样保留
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(PLAYLIST_SUFFIXES):
+                    yield os.path.join(root, name)
+
+
+class Channel:
+    def __init__(self, key, name, attrs):
+        # 名称和属性取自第一次出现的条目
+        self.key, self.name, self.attrs = key, name, attrs
+        self.mirrors = []  # 各文件中该频道的链接信息，按读入顺序
+        self.good = []  # 有效镜像的检测结果
+        self.checked = 0  # 实际检测过的镜像数
+
+
+class ChannelIndex:
+    def __init__(self):
+        self.channels = {}  # 规范化名称 -> Channel，按首次出现的顺序
+        self._by_url = {}  # 规范化 URL -> Channel
+        self.files, self.entries, self.duplicates = 0, 0, 0
+
+    def add_file(self, path):
+        self.add_entries(iter_playlist(path))
+
+    def add_entries(self, entries):
+        # 一个源文件 (或订阅) 的全部条目
+        self.files += 1
+        for link_info in entries:
+            self.add(link_info)
+
+    def add(self, link_info):
+        self.entries += 1
+        url_key = normalize_url(link_info["url"])
+        if url_key in self._by_url:
+            # 同一 URL 出现在多个文件或多个频道名下时只检测一次，归入第一次出现的频道
+            self.duplicates += 1
+            return
+        key = channel_key(link_info["name"]) or f"\0{url_key}"
+        channel = self.channels.get(key)
+        if channel is None:
+            channel = Channel(key, link_info["name"], link_info.get("attrs") or {})
+            self.channels[key] = channel
+        channel.mirrors.append(link_info)
+        self._by_url[url_key] = channel
+
+    def channel_of(self, url):
+        return self._by_url.get(normalize_url(url))
+
+    @property
+    def mirrors(self):
+        return self.entries - self.duplicates
+
+
+class MirrorMerge:
+    # 一次合并检测：links() 交给引擎，skip / on_result 作为引擎的 skip 与结果回调
+    def __init__(self, index, good_mirrors=DEFAULT_GOOD_MIRRORS):
+        self.index = index
+        self.good_mirrors = max(1, int(good_mirrors))
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def satisfied(self, channel):
+        return len(channel.good) >= self.good_mirrors
+
+    def links(self):
+        # 按轮次取各频道的第 n 个镜像，同一频道的镜像在队列中相隔一整轮，
+        # 前面的镜像有结果后才轮到后面的，已满足的频道不再产出
+        channels = list(self.index.channels.values())
+        depth = 0
+        while channels:
+            remaining = []
+            for channel in channels:
+                if depth >= len(channel.mirrors):
+                    continue
+                if self.satisfied(channel):
+                    with self._lock:
+                        self.skipped += len(channel.mirrors) - depth
+                    continue
+                remaining.append(channel)
+                yield channel.mirrors[depth]
+            channels = remaining
+            depth += 1
+
+    def skip(self, link_info):
+        # 检测开始前由引擎调用：所属频道已有足够的有效镜像时跳过
+        channel = self.index.channel_of(link_info["url"])
+        if channel is None or not self.satisfied(channel):
+            return False
+        with self._lock:
+            self.skipped += 1
+        return True
+
+    def on_result(self, result):
+        if result["details"] == SKIPPED_DETAILS:
+            return
+        channel = self.index.channel_of(result["url"])
+        if channel is None:
+            return
+        with self._lock:
+            channel.checked += 1
+            if result["status"] == "有效":
+                channel.good.append(result)
+
+    def ranked(self):
+        # (频道, 按质量排序的有效镜像)，按频道首次出现的顺序
+        for channel in self.index.channels.values():
+            yield channel, sorted(channel.good, key=rank_key)
+
+    def summary(self):
+        channels = self.index.channels.values()
+        covered = sum(1 for channel in channels if channel.good)
+        checked = sum(channel.checked for channel in channels)
+        return (
+            f"合并: {self.index.files} 个文件 {self.index.entries} 条，"
+            f"重复 URL {self.index.duplicates} 条，{len(channels)} 个频道 "
+            f"{self.index.mirrors} 个镜像；有效频道 {covered} 个，"
+            f"实际检测 {checked} 个镜像，提前结束跳过 {self.skipped} 个"
+        )
+
+
+def rank_key(result):
+    # 有测速结果时速度优先，其次延迟；未测速时只按延迟排序
+    return (-_number(result["speed"], 0.0), _number(result["latency"], float("inf")))
+
+
+def _number(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):  # "-"、"N/A"
+        return default
+
+
+def merge_paths(export_dir, base_name=MERGE_BASE_NAME):
+    merged_path = os.path.join(export_dir, f"{base_name}_有效源.m3u")
+    missing_path = os.path.join(export_dir, f"{base_name}_无有效源频道.txt")
+    return merged_path, missing_path
+
+
+def write_merged_m3u(file_path, merge):
+    # 每个频道使用统一的名称和属性，依次写出其有效镜像
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("#EXTM3U\n")
+        for channel, results in merge.ranked():
+            extinf = format_extinf(channel.name, channel.attrs)
+            for result in results:
+                f.write(f"{extinf}\n{result['url']}\n")
+
+
+def write_missing_txt(file_path, merge):
+    # 没有任何有效镜像的频道，每行 “频道名称 # 镜像数”
+    with open(file_path, "w", encoding="utf-8") as f:
+        for channel, results in merge.ranked():
+            if not results:
+                f.write(
+                    f"{channel.name} # 共 {len(channel.mirrors)} 个镜像，无有效镜像\n"
+                )
@@ -0,0 +1,317 @@
+# 检测过程的结构化指标：各阶段耗时直方图 (DNS、建立连接、TLS、首字节、HLS 分片、测速、ffprobe)、
+# 按信息栏文字归类的错误分布，以及定时采样的排队数和工作线程占用率。
+# 可逐行写入 JSON (每个检测一行、每次采样一行、结束时一行汇总)，
+# 也可以通过 MetricsServer 以 Prometheus 文本格式提供给监控系统抓取。
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 直方图分桶上限 (秒)，最后一个桶为 +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DEFAULT_SAMPLE_INTERVAL = 1.0
+QUANTILES = (0.5, 0.9, 0.99)
+# 阶段名及汇总中显示的名称；线程池引擎中 connect 在未预解析时包含 DNS，
+# 异步引擎无法拆分 TCP 和 TLS，connect 包含 TLS 握手
+PHASES = (
+    ("dns", "DNS"),
+    ("connect", "连接"),
+    ("tls", "TLS"),
+    ("ttfb", "首字节"),
+    ("segment", "分片"),
+    ("speed", "测速"),
+    ("ffprobe", "ffprobe"),
+    ("total", "总计"),
+)
+# 检测结论分类及汇总中显示的名称，见 error_class()
+OUTCOMES = (
+    ("ok", "有效"),
+    ("timeout", "超时"),
+    ("http_4xx", "HTTP 4xx"),
+    ("http_5xx", "HTTP 5xx"),
+    ("connect", "连接错误"),
+    ("dns", "DNS解析失败"),
+    ("html", "返回网页"),
+    ("bad_stream", "数据流错误"),
+    ("playlist", "M3U8错误"),
+    ("protocol", "RTSP/RTMP错误"),
+    ("ffprobe", "ffprobe未通过"),
+    ("other", "其他"),
+)
+_OUTCOME_PREFIXES = (
+    ("超时", "timeout"),
+    ("连接错误", "connect"),
+    ("DNS解析失败", "dns"),
+    ("返回网页", "html"),
+    ("TS同步字节错误", "bad_stream"),
+    ("无数据流", "bad_stream"),
+    ("非标准M3U8", "playlist"),
+    ("M3U8", "playlist"),
+    ("RTSP", "protocol"),
+    ("RTMP", "protocol"),
+    ("非RTSP", "protocol"),
+    ("地址格式错误", "protocol"),
+    ("非RTP", "protocol"),
+    ("ffprobe", "ffprobe"),
+)
+
+
+def error_class(result):
+    if result["status"] == "有效":
+        return "ok"
+    details = result["details"]
+    if details.startswith("HTTP错误: "):
+        code = details[len("HTTP错误: ") :]
+        return "http_5xx" if code.startswith("5") else "http_4xx"
+    for prefix, outcome in _OUTCOME_PREFIXES:
+        if details.startswith(prefix):
+            return outcome
+    return "other"
+
+
+def add_timing(timings, phase, seconds):
+    timings.setdefault(phase, []).append(seconds)
+
+
+class Histogram:
+    # 固定分桶的累积直方图，内存占用与样本数无关；分位数按桶内线性插值估算
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count, self.sum = 0, 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):  # +Inf 桶无法插值，取最后一个有限上限
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        data = {"count": self.count, "sum": round(self.sum, 6)}
+        for q in QUANTILES:
+            value = self.quantile(q)
+            data[f"p{round(q * 100)}"] = None if value is None else round(value, 6)
+        return data
+
+
+class Metrics:
+    # 可在多个检测线程中同时调用。jsonl_path 不为空时逐行写入 JSON；
+    # start() 启动采样线程，每 interval 秒调用一次 gauges() 记录排队数和占用率
+    def __init__(
+        self, jsonl_path=None, interval=DEFAULT_SAMPLE_INTERVAL, clock=time.time
+    ):
+        self.interval = interval
+        self.clock = clock
+        self.histograms = {name: Histogram() for name, _ in PHASES}
+        self.outcomes = dict.fromkeys((name for name, _ in OUTCOMES), 0)
+        self.gauges = {}
+        # 工作线程占用率的采样累计值，用于计算整个运行期间的平均值
+        self.utilization_sum, self.samples = 0.0, 0
+        self._lock = threading.Lock()
+        self._file = None
+        if jsonl_path:
+            self._file = open(jsonl_path, "a", encoding="utf-8")
+        self._sampler, self._stop = None, threading.Event()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            self.histograms[phase].observe(seconds)
+
+    def observe_result(self, result, timings, tier):
+        # 记录一次实际检测的各阶段耗时；timings 为 {阶段: [秒, ...]}，可为 None
+        timings = timings or {}
+        with self._lock:
+            for phase, values in timings.items():
+                for value in values:
+                    self.histograms[phase].observe(value)
+            self.histograms["total"].observe(result["elapsed"])
+        if self._file is not None:
+            self._write(
+                {
+                    "type": "result",
+                    "time": round(self.clock(), 3),
+                    "tier": tier,
+                    "index": result["index"],
+                    "url": result["url"],
+                    "status": result["status"],
+                    "class": error_class(result),
+                    "details": result["details"],
+                    "elapsed": round(result["elapsed"], 6),
+                    "timings": {
+                        phase: [round(v, 6) for v in values]
+                        for phase, values in timings.items()
+                    },
+                }
+            )
+
+    def count_outcome(self, result):
+        outcome = error_class(result)
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def sample(self, gauges):
+        # gauges 中的 active/workers 用于计算占用率
+        utilization = gauges.get("active", 0) / max(1, gauges.get("workers", 1))
+        gauges = dict(gauges, utilization=round(utilization, 4))
+        with self._lock:
+            self.gauges = gauges
+            self.utilization_sum += utilization
+            self.samples += 1
+        if self._file is not None:
+            self._write(
+                {"type": "sample", "time": round(self.clock(), 3), "gauges": gauges}
+            )
+            with self._lock:
+                self._file.flush()
+
+    def start(self, gauges):
+        self.stop()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, args=(gauges, self._stop), daemon=True
+        )
+        self._sampler.start()
+
+    def _sample_loop(self, gauges, stop):
+        while not stop.wait(self.interval):
+            self.sample(gauges())
+        # 运行结束时再采样一次，最后的排队数反映结束时的状态
+        self.sample(gauges())
+
+    def stop(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "phases": {
+                    name: histogram.snapshot()
+                    for name, histogram in self.histograms.items()
+                },
+                "outcomes": dict(self.outcomes),
+                "gauges": dict(self.gauges),
+                "mean_utilization": round(
+                    self.utilization_sum / self.samples if self.samples else 0.0, 4
+                ),
+            }
+
+    def close(self):
+        # 写入汇总行并关闭文件
+        self.stop()
+        if self._file is not None:
+            self._write(
+                dict(self.snapshot(), type="summary", time=round(self.clock(), 3))
+            )
+            with self._lock:
+                self._file.close()
+                self._file = None
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def summary(self):
+        with self._lock:
+            phases = []
+            for name, label in PHASES:
+                h = self.histograms[name]
+                if h.count:
+                    phases.append(
+                        f"{label} {_ms(h.quantile(0.5))}/{_ms(h.quantile(0.99))}"
+                    )
+            outcomes = [
+                f"{label} {self.outcomes[name]}"
+                for name, label in OUTCOMES
+                if self.outcomes[name]
+            ]
+            utilization = self.utilization_sum / self.samples if self.samples else 0.0
+        text = "阶段耗时 p50/p99 (ms): " + ("，".join(phases) or "无")
+        text += "\n检测结论: " + ("，".join(outcomes) or "无")
+        if self.samples:
+            text += f"，平均线程占用率 {utilization * 100:.0f}%"
+        return text
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP iptv_check_phase_seconds 检测各阶段耗时",
+            "# TYPE iptv_check_phase_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(
+                    list(histogram.buckets) + ["+Inf"], histogram.counts
+                ):
+                    cumulative += count
+                    lines.append(
+                        f'iptv_check_phase_seconds_bucket{{phase="{name}",le="{bound}"}}'
+                        f" {cumulative}"
+                    )
+                lines.append(
+                    f'iptv_check_phase_seconds_sum{{phase="{name}"}} {histogram.sum:.6f}'
+                )
+                lines.append(
+                    f'iptv_check_phase_seconds_count{{phase="{name}"}} {histogram.count}'
+                )
+            lines += [
+                "# HELP iptv_check_results_total 按结论分类的检测数",
+                "# TYPE iptv_check_results_total counter",
+            ]
+            for name, count in self.outcomes.items():
+                lines.append(f'iptv_check_results_total{{outcome="{name}"}} {count}')
+            for name, value in self.gauges.items():
+                lines.append(f"# TYPE iptv_check_{name} gauge")
+                lines.append(f"iptv_check_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+class MetricsServer:
+    # 在后台线程中以 Prometheus 文本格式提供 /metrics；port 为 0 时自动选择端口
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f"http://{host}:{self.port}/metrics"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,353 @@
+# 持续监测：按计划反复检测同一组频道，记录每个 URL 的可用性历史。
+# 每轮的检测均匀分布在检测间隔内 (合计开始速率 = 频道数 / 间隔)，不会成批发出；
+# 轮与轮之间的间隔带随机抖动，多个监测实例不会同时发起请求。每轮上次失败的频道和重点频道排在最前。
+# 历史保存在 SQLite 中，每次检测只记一条 (频道, 时间, 延迟) 样本，超过保留天数的样本自动清理；
+# 可用率、平均延迟和连续成功/失败次数由历史计算，导出时可按这些条件筛选。
+import csv
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from .playlist import format_extinf
+from .urls import normalize_url
+
+DEFAULT_HISTORY_PATH = os.path.join(
+    os.path.expanduser("~"), ".iptv_check", "monitor.db"
+)
+DEFAULT_INTERVAL = 600  # 每轮检测间隔 (秒)
+DEFAULT_JITTER = 0.1  # 间隔的随机抖动比例，实际间隔为 interval * (1 ± jitter)
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_WINDOW_DAYS = 7  # 可用率、平均延迟的统计范围
+# 每轮的检测分布在间隔的前 SPREAD 部分，留出余量等待最后几条检测结束
+SPREAD = 0.9
+# 每累计多少条样本提交一次事务
+COMMIT_EVERY = 500
+# 样本中的延迟: 非负为有效 (毫秒)，DOWN 为无效，UNKNOWN_LATENCY 为有效但没有延迟数据
+DOWN = -1
+UNKNOWN_LATENCY = -2
+MONITOR_BASE_NAME = "监测"
+
+
+class Availability:
+    # 一个频道在统计范围内的可用性
+    def __init__(self, row):
+        (
+            self.name,
+            self.url,
+            attrs,
+            self.streak,
+            self.longest_down,
+            self.checked_at,
+            self.checks,
+            up,
+            self.mean_latency,
+        ) = row
+        self.attrs = json.loads(attrs) if attrs else {}
+        self.up = up or 0
+        # 统计范围内没有样本时可用率为 None
+        self.uptime = self.up * 100 / self.checks if self.checks else None
+
+
+class History:
+    def __init__(
+        self, path=DEFAULT_HISTORY_PATH, retention_days=DEFAULT_RETENTION_DAYS
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.retention = retention_days * 86400
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # streak: 大于 0 为连续有效次数，小于 0 为连续无效次数；longest_down: 最长连续无效次数
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS channels ("
+            " id INTEGER PRIMARY KEY,"
+            " key TEXT UNIQUE NOT NULL,"
+            " name TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " attrs TEXT NOT NULL,"
+            " streak INTEGER NOT NULL DEFAULT 0,"
+            " longest_down INTEGER NOT NULL DEFAULT 0,"
+            " checked_at INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS samples ("
+            " channel INTEGER NOT NULL,"
+            " at INTEGER NOT NULL,"
+            " latency INTEGER NOT NULL,"
+            " PRIMARY KEY (channel, at)) WITHOUT ROWID"
+        )
+        # 规范化 URL -> [频道 id, streak]，避免每条样本都查询频道表
+        self._channels = {
+            key: [channel_id, streak]
+            for channel_id, key, streak in self._conn.execute(
+                "SELECT id, key, streak FROM channels"
+            )
+        }
+
+    def streak(self, url):
+        # 该 URL 当前的连续有效 (正) / 无效 (负) 次数，没有记录时为 0
+        channel = self._channels.get(normalize_url(url))
+        return channel[1] if channel else 0
+
+    def record(self, result, now=None):
+        now = int(now or time.time())
+        valid = result["status"] == "有效"
+        latency = result["latency"]
+        if not valid:
+            latency = DOWN
+        elif not isinstance(latency, (int, float)):
+            latency = UNKNOWN_LATENCY
+        key = normalize_url(result["url"])
+        attrs = json.dumps(result.get("attrs") or {}, ensure_ascii=False)
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                cursor = self._conn.execute(
+                    "INSERT INTO channels (key, name, url, attrs) VALUES (?, ?, ?, ?)",
+                    (key, result["name"], result["url"], attrs),
+                )
+                channel = self._channels[key] = [cursor.lastrowid, 0]
+            streak = channel[1]
+            if valid:
+                streak = streak + 1 if streak > 0 else 1
+            else:
+                streak = streak - 1 if streak < 0 else -1
+            channel[1] = streak
+            # 名称和属性取最近一次检测时源文件中的写法
+            self._conn.execute(
+                "UPDATE channels SET name = ?, url = ?, attrs = ?, streak = ?,"
+                " longest_down = MAX(longest_down, ?), checked_at = ? WHERE id = ?",
+                (
+                    result["name"],
+                    result["url"],
+                    attrs,
+                    streak,
+                    -streak,
+                    now,
+                    channel[0],
+                ),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO samples VALUES (?, ?, ?)",
+                (channel[0], now, int(latency)),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= COMMIT_EVERY:
+                self._commit()
+
+    def _commit(self):
+        self._pending_writes = 0
+        self._conn.commit()
+
+    def prune(self, now=None):
+        # 删除超过保留天数的样本
+        now = now or time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM samples WHERE at < ?", (int(now - self.retention),)
+            )
+            self._commit()
+
+    def availability(self, window_days=DEFAULT_WINDOW_DAYS, now=None):
+        # 各频道最近 window_days 天的可用性，按首次记录的顺序
+        since = int((now or time.time()) - window_days * 86400)
+        with self._lock:
+            self._commit()
+            rows = self._conn.execute(
+                "SELECT c.name, c.url, c.attrs, c.streak, c.longest_down, c.checked_at,"
+                " COUNT(s.at), SUM(s.latency != ?),"
+                " AVG(CASE WHEN s.latency >= 0 THEN s.latency END)"
+                " FROM channels c LEFT JOIN samples s ON s.channel = c.id AND s.at >= ?"
+                " GROUP BY c.id ORDER BY c.id",
+                (DOWN, since),
+            ).fetchall()
+        return [Availability(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+
+def select(channels, min_uptime=0.0, max_latency=0, min_checks=1):
+    # 筛选可用率不低于 min_uptime (%)、平均延迟不超过 max_latency (毫秒，0 为不限) 的频道，
+    # 按可用率从高到低、平均延迟从低到高排序
+    selected = [
+        channel
+        for channel in channels
+        if channel.checks >= min_checks
+        and channel.uptime >= min_uptime
+        and channel.up
+        and (
+            not max_latency
+            or (
+                channel.mean_latency is not None and channel.mean_latency <= max_latency
+            )
+        )
+    ]
+    selected.sort(key=_rank_key)
+    return selected
+
+
+def _rank_key(channel):
+    latency = channel.mean_latency
+    return (-channel.uptime, float("inf") if latency is None else latency)
+
+
+class Monitor:
+    # load() 每轮调用一次，返回本轮要检测的链接信息 (源文件可在两轮之间修改)；
+    # make_engine(on_result, start_rate) 每轮创建一个新的检测引擎，轮与轮之间不共用去重结果
+    def __init__(
+        self,
+        load,
+        make_engine,
+        history,
+        interval=DEFAULT_INTERVAL,
+        jitter=DEFAULT_JITTER,
+        priority=None,
+        on_round=None,
+        clock=time.time,
+        rng=None,
+    ):
+        self.load, self.make_engine, self.history = load, make_engine, history
+        self.interval = max(1.0, float(interval))
+        self.jitter = min(max(0.0, float(jitter)), 0.5)
+        # priority(link_info) 返回 True 的为重点频道，排在上次失败的频道之后、其余频道之前
+        self.priority = priority
+        # on_round(monitor, stats) 在每轮结束后调用，stats 见 run_round()
+        self.on_round = on_round
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.rounds = 0
+        self.engine = None
+        self.next_round_at = None
+        self._stop = threading.Event()
+
+    def order(self, links):
+        # 上次失败的频道 (连续失败次数多的在前)，然后是重点频道，最后是其余频道；同一类中保持原顺序。
+        def rank(item):
+            position, link_info = item
+            streak = self.history.streak(link_info["url"])
+            if streak < 0:
+                return (0, streak, position)
+            if self.priority is not None and self.priority(link_info):
+                return (1, 0, position)
+            return (2, 0, position)
+
+        # 同一 URL 在一轮中只检测一次，每轮每个 URL 一条样本
+        seen, unique = set(), []
+        for link_info in links:
+            key = normalize_url(link_info["url"])
+            if key not in seen:
+                seen.add(key)
+                unique.append(link_info)
+        return [link_info for _, link_info in sorted(enumerate(unique), key=rank)]
+
+    def run_round(self):
+        # 检测一轮，返回 {"checked", "valid", "elapsed"}
+        links = self.order(list(self.load()))
+        stats = {"checked": 0, "valid": 0, "elapsed": 0.0}
+        if not links:
+            return stats
+        lock = threading.Lock()
+
+        def on_result(result):
+            self.history.record(result)
+            with lock:
+                stats["checked"] += 1
+                stats["valid"] += result["status"] == "有效"
+
+        start_rate = len(links) / (self.interval * SPREAD)
+        self.engine = self.make_engine(on_result, start_rate)
+        start = self.clock()
+        try:
+            if not self._stop.is_set():
+                self.engine.run(links)
+        finally:
+            stats["elapsed"] = self.clock() - start
+            self.history.prune()
+        return stats
+
+    def run(self, rounds=0):
+        # 阻塞运行 rounds 轮 (0 为一直运行)，直到 stop()；
+        # 下一轮在本轮开始后的 interval * (1 ± jitter) 秒开始，本轮超时未结束时紧接着开始
+        while not self._stop.is_set():
+            started = self.clock()
+            stats = self.run_round()
+            if self._stop.is_set():
+                return
+            self.rounds += 1
+            last = rounds and self.rounds >= rounds
+            delay = self.interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+            self.next_round_at = None if last else started + delay
+            if self.on_round is not None:
+                self.on_round(self, stats)
+            if last:
+                return
+            self._stop.wait(max(0.0, self.next_round_at - self.clock()))
+
+    def stop(self):
+        self._stop.set()
+        if self.engine is not None:
+            self.engine.stop()
+
+
+def monitor_paths(export_dir, base_name):
+    stable_path = os.path.join(export_dir, f"{base_name}_稳定源.m3u")
+    availability_path = os.path.join(export_dir, f"{base_name}_可用性.csv")
+    return stable_path, availability_path
+
+
+def write_stable_m3u(file_path, channels):
+    # channels 为 select() 筛选出的频道
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("#EXTM3U\n")
+        for channel in channels:
+            f.write(f"{format_extinf(channel.name, channel.attrs)}\n{channel.url}\n")
+
+
+def write_availability_csv(file_path, channels, window_days):
+    # 全部频道的可用性，带 BOM 的 UTF-8，Excel 可直接打开
+    with open(file_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            (
+                "name",
+                "url",
+                f"uptime_{window_days:g}d",
+                "checks",
+                "mean_latency",
+                "streak",
+                "longest_down",
+                "checked_at",
+            )
+        )
+        for channel in channels:
+            writer.writerow(
+                (
+                    channel.name,
+                    channel.url,
+                    "" if channel.uptime is None else f"{channel.uptime:.2f}",
+                    channel.checks,
+                    (
+                        ""
+                        if channel.mean_latency is None
+                        else f"{channel.mean_latency:.0f}"
+                    ),
+                    channel.streak,
+                    channel.longest_down,
+                    (
+                        time.strftime(
+                            "%Y-%m-%d %H:%M:%S", time.localtime(channel.checked_at)
+                        )
+                        if channel.checked_at
+                        else ""
+                    ),
+                )
+            )
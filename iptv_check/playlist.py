@@ -0,0 +1,59 @@
+import itertools
+import re
+
+# #EXTINF:-1 key="value" ...,频道名 —— 引号内的逗号不会截断频道名
+_EXTINF_RE = re.compile(r'#EXTINF:([^,"]*(?:"[^"]*"[^,"]*)*),(.*)')
+# 属性，如 tvg-id、tvg-logo、group-title
+_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+
+
+def parse_extinf(line):
+    match = _EXTINF_RE.match(line)
+    if match:
+        head, name = match.groups()
+    else:  # 引号不成对时退回到按第一个逗号切分
+        head, _, name = line.partition(",")
+    attrs = dict(_ATTR_RE.findall(head)) if '="' in head else {}
+    return name.strip() or "N/A", attrs
+
+
+def format_extinf(name, attrs=None):
+    attr_text = "".join(f' {k}="{v}"' for k, v in (attrs or {}).items())
+    return f"#EXTINF:-1{attr_text},{name}"
+
+
+def iter_lines(lines):
+    # 支持 M3U (#EXTINF + URL) 和 TXT ("频道名,URL") 两种格式，逐行解析、逐条产出
+    name, attrs = "N/A", {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#EXTM3U"):
+            continue
+        if line.startswith("#EXTINF:"):
+            name, attrs = parse_extinf(line)
+        elif "://" in line and not line.startswith("#"):
+            url = line
+            if "," in line and "://" in line.split(",", 1)[1]:
+                parts = line.split(",", 1)
+                name, url = parts[0].strip(), parts[1].strip()
+            yield {"name": name, "url": url, "attrs": attrs}
+            name, attrs = "N/A", {}
+
+
+def iter_playlist(path):
+    # 生成器：边读边产出，内存占用与文件大小无关
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        yield from iter_lines(f)
+
+
+def open_playlist(path):
+    # 先取出第一条以便尽早发现文件错误和空文件；空文件返回 None
+    entries = iter_playlist(path)
+    first = next(entries, None)
+    if first is None:
+        return None
+    return itertools.chain((first,), entries)
+
+
+def parse_file(path):
+    return list(iter_playlist(path))
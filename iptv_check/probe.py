@@ -0,0 +1,312 @@
+import time
+
+import requests
+
+from . import hls, throughput, ts_inspect
+from .cancel import Cancelled
+from .metrics import add_timing
+from .session import default_pool
+
+# 速度测试最多下载的数据量
+SPEED_SAMPLE_BYTES = 256 * 1024
+# 快速检测在服务器不支持 HEAD 时改用 GET，只请求前 1 KB
+RANGE_HEADERS = {"Range": "bytes=0-1023"}
+RANGE_PROBE_BYTES = 1024
+
+
+def create_result(index, link_info):
+    return {
+        "index": index + 1,
+        "name": link_info["name"],
+        "url": link_info["url"],
+        "attrs": link_info.get("attrs") or {},
+        "status": "无效",
+        "latency": "-",
+        "speed": "-",
+        "details": "",
+        # 从数据流开头识别出的编码和分辨率
+        "codec": "",
+        "resolution": "",
+        "bitrate": 0,  # kb/s，由 ffprobe 验证得到，0 表示未知
+        # 检测本身的开销 (下载字节数、耗时)，用于统计各检测阶段的成本，不写入缓存
+        "bytes": 0,
+        "elapsed": 0.0,
+    }
+
+
+def is_m3u8(url, content_type):
+    return "mpegurl" in content_type.lower() or url.endswith(".m3u8")
+
+
+def format_speed(downloaded_size, elapsed_time):
+    if elapsed_time > 0:
+        speed_kbps = (downloaded_size / 1024) / elapsed_time
+        return f"{speed_kbps:.2f}"
+    return "∞"
+
+
+def inspect_stream(result, data, content_type=""):
+    # 校验并识别数据流开头，写入编码和分辨率；网页或 TS 同步错误时抛出 ValueError
+    info = ts_inspect.inspect(data, content_type)
+    result["codec"] = ts_inspect.codec_label(info)
+    result["resolution"] = info["resolution"]
+
+
+def _mark_stopped(result, cancel):
+    # 取消时连接被断开，此时的连接错误、超时等并非源本身的问题
+    if cancel is not None and cancel.cancelled and result["status"] != "有效":
+        result["details"] = "检测已停止"
+
+
+def ok_details(status_code, reused):
+    return f"OK ({status_code}) 复用连接" if reused else f"OK ({status_code})"
+
+
+def add_ttfb(timings, latency_ms):
+    # 首字节时间不含本次请求新建连接的耗时，只计等待服务器响应的部分
+    setup = sum(timings.get("connect", ())) + sum(timings.get("tls", ()))
+    add_timing(timings, "ttfb", max(0.0, latency_ms / 1000 - setup))
+
+
+class StreamRead:
+    # 直播流 (非 M3U8) 的读取与判定，与传输层无关，两个引擎共用：传输层按 chunk_size 读取
+    # 数据块交给 feed()，返回 True 时停止读取；因带宽上限等待后调用 pause()；测速中读取
+    # 出错 (超时、断流) 时调用 fail()，不测速时的读取错误直接抛出。
+    # 读取结束后由 finish() 写入结果并返回 (速度, 附加信息)
+    def __init__(
+        self,
+        run_speed_test,
+        timeout,
+        sustain_seconds=0,
+        stall_threshold=throughput.DEFAULT_STALL_THRESHOLD,
+    ):
+        self.speed_test = run_speed_test
+        self.timeout = timeout
+        self.meter = None
+        if not run_speed_test:  # 只取第一块验证有数据
+            self.chunk_size = 1024
+        elif sustain_seconds:
+            self.chunk_size = throughput.SUSTAIN_CHUNK_SIZE
+            self.meter = throughput.ThroughputMeter(sustain_seconds, stall_threshold)
+        else:
+            self.chunk_size = 8192
+        self.sniffer = ts_inspect.Sniffer()
+        self.size = 0
+        self.failed = False
+        self.start = time.time()
+        self.paused = 0.0
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        self.sniffer.feed(chunk)
+        if not self.speed_test:
+            return True
+        if self.meter is not None:
+            self.meter.feed(len(chunk))
+            return self.meter.done
+        if self.size >= SPEED_SAMPLE_BYTES:
+            return True
+        if time.time() - self.start - self.paused > self.timeout / 2:  # 太慢
+            self.failed = True
+            return True
+        return False
+
+    def pause(self, seconds):
+        # 测速结果包含等待的时间 (上限内实际能达到的速度)，但等待不算卡顿，也不算太慢
+        self.paused += seconds
+        if self.meter is not None:
+            self.meter.pause(seconds)
+
+    def remaining(self):
+        # 持续测速距截止还有多少秒，传输层据此限制单次读取的等待；其他情况为 None
+        return None if self.meter is None else self.meter.remaining()
+
+    def fail(self):
+        # 突发测速出错时速度为 N/A；持续测速按已读取的部分统计，出错计为卡顿
+        self.failed = True
+
+    def finish(self, result, content_type):
+        if not self.speed_test and not self.size:
+            raise ValueError("无数据流")
+        speed, extra_details = "-", ""
+        if self.meter is not None:
+            report = self.meter.finish()
+            speed = throughput.report_speed(report)
+            extra_details = throughput.format_report(report)
+        elif self.speed_test:
+            speed = (
+                "N/A"
+                if self.failed
+                else format_speed(self.size, time.time() - self.start)
+            )
+        if self.speed_test:
+            add_timing(result["timings"], "speed", time.time() - self.start)
+        result["bytes"] = self.size
+        inspect_stream(result, self.sniffer.data, content_type)
+        return speed, extra_details
+
+
+def hls_verdict(result, report, run_speed_test):
+    # HLS 抽样结束后写入结果，返回 (速度, 附加信息)
+    result["bytes"] = report.bytes
+    result["timings"]["segment"] = report.segment_seconds
+    inspect_stream(result, report.sniff, report.sniff_type)
+    speed = "-"
+    if run_speed_test:
+        size, elapsed = report.speed_bytes()
+        speed = format_speed(size, elapsed) if size else "N/A"
+    return speed, report.details()
+
+
+def mark_valid(result, latency, speed, details):
+    result.update(
+        {"status": "有效", "latency": latency, "speed": speed, "details": details}
+    )
+
+
+def check_url_deep(
+    index,
+    link_info,
+    timeout,
+    run_speed_test,
+    session_pool=None,
+    hls_policy=hls.DEFAULT_POLICY,
+    hls_samples=hls.DEFAULT_SAMPLES,
+    hls_budget=hls.DEFAULT_BYTE_BUDGET,
+    sustain_seconds=0,
+    stall_threshold=throughput.DEFAULT_STALL_THRESHOLD,
+    bandwidth=None,
+    cancel=None,
+):
+    # sustain_seconds 大于 0 时测速改为持续播放测速；bandwidth 为共用的 BandwidthBudget，
+    # 测速前在此排队，等待时间不计入延迟和检测耗时，测速中按上限控制读取速度。cancel 为 CancelToken，
+    # 取消后 (连接由连接池断开) 结果为 “检测已停止”
+    pool = session_pool or default_pool()
+    result = create_result(index, link_info)
+    base_url = link_info["url"]
+    budget = bandwidth if run_speed_test else None
+    if budget is not None and not budget.acquire():
+        result["details"] = "检测已停止"
+        return result
+    # 各阶段耗时只随结果交给引擎统计，引擎取出后即从结果中删除
+    timings = result["timings"] = pool.stats.start_timings()
+    start_time = time.time()
+    try:
+        with pool.get(base_url, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            latency = int((time.time() - start_time) * 1000)
+            pool.stats.record_latency(r.connection_reused, latency)
+            add_ttfb(timings, latency)
+            content_type = r.headers.get("Content-Type", "")
+            if is_m3u8(base_url, content_type):
+                # 列表已完整读取，连接已归还连接池，子列表和分片请求会复用它。
+                # 不测速时只验证能取到分片数据，测速时抽样分片并计算实时率
+                report = hls.analyze(
+                    pool,
+                    base_url,
+                    hls.read_playlist(r, hls.PlaylistRead(hls_budget), cancel),
+                    timeout,
+                    policy=hls_policy,
+                    samples=hls_samples if run_speed_test else 0,
+                    byte_budget=hls_budget,
+                    bandwidth=budget,
+                    cancel=cancel,
+                )
+                speed, extra_details = hls_verdict(result, report, run_speed_test)
+            else:
+                read = StreamRead(
+                    run_speed_test, timeout, sustain_seconds, stall_threshold
+                )
+                chunk_size = read.chunk_size
+                if budget is not None:
+                    chunk_size = budget.chunk_size(chunk_size)
+                try:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        if cancel is not None:
+                            cancel.check()
+                        done = read.feed(chunk)
+                        if budget is not None:
+                            read.pause(budget.throttle(len(chunk), cancel))
+                        if done:
+                            break
+                except requests.exceptions.RequestException:
+                    if not run_speed_test:
+                        raise
+                    read.fail()
+                if cancel is not None:
+                    # 取消时数据流随连接断开而结束，不再识别编码、统计速度
+                    cancel.check()
+                speed, extra_details = read.finish(result, content_type)
+        mark_valid(
+            result,
+            latency,
+            speed,
+            ok_details(r.status_code, r.connection_reused) + extra_details,
+        )
+    except Cancelled:
+        result["details"] = "检测已停止"
+    except requests.exceptions.Timeout:
+        result["details"] = f"超时 (>{timeout}s)"
+    except requests.exceptions.HTTPError as e:
+        result["details"] = f"HTTP错误: {e.response.status_code}"
+    except requests.exceptions.RequestException:
+        result["details"] = "连接错误"
+    except ValueError as e:
+        result["details"] = str(e)
+    except Exception:
+        result["details"] = "未知解析错误"
+    _mark_stopped(result, cancel)
+    result["elapsed"] = time.time() - start_time
+    if budget is not None:
+        budget.release(result["bytes"] / result["elapsed"] if result["bytes"] else None)
+    return result
+
+
+def check_url_simple(index, link_info, timeout, session_pool=None, cancel=None):
+    # 快速检测：只发 HEAD；服务器拒绝 HEAD 时改用只请求前 1 KB 的 GET，不读取数据流
+    pool = session_pool or default_pool()
+    result = create_result(index, link_info)
+    url = link_info["url"]
+    timings = result["timings"] = pool.stats.start_timings()
+    start_time = time.time()
+    try:
+        try:
+            with pool.head(url, timeout=timeout, allow_redirects=True) as r:
+                r.raise_for_status()
+            method = "HEAD"
+        except requests.exceptions.HTTPError:
+            with pool.get(
+                url, timeout=timeout, stream=True, headers=RANGE_HEADERS
+            ) as r:
+                r.raise_for_status()
+                # 服务器忽略 Range 时返回完整数据流，同样只取第一块
+                chunk = next(r.iter_content(chunk_size=RANGE_PROBE_BYTES), None)
+                if not chunk:
+                    raise ValueError("无数据流")
+                result["bytes"] = len(chunk)
+            method = "Range"
+        latency = int((time.time() - start_time) * 1000)
+        pool.stats.record_latency(r.connection_reused, latency)
+        add_ttfb(timings, latency)
+        result.update(
+            {
+                "status": "有效",
+                "latency": latency,
+                "details": f"{ok_details(r.status_code, r.connection_reused)} ({method})",
+            }
+        )
+    except Cancelled:
+        result["details"] = "检测已停止"
+    except requests.exceptions.Timeout:
+        result["details"] = f"超时 (>{timeout}s)"
+    except requests.exceptions.HTTPError as e:
+        result["details"] = f"HTTP错误: {e.response.status_code}"
+    except requests.exceptions.RequestException:
+        result["details"] = "连接错误"
+    except ValueError as e:
+        result["details"] = str(e)
+    except Exception:
+        result["details"] = "未知解析错误"
+    _mark_stopped(result, cancel)
+    result["elapsed"] = time.time() - start_time
+    return result
@@ -0,0 +1,243 @@
+# 非 HTTP 协议的轻量探测：RTSP (OPTIONS/DESCRIBE)、RTMP (握手)、UDP/RTP 组播 (加入组播等待首包)。
+# 探测均为协程，异步引擎直接 await；线程池引擎在工作线程中用 asyncio.run 执行。
+# 配置了 udpxy 时，udp/rtp 地址改写为 udpxy 的 HTTP 地址，按普通 HTTP 源检测。
+import asyncio
+import os
+import socket
+import struct
+import time
+from urllib.parse import urlsplit
+
+from .probe import create_result
+
+# 各协议的默认端口，组播地址必须带端口
+NATIVE_SCHEMES = {"rtsp": 554, "rtmp": 1935, "rtmps": 443, "udp": None, "rtp": None}
+# 组播最多等待首包的时间 (秒)，不超过检测超时
+MULTICAST_DEADLINE = 3
+RTSP_MAX_BODY = 64 * 1024
+RTMP_VERSION = 3
+RTMP_HANDSHAKE_SIZE = 1536
+USER_AGENT = "Mozilla/5.0"
+
+
+class ProbeError(Exception):
+    # 探测失败，消息即为结果中的错误信息
+    pass
+
+
+def scheme_of(url):
+    return url.split("://", 1)[0].lower() if "://" in url else ""
+
+
+def is_native(url):
+    return scheme_of(url) in NATIVE_SCHEMES
+
+
+def udpxy_url(url, udpxy):
+    # udp://@239.1.1.1:5000 -> http://udpxy:4022/udp/239.1.1.1:5000
+    scheme = scheme_of(url)
+    if not udpxy or scheme not in ("udp", "rtp"):
+        return None
+    address = url.split("://", 1)[1].lstrip("@").split("/", 1)[0]
+    return f"{udpxy.rstrip('/')}/{scheme}/{address}"
+
+
+async def check_native(
+    index, link_info, timeout, dns_cache=None, multicast_iface="0.0.0.0"
+):
+    result = create_result(index, link_info)
+    url = link_info["url"]
+    scheme = scheme_of(url)
+    start_time = time.time()
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").strip("@")
+        port = parts.port or NATIVE_SCHEMES[scheme]
+        if not host or not port:
+            raise ProbeError("地址格式错误")
+        if scheme in ("udp", "rtp"):
+            deadline = min(timeout, MULTICAST_DEADLINE)
+            details = await probe_udp(host, port, deadline, multicast_iface, scheme)
+        else:
+            address = _cached_address(dns_cache, host)
+            if scheme == "rtsp":
+                details = await asyncio.wait_for(
+                    probe_rtsp(address, port, url), timeout
+                )
+            else:
+                details = await asyncio.wait_for(
+                    probe_rtmp(address, port, host, scheme == "rtmps"), timeout
+                )
+        result.update(
+            {
+                "status": "有效",
+                "latency": int((time.time() - start_time) * 1000),
+                "details": details,
+            }
+        )
+    except asyncio.CancelledError:
+        raise
+    except asyncio.TimeoutError:
+        result["details"] = f"超时 (>{timeout}s)"
+    except ProbeError as e:
+        result["details"] = str(e)
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        result["details"] = "连接错误"
+    except ValueError:
+        result["details"] = "地址格式错误"
+    except Exception:
+        result["details"] = "未知解析错误"
+    result["elapsed"] = time.time() - start_time
+    return result
+
+
+def check_native_sync(index, link_info, timeout, dns_cache=None, cancel=None, **kwargs):
+    # 线程池引擎使用：在当前工作线程中运行一个短生命周期的事件循环；
+    # cancel (CancelToken) 取消时从调用 cancel() 的线程取消该事件循环中的探测
+    coro = check_native(index, link_info, timeout, dns_cache, **kwargs)
+    if cancel is None:
+        return asyncio.run(coro)
+    try:
+        return asyncio.run(_cancellable(coro, cancel))
+    except asyncio.CancelledError:
+        result = create_result(index, link_info)
+        result["details"] = "检测已停止"
+        return result
+
+
+async def _cancellable(coro, cancel):
+    loop, task = asyncio.get_running_loop(), asyncio.current_task()
+    with cancel.callback(lambda: loop.call_soon_threadsafe(task.cancel)):
+        return await coro
+
+
+def _cached_address(dns_cache, host):
+    if dns_cache is not None:
+        addresses = dns_cache.cached(host)
+        if addresses:
+            return addresses[0]
+    return host
+
+
+# --- RTSP ---
+async def probe_rtsp(address, port, url):
+    # OPTIONS 确认是 RTSP 服务，DESCRIBE 确认该路径存在并返回 SDP
+    reader, writer = await asyncio.open_connection(address, port)
+    try:
+        request_url = _strip_userinfo(url)
+        status, _, _ = await _rtsp_request(reader, writer, "OPTIONS", request_url, 1)
+        if status >= 400 and status not in (401, 405, 501):
+            raise ProbeError(f"RTSP错误: {status}")
+        status, headers, body = await _rtsp_request(
+            reader, writer, "DESCRIBE", request_url, 2, "Accept: application/sdp\r\n"
+        )
+        if status != 200:
+            raise ProbeError(f"RTSP错误: {status}")
+        if b"m=" not in body:
+            raise ProbeError("RTSP无媒体描述")
+        return "OK (RTSP 200)"
+    finally:
+        writer.close()
+
+
+async def _rtsp_request(reader, writer, method, url, cseq, extra=""):
+    writer.write(
+        f"{method} {url} RTSP/1.0\r\nCSeq: {cseq}\r\n"
+        f"User-Agent: {USER_AGENT}\r\n{extra}\r\n".encode()
+    )
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    lines = head.split("\r\n")
+    status_line = lines[0].split(" ", 2)
+    if len(status_line) < 2 or not status_line[0].startswith("RTSP/"):
+        raise ProbeError("非RTSP响应")
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        if key:
+            headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    body = await reader.readexactly(min(length, RTSP_MAX_BODY)) if length else b""
+    try:
+        return int(status_line[1]), headers, body
+    except ValueError:
+        raise ProbeError("非RTSP响应") from None
+
+
+def _strip_userinfo(url):
+    parts = urlsplit(url)
+    if "@" not in parts.netloc:
+        return url
+    return parts._replace(netloc=parts.netloc.rsplit("@", 1)[1]).geturl()
+
+
+# --- RTMP ---
+async def probe_rtmp(address, port, server_hostname, tls=False):
+    # 简单握手：发送 C0+C1，收到版本号正确的 S0+S1 即认为是 RTMP 服务，回送 C2 后断开
+    ssl_args = {"ssl": True, "server_hostname": server_hostname} if tls else {}
+    reader, writer = await asyncio.open_connection(address, port, **ssl_args)
+    try:
+        c1 = struct.pack(">II", int(time.time()) & 0xFFFFFFFF, 0)
+        c1 += os.urandom(RTMP_HANDSHAKE_SIZE - 8)
+        writer.write(bytes([RTMP_VERSION]) + c1)
+        await writer.drain()
+        s0 = await reader.readexactly(1)
+        if s0[0] != RTMP_VERSION:
+            raise ProbeError("RTMP握手失败")
+        s1 = await reader.readexactly(RTMP_HANDSHAKE_SIZE)
+        writer.write(s1)
+        await writer.drain()
+        return "OK (RTMP 握手)"
+    except asyncio.IncompleteReadError:
+        raise ProbeError("RTMP握手失败") from None
+    finally:
+        writer.close()
+
+
+# --- UDP / RTP 组播 ---
+async def probe_udp(host, port, deadline, iface="0.0.0.0", scheme="udp"):
+    # 加入组播组 (非组播地址则直接监听端口)，在 deadline 秒内等待第一个数据报
+    sock = _open_udp_socket(host, port, iface)
+    try:
+        loop = asyncio.get_running_loop()
+        try:
+            data = await asyncio.wait_for(loop.sock_recv(sock, 65536), deadline)
+        except asyncio.TimeoutError:
+            raise ProbeError(f"组播无数据 (>{deadline}s)") from None
+        if not data:
+            raise ProbeError("无数据流")
+        if scheme == "rtp" and data[0] >> 6 != 2:
+            raise ProbeError("非RTP数据")
+        return f"OK (组播 {len(data)} 字节)"
+    finally:
+        sock.close()
+
+
+def _open_udp_socket(group, port, iface):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        # 多个检测可能同时监听同一端口
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        multicast = _is_multicast(group)
+        try:
+            # Linux 下绑定组播地址可以只收到该组的数据，Windows 不支持时退回绑定所有地址
+            sock.bind((group if multicast else "", port))
+        except OSError:
+            sock.bind(("", port))
+        if multicast:
+            mreq = socket.inet_aton(group) + socket.inet_aton(iface)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        sock.setblocking(False)
+        return sock
+    except BaseException:
+        sock.close()
+        raise
+
+
+def _is_multicast(host):
+    try:
+        return 224 <= int(host.split(".", 1)[0]) <= 239
+    except ValueError:
+        return False
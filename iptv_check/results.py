@@ -0,0 +1,302 @@
+# 检测结果的内存模型：按列存储，不为每条结果保留字典或元组。
+# 序号、延迟、速度、码率存在 array 中，状态是 bytearray 中的一个字节；编码、分辨率和信息
+# 重复度很高，经驻留表去重，同一内容只保存一份。各视图 (全部/有效/无效) 只保存行号列表，
+# 界面只渲染可见窗口内的行，显示用的元组按需生成。排序键和筛选都只在内存中进行，不需要和 Tk 往返。
+import re
+from array import array
+
+COLUMNS = (
+    "原始序号",
+    "频道名称",
+    "URL",
+    "状态",
+    "延迟(ms)",
+    "速度(KB/s)",
+    "编码",
+    "分辨率",
+    "信息",
+)
+VIEW_NAMES = ("all", "valid", "invalid")
+NUMERIC_COLUMNS = ("原始序号", "延迟(ms)", "速度(KB/s)")
+# 导出记录 (records) 的字段，顺序即元组中的顺序
+RECORD_FIELDS = (
+    "index",
+    "name",
+    "url",
+    "status",
+    "latency",
+    "speed",
+    "codec",
+    "resolution",
+    "bitrate",
+    "details",
+    "attrs",
+)
+VALID, INVALID = "有效", "无效"
+# 延迟、速度未知 ("-"、"N/A") 时在数组中的值，排序时排在最前
+MISSING = -1
+
+
+class ResultStore:
+    def __init__(self):
+        self._matcher = None
+        self.clear()
+
+    def clear(self):
+        # 保留当前筛选条件，新一轮结果写入时继续按它筛选
+        self.indexes = array("l")
+        self.names, self.urls = [], []
+        self.valid = bytearray()
+        self.latencies = array("l")
+        self.speeds = array("d")
+        self.bitrates = array("l")
+        self.codecs, self.resolutions, self.details = [], [], []
+        self.attrs = {}  # 行号 -> #EXTINF 属性，只保存非空的
+        # 属性相同的行 (同一频道的多个镜像) 共用一个字典，只读
+        self._attrs_pool = {}
+        self.speed_text = {}  # 行号 -> 不是数字的速度 (如 "N/A"、"∞")，"-" 不保存
+        self._strings = {}  # 驻留表：编码、分辨率、信息
+        # 小写的频道名称和 URL，与原文相同 (中文名称、小写 URL) 时为 None，不重复保存
+        self._names_lower, self._urls_lower = [], []
+        self.views = {name: [] for name in VIEW_NAMES}
+        self.filtered = {name: [] if self._matcher else None for name in VIEW_NAMES}
+        if self._matcher:
+            self._matcher = self._build_matcher(*self._filter)
+        self.valid_count = self.invalid_count = 0
+        # 文本列的排序键在第一次按该列排序时生成，之后随结果写入；数值列直接用数组排序
+        self._sort_keys = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _intern(self, value):
+        return self._strings.setdefault(value, value)
+
+    def add(self, result):
+        row_id = len(self.names)
+        name, url = result["name"], result["url"]
+        self.indexes.append(result["index"])
+        self.names.append(name)
+        self.urls.append(url)
+        self._names_lower.append(_lower_or_none(name))
+        self._urls_lower.append(_lower_or_none(url))
+        valid = result["status"] == VALID
+        self.valid.append(valid)
+        latency = result["latency"]
+        self.latencies.append(
+            int(latency) if isinstance(latency, (int, float)) else MISSING
+        )
+        speed = result["speed"]
+        try:
+            self.speeds.append(float(speed))
+        except (TypeError, ValueError):
+            self.speeds.append(MISSING)
+            if speed != "-":
+                self.speed_text[row_id] = speed
+        self.bitrates.append(result.get("bitrate") or 0)
+        self.codecs.append(self._intern(result.get("codec", "")))
+        self.resolutions.append(self._intern(result.get("resolution", "")))
+        self.details.append(self._intern(result["details"]))
+        attrs = result.get("attrs")
+        if attrs:
+            self.attrs[row_id] = self._attrs_pool.setdefault(
+                tuple(attrs.items()), attrs
+            )
+        for col, keys in self._sort_keys.items():
+            keys.append(_text_key(col, self._column(col)[row_id]))
+
+        view = "valid" if valid else "invalid"
+        if valid:
+            self.valid_count += 1
+        else:
+            self.invalid_count += 1
+        self.views["all"].append(row_id)
+        self.views[view].append(row_id)
+        if self._matcher and self._matcher(row_id):
+            self.filtered["all"].append(row_id)
+            self.filtered[view].append(row_id)
+        return row_id
+
+    def status(self, row_id):
+        return VALID if self.valid[row_id] else INVALID
+
+    def latency(self, row_id):
+        latency = self.latencies[row_id]
+        return "-" if latency == MISSING else latency
+
+    def speed(self, row_id):
+        speed = self.speeds[row_id]
+        if speed == MISSING:
+            return self.speed_text.get(row_id, "-")
+        return f"{speed:.2f}"
+
+    def values(self, row_id):
+        # 界面显示的一行，与 COLUMNS 对应
+        return (
+            self.indexes[row_id],
+            self.names[row_id],
+            self.urls[row_id],
+            self.status(row_id),
+            self.latency(row_id),
+            self.speed(row_id),
+            self.codecs[row_id],
+            self.resolutions[row_id],
+            self.details[row_id],
+        )
+
+    def is_valid(self, row_id):
+        return bool(self.valid[row_id])
+
+    def visible_rows(self, name):
+        # 有筛选条件时返回筛选后的行号，否则返回视图中的全部行号
+        filtered = self.filtered[name]
+        return self.views[name] if filtered is None else filtered
+
+    def set_filter(self, text, regex=False):
+        # 在频道名称、URL、编码、分辨率和信息中查找 (不区分大小写)；正则表达式无效时抛出 re.error
+        text = text.strip()
+        if not text:
+            self._matcher = None
+            self.filtered = {name: None for name in VIEW_NAMES}
+            return len(self)
+        self._filter = (text, regex)
+        self._matcher = self._build_matcher(text, regex)
+        mask = self._match_all(text, regex)
+        self.filtered = {
+            name: [row_id for row_id in view if mask[row_id]]
+            for name, view in self.views.items()
+        }
+        return len(self.filtered["all"])
+
+    def _build_matcher(self, text, regex):
+        if regex:
+            search = re.compile(text, re.IGNORECASE).search
+            return lambda row_id: search(self._haystack(row_id)) is not None
+        needle = text.lower()
+        names, urls = self.names, self.urls
+        names_lower, urls_lower = self._names_lower, self._urls_lower
+        codecs, resolutions, details = self.codecs, self.resolutions, self.details
+        hits = {}  # 驻留的文本 -> 是否包含关键字，每个不同的值只判断一次
+
+        def hit(value):
+            found = hits.get(value)
+            if found is None:
+                found = hits[value] = needle in value.lower()
+            return found
+
+        def match(row_id):
+            return (
+                needle in (names_lower[row_id] or names[row_id])
+                or needle in (urls_lower[row_id] or urls[row_id])
+                or hit(details[row_id])
+                or hit(codecs[row_id])
+                or hit(resolutions[row_id])
+            )
+
+        return match
+
+    def _match_all(self, text, regex):
+        # 与 _build_matcher 的结果相同，一次判断全部行：编码、分辨率和信息只判断每个不同的值
+        if regex:
+            return list(map(self._matcher, range(len(self))))
+        needle = text.lower()
+        hits = {value: needle in value.lower() for value in self._strings}
+        return [
+            needle in (name_lower or name)
+            or needle in (url_lower or url)
+            or hits[detail]
+            or hits[codec]
+            or hits[resolution]
+            for name, name_lower, url, url_lower, detail, codec, resolution in zip(
+                self.names,
+                self._names_lower,
+                self.urls,
+                self._urls_lower,
+                self.details,
+                self.codecs,
+                self.resolutions,
+            )
+        ]
+
+    def _haystack(self, row_id):
+        # 与之前的筛选文本相同: "频道名称\nURL\n编码\n分辨率\n信息"
+        return "\n".join(
+            (
+                self.names[row_id],
+                self.urls[row_id],
+                self.codecs[row_id],
+                self.resolutions[row_id],
+                self.details[row_id],
+            )
+        )
+
+    def records(self, row_ids):
+        # 按给定顺序产出导出用的元组 (字段见 RECORD_FIELDS)：延迟、速度为数值，未知时为 None，
+        # 不是数字的速度 (如 "∞") 保留原文
+        indexes, names, urls, valid = self.indexes, self.names, self.urls, self.valid
+        latencies, speeds, bitrates = self.latencies, self.speeds, self.bitrates
+        codecs, resolutions, details = self.codecs, self.resolutions, self.details
+        attrs, speed_text = self.attrs, self.speed_text
+        for row_id in row_ids:
+            latency, speed = latencies[row_id], speeds[row_id]
+            yield (
+                indexes[row_id],
+                names[row_id],
+                urls[row_id],
+                VALID if valid[row_id] else INVALID,
+                None if latency == MISSING else latency,
+                speed_text.get(row_id) if speed == MISSING else speed,
+                codecs[row_id],
+                resolutions[row_id],
+                bitrates[row_id],
+                details[row_id],
+                attrs.get(row_id),
+            )
+
+    def sort_view(self, name, col, reverse=False):
+        # 稳定排序：键相同的行保持上一次排序后的相对顺序
+        key = self._sort_key_list(col).__getitem__
+        self.views[name].sort(key=key, reverse=reverse)
+        if self.filtered[name] is not None:
+            self.filtered[name].sort(key=key, reverse=reverse)
+
+    def _sort_key_list(self, col):
+        if col == "原始序号":
+            return self.indexes
+        if col == "延迟(ms)":
+            return self.latencies
+        if col == "速度(KB/s)":
+            return self.speeds
+        keys = self._sort_keys.get(col)
+        if keys is None:
+            keys = [_text_key(col, value) for value in self._column(col)]
+            self._sort_keys[col] = keys
+        return keys
+
+    def _column(self, col):
+        # 文本列的原始值序列
+        if col == "状态":
+            return [VALID if valid else INVALID for valid in self.valid]
+        return {
+            "频道名称": self.names,
+            "URL": self.urls,
+            "编码": self.codecs,
+            "分辨率": self.resolutions,
+            "信息": self.details,
+        }[col]
+
+
+def _lower_or_none(text):
+    lowered = text.lower()
+    return None if lowered == text else lowered
+
+
+def _text_key(col, value):
+    # 分辨率按像素数排序，未知的排在最前；其他文本列不区分大小写
+    if col == "分辨率":
+        width, _, height = value.partition("x")
+        try:
+            return int(width) * int(height)
+        except ValueError:
+            return -1
+    return value.lower()
@@ -0,0 +1,229 @@
+# 按主机调度检测任务：各主机轮流出队，避免同一源站的大量条目同时压到一台服务器上。
+# 每个主机有并发上限和令牌桶限速；连续出现超时或 429/503 时自动降低该主机并发并暂停一段时间，
+# 之后随着成功的检测逐步恢复。另可设置全部主机合计的开始速率 (桶容量为 1)，
+# 检测按固定间隔逐个开始，不会成批发出。
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+DEFAULT_PER_HOST_LIMIT = 6
+DEFAULT_HOST_RATE = 10  # 每主机每秒最多发起的检测数，0 表示不限速
+# 引擎最多从解析器预读多少条待调度的链接，窗口越大越容易在不同主机之间交错
+DEFAULT_WINDOW = 2000
+# 连续出现多少次限流信号后退避，以及退避暂停时间的起始值和上限 (秒)
+BACKOFF_THRESHOLD = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+# 服务器明确表示过载的 HTTP 状态码
+THROTTLE_STATUS = ("429", "503")
+
+
+def host_of(url):
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+def origin_of(url):
+    # 调度按 “主机:端口” 区分源站，同一主机上不同端口的服务互不影响
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        return f"{host}:{parts.port}" if parts.port else host
+    except ValueError:
+        return ""
+
+
+def is_throttle_signal(result, host_seen_ok):
+    # 429/503 总是视为限流；超时只有在该主机本次已有成功检测时才算 (否则多半是死链)
+    details = result.get("details", "")
+    if details.startswith("HTTP错误: "):
+        return details[len("HTTP错误: ") :] in THROTTLE_STATUS
+    return host_seen_ok and details.startswith("超时")
+
+
+class _Host:
+    def __init__(self, limit, burst, now):
+        self.queue = deque()
+        self.active = 0
+        self.limit = limit  # 当前并发上限，退避时减半，成功时逐步恢复
+        self.tokens, self.refilled_at = burst, now
+        self.strikes = self.successes = self.level = 0
+        self.paused_until = 0.0
+        self.seen_ok = False
+
+
+class HostScheduler:
+    # 非阻塞的 take()/delay() 供异步引擎使用，阻塞的 acquire() 供线程池引擎使用，
+    # 每个任务结束后都要调用 release()
+    def __init__(
+        self,
+        total_limit,
+        per_host_limit=DEFAULT_PER_HOST_LIMIT,
+        rate=DEFAULT_HOST_RATE,
+        burst=None,
+        clock=time.monotonic,
+        start_rate=0,
+    ):
+        self.total_limit = max(1, int(total_limit))
+        self.per_host_limit = max(0, int(per_host_limit))  # 0 表示不限制
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1.0, float(burst or self.per_host_limit or 1))
+        self.clock = clock
+        # 全部主机合计每秒最多开始的检测数，0 表示不限
+        self.start_rate = max(0.0, float(start_rate))
+        self._start_tokens, self._start_refilled_at = 1.0, clock()
+        self.pending = self.active = 0
+        self.backoffs = 0
+        self._hosts = {}
+        self._rotation = deque()  # 有待调度任务的主机，轮流出队
+        self._cond = threading.Condition()
+
+    def add(self, url, item):
+        with self._cond:
+            host = origin_of(url)
+            state = self._hosts.get(host)
+            if state is None:
+                cap = self.per_host_limit or self.total_limit
+                state = self._hosts[host] = _Host(cap, self.burst, self.clock())
+            if not state.queue:
+                self._rotation.append(host)
+            state.queue.append(item)
+            self.pending += 1
+            self._cond.notify()
+
+    def take(self):
+        # 取出下一个可以立即开始的任务 (主机, 任务)，没有则返回 None
+        with self._cond:
+            if self.active >= self.total_limit:
+                return None
+            now = self.clock()
+            if self._start_wait(now) > 0:
+                return None
+            for _ in range(len(self._rotation)):
+                host = self._rotation[0]
+                self._rotation.rotate(-1)
+                state = self._hosts[host]
+                if not self._ready(state, now):
+                    continue
+                item = state.queue.popleft()
+                if not state.queue:
+                    self._rotation.remove(host)
+                if self.rate:
+                    state.tokens -= 1
+                if self.start_rate:
+                    self._start_tokens -= 1
+                state.active += 1
+                self.active += 1
+                self.pending -= 1
+                return host, item
+            return None
+
+    def delay(self):
+        # 距离最早一个受限速或退避限制的主机恢复还有多少秒；只受并发上限限制时返回 None
+        with self._cond:
+            if self.active >= self.total_limit:
+                return None
+            now = self.clock()
+            waits = []
+            for host in self._rotation:
+                state = self._hosts[host]
+                if state.active >= state.limit:
+                    continue
+                wait = state.paused_until - now
+                if self.rate:
+                    tokens = state.tokens + (now - state.refilled_at) * self.rate
+                    wait = max(wait, (1 - tokens) / self.rate)
+                waits.append(max(wait, 0.0))
+            if not waits:
+                return None
+            return max(min(waits), self._start_wait(now))
+
+    def acquire(self, timeout=None):
+        # 阻塞直到有任务可以开始或超时
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._cond:
+            while True:
+                task = self.take()
+                if task is not None:
+                    return task
+                wait = self.delay()
+                if deadline is not None:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def release(self, host, result):
+        # 任务结束：归还并发名额，并根据检测结果调整该主机的并发上限
+        with self._cond:
+            state = self._hosts[host]
+            state.active -= 1
+            self.active -= 1
+            if is_throttle_signal(result, state.seen_ok):
+                state.successes = 0
+                state.strikes += 1
+                if state.strikes >= BACKOFF_THRESHOLD:
+                    self._back_off(state)
+            elif result.get("status") == "有效":
+                state.seen_ok = True
+                state.strikes = 0
+                state.successes += 1
+                cap = self.per_host_limit or self.total_limit
+                if state.limit < cap and state.successes >= state.limit:
+                    state.limit += 1
+                    state.successes = 0
+                    if state.limit == cap:
+                        state.level = 0
+            self._cond.notify_all()
+
+    def wake(self):
+        # 停止检测时唤醒在 acquire() 中等待的线程
+        with self._cond:
+            self._cond.notify_all()
+
+    def idle(self):
+        with self._cond:
+            return self.pending == 0 and self.active == 0
+
+    def _ready(self, state, now):
+        if state.active >= state.limit or now < state.paused_until:
+            return False
+        if self.rate:
+            state.tokens = min(
+                self.burst, state.tokens + (now - state.refilled_at) * self.rate
+            )
+            state.refilled_at = now
+            return state.tokens >= 1
+        return True
+
+    def _start_wait(self, now):
+        # 距离合计速率允许开始下一个检测还有多少秒
+        if not self.start_rate:
+            return 0.0
+        self._start_tokens = min(
+            1.0,
+            self._start_tokens + (now - self._start_refilled_at) * self.start_rate,
+        )
+        self._start_refilled_at = now
+        return max(0.0, (1 - self._start_tokens) / self.start_rate)
+
+    def _back_off(self, state):
+        # 并发减半，并暂停该主机一段时间，连续退避时暂停时间翻倍
+        state.strikes = 0
+        state.limit = max(1, state.limit // 2)
+        state.paused_until = self.clock() + min(
+            BACKOFF_BASE * 2**state.level, BACKOFF_MAX
+        )
+        state.level += 1
+        self.backoffs += 1
+
+    @property
+    def host_count(self):
+        return len(self._hosts)
+
+    def summary(self):
+        return f"主机调度: {self.host_count} 个源站，退避 {self.backoffs} 次"
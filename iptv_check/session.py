@@ -0,0 +1,333 @@
+# 共享 HTTP 会话层：所有检测线程共用同一个连接池（按主机保持长连接），
+# 同一主机上的 m3u8 列表请求和分片请求可以复用同一条 TCP/TLS 连接。
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    NameResolutionError,
+    NewConnectionError,
+)
+from urllib3.util.connection import allowed_gai_family
+
+from .cancel import Cancelled
+from .metrics import add_timing
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+DEFAULT_POOL_PER_HOST = 10
+DEFAULT_MAX_HOSTS = 256
+
+
+class ConnectionStats:
+    # 记录连接复用情况，以及复用连接/新建连接各自的平均延迟
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.reused = 0
+            self.hosts = {}  # host -> [请求数, 复用数]
+            self._latency = {True: [0, 0], False: [0, 0]}  # 是否复用 -> [总毫秒, 次数]
+
+    def record_connection(self, host, reused):
+        with self._lock:
+            self.requests += 1
+            host_stats = self.hosts.setdefault(host, [0, 0])
+            host_stats[0] += 1
+            if reused:
+                self.reused += 1
+                host_stats[1] += 1
+        self._local.last_reused = reused
+
+    def last_reused(self):
+        # 当前线程最近一次请求是否复用了连接
+        return getattr(self._local, "last_reused", False)
+
+    def start_timings(self):
+        # 之后当前线程新建连接的耗时记入返回的字典 {阶段: [秒, ...]}
+        self._local.timings = {}
+        return self._local.timings
+
+    def record_setup(self, connect, tls):
+        timings = getattr(self._local, "timings", None)
+        if timings is not None:
+            add_timing(timings, "connect", connect)
+            if tls is not None:
+                add_timing(timings, "tls", tls)
+
+    def record_latency(self, reused, latency_ms):
+        with self._lock:
+            bucket = self._latency[bool(reused)]
+            bucket[0] += latency_ms
+            bucket[1] += 1
+
+    def mean_latency(self, reused):
+        with self._lock:
+            total, count = self._latency[bool(reused)]
+        return total / count if count else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "reused": self.reused,
+                "new_connections": self.requests - self.reused,
+                "hosts": {
+                    h: {"requests": r, "reused": u} for h, (r, u) in self.hosts.items()
+                },
+                "latency": {
+                    "reused": list(self._latency[True]),
+                    "new": list(self._latency[False]),
+                },
+            }
+
+    def merge(self, snapshot):
+        # 累加另一个进程 (多进程分片) 的 snapshot()
+        with self._lock:
+            self.requests += snapshot["requests"]
+            self.reused += snapshot["reused"]
+            for host, counts in snapshot["hosts"].items():
+                host_stats = self.hosts.setdefault(host, [0, 0])
+                host_stats[0] += counts["requests"]
+                host_stats[1] += counts["reused"]
+            for reused, key in ((True, "reused"), (False, "new")):
+                bucket = self._latency[reused]
+                bucket[0] += snapshot["latency"][key][0]
+                bucket[1] += snapshot["latency"][key][1]
+
+    def summary(self):
+        if not self.requests:
+            return "连接复用: 无请求"
+        text = (
+            f"连接复用: {self.reused}/{self.requests} 次请求 "
+            f"({self.reused * 100 / self.requests:.1f}%)，"
+            f"新建连接 {self.requests - self.reused} 个"
+        )
+        reused_ms, new_ms = self.mean_latency(True), self.mean_latency(False)
+        if reused_ms is not None and new_ms is not None:
+            text += (
+                f"\n平均延迟: 复用连接 {reused_ms:.0f} ms / 新建连接 {new_ms:.0f} ms"
+            )
+        return text
+
+
+class _TimedConnectionMixin:
+    # 分别计时 TCP 连接 (_new_conn，未预解析时包含 DNS) 和之后的 TLS 握手。
+    # 设置了 cancel (CancelToken) 时，socket 在发起连接前登记，取消时正在连接或读取的请求立即出错。
+    # dns_addresses 为预解析得到的 IP 列表，依次尝试，不再现场解析
+    stats = None
+    is_tls = False
+    cancel = None
+    dns_addresses = None
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        if self.cancel is None and self.dns_addresses is None:
+            sock = super()._new_conn()
+        else:
+            sock = self._create_conn()
+        self._tcp_seconds = time.perf_counter() - start
+        return sock
+
+    def _address_infos(self):
+        # 与 getaddrinfo 的返回格式相同；缓存中的地址按原顺序排列，前面的连不上时尝试下一个
+        if self.dns_addresses is None:
+            return socket.getaddrinfo(
+                self._dns_host.strip("[]"),
+                self.port,
+                allowed_gai_family(),
+                socket.SOCK_STREAM,
+            )
+        allowed = allowed_gai_family()
+        infos = []
+        for address in self.dns_addresses:
+            family = socket.AF_INET6 if ":" in address else socket.AF_INET
+            if allowed in (socket.AF_UNSPEC, family):
+                infos.append((family, socket.SOCK_STREAM, 0, "", (address, self.port)))
+        return infos
+
+    def _create_conn(self):
+        # 与 urllib3 的 create_connection 相同，只是地址可以来自 DNS 缓存，并在 connect() 之前
+        # 把 socket 交给 CancelToken；异常也按 HTTPConnection._new_conn 的方式转换
+        if self.cancel is not None:
+            self.cancel.check()
+        err = None
+        try:
+            for family, socktype, proto, _, address in self._address_infos():
+                if self.cancel is None:
+                    sock = socket.socket(family, socktype, proto)
+                else:
+                    sock = self.cancel.socket(family, socktype, proto)
+                try:
+                    if self.cancel is not None:
+                        self.cancel.track(sock)
+                    for option in self.socket_options or ():
+                        sock.setsockopt(*option)
+                    if isinstance(self.timeout, (int, float)):
+                        sock.settimeout(self.timeout)
+                    if self.source_address:
+                        sock.bind(self.source_address)
+                    sock.connect(address)
+                    return sock
+                except OSError as e:
+                    sock.close()
+                    err = e
+                except Cancelled:
+                    sock.close()
+                    raise
+                # 连接因取消而失败时不再尝试其他地址
+                if self.cancel is not None:
+                    self.cancel.check()
+            raise err or OSError("getaddrinfo returns an empty list")
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self,
+                f"Connection to {self.host} timed out. (connect timeout={self.timeout})",
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(
+                self, f"Failed to establish a new connection: {e}"
+            ) from e
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        total = time.perf_counter() - start
+        tcp = getattr(self, "_tcp_seconds", total)
+        self.stats.record_setup(tcp, total - tcp if self.is_tls else None)
+        if self.cancel is not None and self.is_tls:
+            # TLS 包装后原 socket 已分离，改为登记 TLS socket (握手过程本身无法打断)
+            self.cancel.track(self.sock)
+
+
+class _CountingPoolMixin:
+    stats = None
+    dns_cache = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        # 已预解析的主机直接连接缓存中的 IP (全部地址依次尝试)；Host 头和 TLS SNI 仍使用原主机名
+        if self.dns_cache is not None:
+            addresses = self.dns_cache.cached(self.host)
+            if addresses:
+                conn.dns_addresses = addresses
+        return conn
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        # 从池中取出且 socket 仍然打开的连接即为复用，新连接要到发送请求时才建立 socket
+        self.stats.record_connection(self.host, conn.sock is not None)
+        return conn
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, stats, dns_cache=None, cancel=None, **kwargs):
+        self.stats = stats
+        self.dns_cache = dns_cache
+        self.cancel = cancel
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: self._pool_class(cls, scheme == "https")
+            for scheme, cls in (
+                ("http", HTTPConnectionPool),
+                ("https", HTTPSConnectionPool),
+            )
+        }
+
+    def _pool_class(self, cls, is_tls):
+        connection_cls = type(
+            cls.ConnectionCls.__name__,
+            (_TimedConnectionMixin, cls.ConnectionCls),
+            {"stats": self.stats, "is_tls": is_tls, "cancel": self.cancel},
+        )
+        attrs = {
+            "stats": self.stats,
+            "dns_cache": self.dns_cache,
+            "ConnectionCls": connection_cls,
+        }
+        return type(cls.__name__, (_CountingPoolMixin, cls), attrs)
+
+
+class SessionPool:
+    # 每个线程持有自己的 Session（隔离 Cookie 等状态），但共用同一个连接池适配器；
+    # cancel 为 CancelToken 时，取消后所有连接立即断开，之后的请求抛出 Cancelled
+    def __init__(
+        self,
+        pool_per_host=DEFAULT_POOL_PER_HOST,
+        max_hosts=DEFAULT_MAX_HOSTS,
+        block=False,
+        dns_cache=None,
+        cancel=None,
+    ):
+        self.stats = ConnectionStats()
+        self._adapter = CountingHTTPAdapter(
+            self.stats,
+            dns_cache=dns_cache,
+            cancel=cancel,
+            pool_connections=max_hosts,
+            pool_maxsize=max(1, int(pool_per_host)),
+            pool_block=block,
+            max_retries=0,
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        response = self.session.request(method, url, **kwargs)
+        response.connection_reused = self.stats.last_reused()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        # 连接池的队列按 pool_per_host (线程池引擎为线程数) 预先填满占位的 None，
+        # urllib3 回收连接池时逐个取出；先一次清空各队列，只关闭其中真正的连接
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            queue = pools[key].pool
+            if queue is None:
+                continue
+            with queue.mutex:
+                conns = [conn for conn in queue.queue if conn]
+                queue.queue.clear()
+            for conn in conns:
+                conn.close()
+        self._adapter.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool():
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SessionPool()
+        return _default_pool
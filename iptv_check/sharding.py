@@ -0,0 +1,500 @@
+# 多进程分片检测：解析、去重、缓存、断点续检和增量检测仍在主进程中进行，
+# 需要实际检测的条目按源站 (主机:端口) 分配给 N 个子进程，每个子进程运行自己的检测引擎
+# (线程池或异步)。TS 包解析、HLS 列表解析等 CPU 密集的步骤分散到多个进程，不再争抢同一个 GIL；
+# 同一源站的条目总在同一个子进程中检测，单源站并发上限和退避仍然全局有效。
+# 进程间只传递元组：主进程按批发送 (序号, 链接信息)，子进程经各自的管道按批回传不含名称和 URL 的
+# 检测结论，由主进程补回后交给原有的结果回调 (界面的 result_queue、命令行的结果列表)。
+# 停止信号是共享内存中的一个标志，子进程异常退出时不会留下被占用的锁。
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import zlib
+
+from . import probe
+from .engine import TIER_DEEP, CheckEngine
+from .scheduler import origin_of
+from .session import ConnectionStats
+
+DEFAULT_PROCESSES = os.cpu_count() or 1
+# 每批发送或回传的记录数，未满一批时最多等待 FLUSH_INTERVAL 秒
+BATCH_SIZE = 256
+FLUSH_INTERVAL = 0.1
+# 每个子进程的待检测队列最多缓存的批数，解析随检测进度推进
+INBOX_BATCHES = 8
+QUEUE_POLL = 0.2
+# 子进程检查停止信号的间隔 (秒)，停止请求在此时间内传到各子进程的检测
+STOP_POLL = 0.02
+# 停止后等待子进程退出的时间 (秒)，超时则强制结束
+STOP_GRACE = 5
+# 回传记录的类型
+RESULT, TIMING, OBSERVE, GAUGES, DONE = range(5)
+# 回传的结论字段；序号、名称、URL 和属性由主进程按序号补回
+RESULT_FIELDS = (
+    "status",
+    "latency",
+    "speed",
+    "details",
+    "codec",
+    "resolution",
+    "bitrate",
+    "bytes",
+    "elapsed",
+)
+# 只能留在主进程中的参数：不能跨进程共享的对象和结果回调
+LOCAL_OPTIONS = (
+    "on_result",
+    "cache",
+    "checkpoint",
+    "diff",
+    "metrics",
+    "dns_cache",
+    "skip",
+)
+
+
+def shard_of(url, processes):
+    # 按源站分片，同一 URL 每次分到同一个子进程
+    return zlib.crc32(origin_of(url).encode("utf-8")) % processes
+
+
+class ShardedEngine(CheckEngine):
+    # 参数与 CheckEngine 相同，另加子进程数；总并发数、ffprobe 进程数、带宽上限和
+    # 合计开始速率平均分给各子进程。传入的 DNS 缓存不使用，各子进程各自解析
+    def __init__(self, processes=DEFAULT_PROCESSES, **options):
+        super().__init__(**options)
+        self.processes = max(1, int(processes))
+        self.dns_cache, self._owns_dns_cache = None, False
+        shard_options = {
+            key: value for key, value in options.items() if key not in LOCAL_OPTIONS
+        }
+        shard_options.update(
+            max_workers=_share(self.max_workers, self.processes),
+            async_concurrency=_share(self.async_concurrency, self.processes),
+            ffprobe_workers=_share(self.ffprobe_options["workers"], self.processes),
+            bandwidth_limit=self.bandwidth_limit / self.processes,
+            start_rate=self.start_rate / self.processes,
+        )
+        self.shard_options = shard_options
+        self.connection_stats = ConnectionStats()
+        self.stop_flag, self.workers = None, []
+        self._receivers = {}  # 回传管道 -> 子进程
+        self._collector = None
+        self.shard_counts = [0] * self.processes  # 各子进程分到的条目数
+        # 各子进程结束时回传的统计之和
+        self.shard_totals = {
+            "hosts": 0,
+            "backoffs": 0,
+            "dns": [0, 0, 0],
+            "ffprobe": [0, 0, 0],
+            "bandwidth": [0, 0.0],
+        }
+        self.errors = []
+        self._pending = {}  # 序号 -> (链接信息, 子进程)，已发出、尚未收到结论
+        self._dead = {}  # 出错退出的子进程 -> 原因
+        self._shard_gauges = {}
+
+    def run(self, links):
+        items = self._admit(links)
+        try:
+            self._start()
+            if self.metrics is not None:
+                self.metrics.start(self.gauges)
+            self._distribute(items)
+            self._collector.join()
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.stop()
+            self._shutdown()
+            self.finished = True
+
+    def _start(self):
+        # 用 spawn 启动子进程：主进程中已有界面和检测线程，fork 不安全，且与 Windows 的行为一致
+        context = multiprocessing.get_context("spawn")
+        self.stop_flag = context.RawValue("b", 0)
+        interval = self.metrics.interval if self.metrics is not None else 0
+        for shard in range(self.processes):
+            inbox = context.Queue(INBOX_BATCHES)
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_shard_main,
+                args=(
+                    self.shard_options,
+                    inbox,
+                    sender,
+                    self.stop_flag,
+                    interval,
+                ),
+                name=f"iptv-check-shard-{shard}",
+                daemon=True,
+            )
+            process.start()
+            # 关闭主进程中的写端，子进程退出后读端才会收到 EOF
+            sender.close()
+            self.workers.append((process, inbox))
+            self._receivers[receiver] = shard
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _distribute(self, items):
+        batches = [[] for _ in range(self.processes)]
+        flushed_at = time.monotonic()
+        for index, link_info in items:
+            # skip 只能在主进程中调用，在分发时判定 (比检测开始时早至多一个队列的条目)
+            if self._skipped(index, link_info):
+                continue
+            shard = shard_of(link_info["url"], self.processes)
+            with self._lock:
+                reason = self._dead.get(shard)
+                if reason is None:
+                    self._pending[index] = (link_info, shard)
+            if reason is not None:
+                self._fail(index, link_info, reason)
+                continue
+            self.shard_counts[shard] += 1
+            batches[shard].append((index, link_info))
+            if len(batches[shard]) >= BATCH_SIZE:
+                self._send(shard, batches[shard])
+                batches[shard] = []
+            if time.monotonic() - flushed_at >= FLUSH_INTERVAL:
+                # 解析较慢时不让条目在未满的批次中久等
+                for shard, batch in enumerate(batches):
+                    if batch:
+                        self._send(shard, batch)
+                        batches[shard] = []
+                flushed_at = time.monotonic()
+            if self.stop_requested:
+                return
+        for shard, batch in enumerate(batches):
+            if batch:
+                self._send(shard, batch)
+            self._send(shard, None)  # 没有更多条目
+
+    def _send(self, shard, batch):
+        # 队列满时等待子进程取走，期间响应停止请求；子进程已退出时丢弃 (条目已判为无效)
+        inbox = self.workers[shard][1]
+        while not self.stop_requested and shard not in self._dead:
+            try:
+                inbox.put(batch, timeout=QUEUE_POLL)
+                return
+            except queue.Full:
+                continue
+
+    def _collect(self):
+        # 在主进程的后台线程中接收回传记录，直到所有子进程的管道关闭
+        receivers, finished = dict(self._receivers), set()
+        while receivers:
+            for receiver in multiprocessing.connection.wait(list(receivers)):
+                shard = receivers[receiver]
+                try:
+                    records = receiver.recv()
+                except (EOFError, OSError):
+                    del receivers[receiver]
+                    receiver.close()
+                    if shard not in finished:
+                        process = self.workers[shard][0]
+                        process.join(QUEUE_POLL)
+                        self._lost(shard, f"子进程异常退出 (退出码 {process.exitcode})")
+                    continue
+                for record in records:
+                    kind = record[0]
+                    if kind == RESULT:
+                        self._on_shard_result(record)
+                    elif kind == TIMING:
+                        self._on_shard_timing(record)
+                    elif kind == OBSERVE:
+                        self.metrics.observe(record[1], record[2])
+                    elif kind == GAUGES:
+                        self._shard_gauges[shard] = record[1]
+                    elif kind == DONE:
+                        _, counters, error = record
+                        finished.add(shard)
+                        self._merge(counters)
+                        if error:
+                            self._lost(shard, error)
+
+    def _on_shard_result(self, record):
+        _, index, tier, *fields = record
+        with self._lock:
+            entry = self._pending.pop(index, None)
+        if entry is not None:
+            self._on_probe_result(_unpack(index, entry[0], fields), tier)
+
+    def _on_shard_timing(self, record):
+        _, index, tier, *fields, timings = record
+        with self._lock:
+            entry = self._pending.get(index)
+        if entry is not None:
+            result = _unpack(index, entry[0], fields)
+            self.metrics.observe_result(result, timings, tier)
+
+    def _lost(self, shard, reason):
+        # 子进程出错退出：已分给它、尚无结论的条目判为无效，之后分到它的条目同样处理
+        reason = f"分片进程出错: {reason}"
+        with self._lock:
+            self._dead[shard] = reason
+            lost = [
+                (index, link_info)
+                for index, (link_info, owner) in self._pending.items()
+                if owner == shard
+            ]
+            for index, _ in lost:
+                del self._pending[index]
+        self.errors.append(reason)
+        for index, link_info in lost:
+            self._fail(index, link_info, reason)
+
+    def _fail(self, index, link_info, reason):
+        result = probe.create_result(index, link_info)
+        result["details"] = reason
+        self._on_probe_result(result)
+
+    def _merge(self, counters):
+        with self._lock:
+            for tier, stats in counters["tier_stats"].items():
+                for i, value in enumerate(stats):
+                    self.tier_stats[tier][i] += value
+            self.promoted += counters["promoted"]
+            self.dns_failures += counters["dns_failures"]
+            totals = self.shard_totals
+            totals["hosts"] += counters["hosts"]
+            totals["backoffs"] += counters["backoffs"]
+            for key in ("dns", "ffprobe", "bandwidth"):
+                totals[key] = [a + b for a, b in zip(totals[key], counters[key])]
+        if counters["connections"] is not None:
+            self.connection_stats.merge(counters["connections"])
+
+    def _shutdown(self):
+        # 正常结束时子进程已回传统计并退出；中断时先发出停止信号，超时仍未退出的强制结束
+        if self.stop_flag is not None:
+            self.stop_flag.value = 1
+        for process, inbox in self.workers:
+            process.join(STOP_GRACE)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            # 子进程已退出，队列中未取走的数据直接丢弃，不等待发送
+            inbox.cancel_join_thread()
+            inbox.close()
+        if self._collector is not None:
+            self._collector.join(STOP_GRACE)
+
+    def stop(self):
+        super().stop()
+        if self.stop_flag is not None:
+            self.stop_flag.value = 1
+
+    def gauges(self):
+        # 各子进程的排队数和占用情况之和，由子进程按指标采样间隔回传
+        gauges = {
+            "submitted": self.submitted,
+            "queued": 0,
+            "active": 0,
+            "workers": 0,
+            "ffprobe_pending": 0,
+        }
+        for shard_gauges in list(self._shard_gauges.values()):
+            for key in ("queued", "active", "workers", "ffprobe_pending"):
+                gauges[key] += shard_gauges[key]
+        return gauges
+
+    def summary(self):
+        totals = self.shard_totals
+        text = super().summary()
+        text += (
+            f"\n多进程分片: {self.processes} 个进程，各进程检测 "
+            + "/".join(str(count) for count in self.shard_counts)
+            + " 个 URL"
+        )
+        text += f"\n主机调度: {totals['hosts']} 个源站，退避 {totals['backoffs']} 次"
+        if self.verify_ffprobe and self.tier == TIER_DEEP:
+            verified, rejected, timeouts = totals["ffprobe"]
+            text += f"\nffprobe: 通过 {verified} 个，未通过 {rejected} 个，其中超时 {timeouts} 个"
+        if self.bandwidth_limit and self.run_speed_test and self.tier == TIER_DEEP:
+            waits, wait_seconds = totals["bandwidth"]
+            text += (
+                f"\n带宽预算: 上限 {self.bandwidth_limit * 8 / 1e6:.1f} Mbps，"
+                f"排队等待 {waits} 次，共 {wait_seconds:.1f}s"
+            )
+        lookups, failures, hits = totals["dns"]
+        text += f"\nDNS: 解析 {lookups} 个主机，失败 {failures} 个，缓存命中 {hits} 次"
+        for error in self.errors:
+            text += f"\n{error}"
+        return text
+
+
+def _share(total, processes):
+    return max(1, -(-int(total) // processes))
+
+
+def _pack(kind, result, tier):
+    return (kind, result["index"] - 1, tier) + tuple(
+        result[field] for field in RESULT_FIELDS
+    )
+
+
+def _unpack(index, link_info, fields):
+    result = probe.create_result(index, link_info)
+    result.update(zip(RESULT_FIELDS, fields))
+    return result
+
+
+class _Outbox:
+    # 子进程的回传管道：记录先放入缓冲区，满一批或每隔 FLUSH_INTERVAL 秒发送一次
+    def __init__(self, channel):
+        self.channel = channel
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        # 在锁内发送，保证结束记录排在所有结论之后
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= BATCH_SIZE:
+                self.channel.send(self._buffer)
+                self._buffer = []
+
+    def flush(self):
+        with self._lock:
+            if self._buffer:
+                self.channel.send(self._buffer)
+                self._buffer = []
+
+    def _flush_loop(self):
+        while not self._closed.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+        self.flush()
+        self.channel.close()
+
+
+class _MetricsRelay:
+    # 子进程中代替 Metrics：观测值回传主进程，由主进程的 Metrics 汇总；
+    # 检测结论由主进程收到最终结果时统计
+    def __init__(self, send, interval):
+        self.send, self.interval = send, interval
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def observe(self, phase, seconds):
+        self.send((OBSERVE, phase, seconds))
+
+    def observe_result(self, result, timings, tier):
+        self.send(_pack(TIMING, result, tier) + (timings or {},))
+
+    def count_outcome(self, result):
+        pass
+
+    def start(self, gauges):
+        self._sampler = threading.Thread(
+            target=self._sample_loop, args=(gauges,), daemon=True
+        )
+        self._sampler.start()
+
+    def _sample_loop(self, gauges):
+        while not self._stop.wait(self.interval):
+            self.send((GAUGES, gauges()))
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+
+class _ShardEngine(CheckEngine):
+    # 子进程中的引擎：收到的条目已在主进程中去重并带有原始序号，
+    # 最终结论直接回传，不保留已完成的结果
+    def __init__(self, send, **options):
+        super().__init__(**options)
+        self.send = send
+
+    def _admit(self, items):
+        for index, link_info in items:
+            self.submitted += 1
+            if self.stop_requested:
+                return
+            yield index, link_info
+
+    def _on_probe_result(self, result, tier=TIER_DEEP):
+        if not self.stop_requested:
+            self.send(_pack(RESULT, result, tier))
+
+
+def _receive(inbox, stop_flag):
+    while not stop_flag.value:
+        try:
+            batch = inbox.get(timeout=QUEUE_POLL)
+        except queue.Empty:
+            continue
+        if batch is None:
+            return
+        yield from batch
+
+
+def _watch_stop(stop_flag, engine):
+    while not stop_flag.value:
+        time.sleep(STOP_POLL)
+    engine.stop()
+
+
+def _counters(engine):
+    scheduler, dns_cache = engine.scheduler, engine.dns_cache
+    verifier, budget = engine.verifier, engine.bandwidth
+    return {
+        "tier_stats": engine.tier_stats,
+        "promoted": engine.promoted,
+        "dns_failures": engine.dns_failures,
+        "hosts": scheduler.host_count if scheduler else 0,
+        "backoffs": scheduler.backoffs if scheduler else 0,
+        "dns": (
+            [dns_cache.lookups, dns_cache.failures, dns_cache.hits]
+            if dns_cache
+            else [0, 0, 0]
+        ),
+        "ffprobe": (
+            [verifier.verified, verifier.rejected, verifier.timeouts]
+            if verifier
+            else [0, 0, 0]
+        ),
+        "bandwidth": [budget.waits, budget.wait_seconds] if budget else [0, 0.0],
+        "connections": (
+            engine.connection_stats.snapshot() if engine.connection_stats else None
+        ),
+    }
+
+
+def _shard_main(options, inbox, sender, stop_flag, metrics_interval):
+    # 子进程入口。Ctrl+C 由主进程处理，再通过 stop_flag 通知所有子进程停止
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    out = _Outbox(sender)
+    relay = None
+    if metrics_interval:
+        relay = _MetricsRelay(out.put, metrics_interval)
+    engine = _ShardEngine(out.put, metrics=relay, **options)
+    threading.Thread(target=_watch_stop, args=(stop_flag, engine), daemon=True).start()
+    error = None
+    try:
+        engine.run(_receive(inbox, stop_flag))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    out.put((DONE, _counters(engine), error))
+    out.close()
+    # 结论和统计已全部送出，连接已关闭。跳过解释器的清理直接退出 (数百个线程和连接对象的
+    # 回收要几百毫秒)，停止检测时主进程不必等待
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0)
@@ -0,0 +1,190 @@
+# 订阅源：源输入可以是 HTTP(S) 播放列表地址。下载时带上上次响应的 ETag / Last-Modified
+# 做条件请求，边下载边解压 (gzip) 边解析，解析出的条目逐行写入磁盘缓存，
+# 内存占用与列表大小无关。服务器返回 304 时不再下载和解析，直接读取上次缓存的条目。
+# 条目缓存文件同时作为断点日志和增量检测状态的 “源文件”，订阅未变化时沿用上次的结果。
+import codecs
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
+import zlib
+from urllib.parse import unquote, urlsplit
+
+import requests
+
+from .playlist import iter_lines
+from .session import HEADERS
+
+DEFAULT_SUBSCRIPTION_DIR = os.path.join(
+    os.path.expanduser("~"), ".iptv_check", "subscriptions"
+)
+DEFAULT_FETCH_TIMEOUT = 30
+CACHE_VERSION = 1
+CHUNK_SIZE = 64 * 1024
+_GZIP_MAGIC = b"\x1f\x8b"
+# 条目缓存每行一个 [名称, URL, 属性] 数组；复用同一个编码器，省去 json.dumps 每次的参数处理
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+# 导出文件名中不能出现的字符
+_UNSAFE_NAME_RE = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def is_remote(source):
+    return source.strip().lower().startswith(("http://", "https://"))
+
+
+def source_name(url):
+    # 导出文件名：取 URL 路径的最后一段 (去掉扩展名)，没有时取主机名
+    parts = urlsplit(url.strip())
+    name = os.path.basename(unquote(parts.path).rstrip("/"))
+    if name.lower().endswith(".gz"):
+        name = name[:-3]
+    name = os.path.splitext(name)[0]
+    return _UNSAFE_NAME_RE.sub("_", name or parts.hostname or "") or "订阅"
+
+
+class Subscription:
+    def __init__(
+        self, url, directory=DEFAULT_SUBSCRIPTION_DIR, timeout=DEFAULT_FETCH_TIMEOUT
+    ):
+        self.url = url.strip()
+        self.timeout = timeout
+        digest = hashlib.sha1(self.url.encode("utf-8")).hexdigest()
+        self.entries_path = os.path.join(directory, f"{digest}.jsonl")
+        self.meta_path = os.path.join(directory, f"{digest}.json")
+        self.name = source_name(self.url)
+        # fetch() 之后: unchanged 为服务器返回 304，entries 为条目数，
+        # downloaded 为实际下载的字节数 (压缩传输时为压缩后的大小)
+        self.unchanged = False
+        self.entries, self.downloaded = 0, 0
+
+    def _load_meta(self):
+        # 条目缓存和对应的响应头都在时才做条件请求
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(meta, dict) or meta.get("version") != CACHE_VERSION:
+            return None
+        if meta.get("url") != self.url or not os.path.exists(self.entries_path):
+            return None
+        return meta
+
+    def fetch(self):
+        # 下载订阅并更新条目缓存，返回条目缓存文件路径；
+        # 网络错误和 HTTP 错误状态抛出 requests.RequestException (OSError 的子类)
+        meta = self._load_meta()
+        headers = dict(HEADERS, **{"Accept-Encoding": "gzip, deflate"})
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        with requests.get(
+            self.url, headers=headers, timeout=self.timeout, stream=True
+        ) as response:
+            if response.status_code == 304 and meta is not None:
+                self.unchanged = True
+                self.entries = meta.get("entries", 0)
+                return self.entries_path
+            response.raise_for_status()
+            self._store(response)
+        return self.entries_path
+
+    def _store(self, response):
+        # 先写临时文件，完整下载并解析后再替换旧缓存，中途出错时旧缓存保持不变
+        os.makedirs(os.path.dirname(self.entries_path), exist_ok=True)
+        temp_path = f"{self.entries_path}.tmp"
+        count = 0
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for link_info in iter_lines(iter_text_lines(self._chunks(response))):
+                    entry = [link_info["name"], link_info["url"], link_info["attrs"]]
+                    f.write(_ENCODER.encode(entry) + "\n")
+                    count += 1
+        except zlib.error as e:
+            os.remove(temp_path)
+            raise OSError(f"订阅解压失败: {e}") from e
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        os.replace(temp_path, self.entries_path)
+        self.entries = count
+        meta = {
+            "version": CACHE_VERSION,
+            "url": self.url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "entries": count,
+            "fetched_at": time.time(),
+        }
+        temp_path = f"{self.meta_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_path, self.meta_path)
+
+    def _chunks(self, response):
+        # Content-Encoding 的解压由 urllib3 完成；直接提供的 .gz 文件 (没有 Content-Encoding)
+        # 按文件头识别后在这里解压。raw.tell() 为已读取的原始字节数
+        chunks = iter(response.iter_content(CHUNK_SIZE))
+        first = next(chunks, b"")
+        chunks = itertools.chain((first,), chunks)
+        if first.startswith(_GZIP_MAGIC):
+            chunks = gunzip(chunks)
+        for chunk in chunks:
+            yield chunk
+            self.downloaded = response.raw.tell()
+
+    def iter_entries(self):
+        return iter_entries(self.entries_path)
+
+    def open(self):
+        # 与 playlist.open_playlist 相同：没有条目时返回 None
+        if not self.entries:
+            return None
+        return self.iter_entries()
+
+    def summary(self):
+        if self.unchanged:
+            return f"订阅未变化 (304)，沿用缓存的 {self.entries} 条"
+        return (
+            f"订阅已更新，下载 {self.downloaded / 1024:.0f} KB，解析 {self.entries} 条"
+        )
+
+
+def gunzip(chunks):
+    # 流式解压，支持多个 gzip 成员首尾相接的文件，忽略最后一个成员之后的多余数据
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            if not decompressor.eof:
+                break
+            chunk = decompressor.unused_data
+            if not chunk.startswith(_GZIP_MAGIC):
+                return
+            decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    yield decompressor.flush()
+
+
+def iter_text_lines(chunks):
+    # 字节块 -> 文本行；多字节字符和行可能跨块，UTF-8 BOM 和非法字节忽略
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="ignore")
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_entries(path):
+    # 逐行读取条目缓存，产出与 playlist.iter_playlist 相同的链接信息
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            name, url, attrs = json.loads(line)
+            yield {"name": name, "url": url, "attrs": attrs}
@@ -0,0 +1,245 @@
+# 持续播放测速：按固定时长下载数据流，以滚动窗口计算吞吐，记录最低/平均速度和卡顿
+# (两次收到数据的间隔超过阈值)。与只下载 256 KB 的突发测速相比，更接近实际播放时的表现。
+# BandwidthBudget 为所有测速共用的带宽上限：总吞吐接近上限时，新的测速排队等待，
+# 避免同时测速的源太多、每个分到的带宽太少而使结果失真；已经开始的测速每读取一块数据
+# 就从令牌桶中扣除，合计读取速度不超过上限。
+import asyncio
+import threading
+import time
+from collections import deque
+
+DEFAULT_SUSTAIN_SECONDS = 10
+ROLLING_WINDOW = 1.0
+DEFAULT_STALL_THRESHOLD = 1.0
+SUSTAIN_CHUNK_SIZE = 64 * 1024
+# 等待带宽预算时的轮询间隔 (秒)
+BUDGET_POLL = 0.05
+# 还没有测速完成时，按每个源 256 KB/s (约 2 Mbps) 预估新测速会占用的带宽
+INITIAL_ESTIMATE = 256 * 1024
+# 令牌桶最多积攒多少秒的额度，即合计速度可以短暂超过上限的部分；
+# 限速时每次读取的数据块不超过上限下多少秒的数据量 (数据块越小，透支越少)
+BUDGET_BURST = 0.05
+BUDGET_CHUNK = 0.02
+MIN_BUDGET_CHUNK = 4096
+
+
+class ThroughputMeter:
+    # 测速 seconds 秒：每次收到数据时调用 feed()，done 为 True 时停止读取，finish() 返回统计结果
+    def __init__(
+        self,
+        seconds,
+        stall_threshold=DEFAULT_STALL_THRESHOLD,
+        window=ROLLING_WINDOW,
+        clock=time.monotonic,
+    ):
+        self.window, self.stall_threshold = window, stall_threshold
+        self.clock = clock
+        self.start = self.last = clock()
+        self.deadline = self.start + seconds
+        self.bytes = 0
+        self.stalls, self.stall_seconds = 0, 0.0
+        self._bucket, self._bucket_bytes = 0, 0
+        self.rates = []  # 已结束的各个窗口的吞吐 (字节/秒)
+
+    def feed(self, size, now=None):
+        now = self.clock() if now is None else now
+        if now > self.deadline:
+            # 读取阻塞到截止时间之后才收到的数据不计入，截止前的等待计为卡顿
+            now, size = self.deadline, 0
+        self._gap(now)
+        self._roll(now)
+        self._bucket_bytes += size
+        self.bytes += size
+        self.last = now
+
+    def pause(self, seconds):
+        # 因带宽上限暂停读取的时间不是源站的卡顿
+        self.last = min(self.last + seconds, self.deadline)
+
+    def remaining(self, now=None):
+        now = self.clock() if now is None else now
+        return max(0.0, self.deadline - now)
+
+    @property
+    def done(self):
+        return self.last >= self.deadline
+
+    def _gap(self, now):
+        gap = now - self.last
+        if gap > self.stall_threshold:
+            self.stalls += 1
+            self.stall_seconds += gap
+
+    def _roll(self, now):
+        # 进入新的窗口时结算之前的窗口，期间没有数据的窗口吞吐为 0
+        bucket = int((now - self.start) / self.window)
+        while self._bucket < bucket:
+            self.rates.append(self._bucket_bytes / self.window)
+            self._bucket += 1
+            self._bucket_bytes = 0
+
+    def finish(self, now=None):
+        # 数据流提前结束时按实际时长统计；读取超时时统计到测速截止时间，
+        # 最后一次收到数据之后的间隔同样可能是卡顿
+        now = self.clock() if now is None else now
+        now = min(now, max(self.deadline, self.last))
+        self._gap(now)
+        self._roll(now)
+        elapsed = now - self.start
+        rates = self.rates
+        if not rates and elapsed > 0:  # 不足一个窗口，按整体平均计
+            rates = [self.bytes / elapsed]
+        return {
+            "seconds": elapsed,
+            "bytes": self.bytes,
+            "avg": self.bytes / elapsed if elapsed > 0 else 0.0,
+            "min": min(rates) if rates else 0.0,
+            "stalls": self.stalls,
+            "stall_seconds": self.stall_seconds,
+        }
+
+
+def report_speed(report):
+    # 与突发测速相同的速度列格式 (KB/s)
+    return f"{report['avg'] / 1024:.2f}" if report["bytes"] else "N/A"
+
+
+def format_report(report):
+    text = (
+        f" | 持续 {report['seconds']:.1f}s 最低 {report['min'] / 1024:.0f} KB/s"
+        f" 卡顿 {report['stalls']} 次"
+    )
+    if report["stalls"]:
+        text += f" (共 {report['stall_seconds']:.1f}s)"
+    return text
+
+
+class BandwidthBudget:
+    # limit 为所有测速合计的带宽上限 (字节/秒)。测速开始前调用 acquire()，结束后 release()；
+    # 下载过程中每读取一块数据调用 throttle()，登记字节数并在超出上限时等待。
+    # 可在多个线程和事件循环中同时使用
+    def __init__(self, limit, window=ROLLING_WINDOW, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.burst = limit * BUDGET_BURST
+        self._tokens, self._refilled = self.burst, clock()
+        self.active = 0
+        self.estimate = INITIAL_ESTIMATE
+        self.waits, self.wait_seconds, self.peak = 0, 0.0, 0.0
+        self.closed = False
+        self._samples = deque()  # 窗口内的 (时间, 字节数)
+        self._window_bytes = 0
+        self._ramping = deque()  # 最近一个窗口内开始的测速，吞吐尚未体现在统计中
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._window_bytes -= self._samples.popleft()[1]
+        while self._ramping and now - self._ramping[0] > self.window:
+            self._ramping.popleft()
+
+    def rate(self):
+        with self._lock:
+            self._prune(self.clock())
+            return self._window_bytes / self.window
+
+    def _try_admit(self):
+        with self._lock:
+            now = self.clock()
+            self._prune(now)
+            projected = self._window_bytes / self.window
+            projected += (len(self._ramping) + 1) * self.estimate
+            # 没有正在进行的测速时总是放行，单个源的预估超过上限也不会永远等待
+            if self.active and projected > self.limit:
+                return False
+            self.active += 1
+            self._ramping.append(now)
+            return True
+
+    def acquire(self):
+        # 阻塞直到可以开始测速；close() 之后返回 False
+        start = None
+        while not self.closed:
+            if self._try_admit():
+                self._count_wait(start)
+                return True
+            start = start or self.clock()
+            time.sleep(BUDGET_POLL)
+        return False
+
+    async def acquire_async(self):
+        start = None
+        while not self.closed:
+            if self._try_admit():
+                self._count_wait(start)
+                return True
+            start = start or self.clock()
+            await asyncio.sleep(BUDGET_POLL)
+        return False
+
+    def _count_wait(self, start):
+        if start is not None:
+            with self._lock:
+                self.waits += 1
+                self.wait_seconds += self.clock() - start
+
+    def _record(self, now, size):
+        self._samples.append((now, size))
+        self._window_bytes += size
+        self._prune(now)
+        self.peak = max(self.peak, self._window_bytes / self.window)
+
+    def chunk_size(self, size):
+        # 限速时的读取块大小：先读后扣令牌，一块数据可能超出额度
+        return max(MIN_BUDGET_CHUNK, min(size, int(self.limit * BUDGET_CHUNK)))
+
+    def _take(self, size):
+        # 登记已读取的 size 字节并扣除令牌，返回需要等待的秒数 (令牌可以透支，等待补足)
+        with self._lock:
+            now = self.clock()
+            self._record(now, size)
+            refill = (now - self._refilled) * self.limit
+            self._tokens = min(self.burst, self._tokens + refill) - size
+            self._refilled = now
+            if self.closed or self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.limit
+
+    def throttle(self, size, cancel=None):
+        # 返回等待的秒数；cancel (CancelToken) 取消时立即返回
+        wait = self._take(size)
+        if wait:
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+        return wait
+
+    async def throttle_async(self, size):
+        wait = self._take(size)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def release(self, rate=None):
+        # rate 为该测速的平均吞吐，用于更新对新测速占用带宽的预估；
+        # 按上限截断，个别不限速的源不会让预估长期偏高而只能逐个测速
+        with self._lock:
+            self.active -= 1
+            if rate:
+                self.estimate = 0.8 * self.estimate + 0.2 * min(rate, self.limit)
+
+    def close(self):
+        # 停止检测时让所有等待中的测速立即返回
+        self.closed = True
+
+    def summary(self):
+        return (
+            f"带宽预算: 上限 {_mbps(self.limit)} Mbps，峰值 {_mbps(self.peak)} Mbps，"
+            f"排队等待 {self.waits} 次，共 {self.wait_seconds:.1f}s"
+        )
+
+
+def _mbps(rate):
+    return f"{rate * 8 / 1e6:.1f}"
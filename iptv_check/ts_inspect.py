@@ -0,0 +1,357 @@
+# 直播流内容识别：直接解析检测时已经下载的开头数据，不额外下载、不调用 ffprobe。
+# MPEG-TS 校验每个 188 字节包的同步字节 0x47，从 PAT/PMT 读出音视频编码，
+# 数据中带有 SPS (H.264/HEVC) 或序列头 (MPEG-2) 时读出分辨率。
+# 返回网页 (错误页、运营商认证页) 的链接判为无效。
+
+TS_PACKET_SIZE = 188
+SYNC_BYTE = 0x47
+# 至少连续多少个包的同步字节正确才认为是 TS 流
+LOCK_PACKETS = 5
+# 最多保留多少字节开头数据用于识别
+SNIFF_BYTES = 256 * 1024
+# 每个视频 PES 最多缓存多少字节用于查找 SPS (SPS 总是在关键帧 PES 的开头)
+SPS_SEARCH_BYTES = 4096
+MAX_SPS_BYTES = 256
+
+# PMT 中的 stream_type -> (类型, 编码名称)
+STREAM_TYPES = {
+    0x01: ("video", "MPEG-1"),
+    0x02: ("video", "MPEG-2"),
+    0x10: ("video", "MPEG-4"),
+    0x1B: ("video", "H.264"),
+    0x24: ("video", "HEVC"),
+    0x42: ("video", "AVS"),
+    0xD2: ("video", "AVS2"),
+    0x03: ("audio", "MP2"),
+    0x04: ("audio", "MP2"),
+    0x0F: ("audio", "AAC"),
+    0x11: ("audio", "AAC"),
+    0x81: ("audio", "AC-3"),
+    0x87: ("audio", "E-AC-3"),
+}
+# stream_type 0x06 (私有数据) 按描述符识别的音频
+PRIVATE_DESCRIPTORS = {0x6A: "AC-3", 0x7A: "E-AC-3", 0x7B: "DTS"}
+HTML_PREFIXES = (b"<!doctype", b"<html", b"<head", b"<body", b"<?xml", b"<script")
+H264_HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135)
+
+
+class Sniffer:
+    # 在读取数据流的同时保留开头的 limit 字节，只保存块的引用，读完后拼接一次
+    def __init__(self, limit=SNIFF_BYTES):
+        self.remaining = limit
+        self.chunks = []
+
+    def feed(self, chunk):
+        if self.remaining > 0 and chunk:
+            self.chunks.append(chunk)
+            self.remaining -= len(chunk)
+
+    @property
+    def data(self):
+        return self.chunks[0] if len(self.chunks) == 1 else b"".join(self.chunks)
+
+
+def codec_label(info):
+    # 结果中 “编码” 列的文字，如 H.264/AAC
+    return "/".join(name for name in (info["video"], info["audio"]) if name)
+
+
+def inspect(data, content_type=""):
+    # 返回 {"container", "video", "audio", "resolution"}；判定为网页或 TS 流损坏时抛出 ValueError
+    info = {"container": "", "video": "", "audio": "", "resolution": ""}
+    if not data:
+        return info
+    data = bytes(data)  # bytes 直接传入时不会复制
+    offset = find_sync(data)
+    if offset is None:
+        if looks_like_html(data, content_type):
+            raise ValueError("返回网页而非视频流")
+        return info
+    count = (len(data) - offset) // TS_PACKET_SIZE
+    end = offset + count * TS_PACKET_SIZE
+    # 逐包校验同步字节：按包长步进切片后与全 0x47 比较，循环在 C 层完成
+    if data[offset:end:TS_PACKET_SIZE] != bytes([SYNC_BYTE]) * count:
+        raise ValueError("TS同步字节错误")
+    info["container"] = "TS"
+    _read_programs(data, offset, end, info)
+    return info
+
+
+def find_sync(data):
+    # 找到连续 LOCK_PACKETS 个 (数据不足时为全部且至少 2 个) 同步字节的起始位置
+    size = len(data)
+    offset = data.find(SYNC_BYTE, 0, TS_PACKET_SIZE)
+    while offset != -1:
+        packets = min(LOCK_PACKETS, (size - offset) // TS_PACKET_SIZE)
+        if packets < 2:
+            return None
+        if all(
+            data[offset + i * TS_PACKET_SIZE] == SYNC_BYTE for i in range(1, packets)
+        ):
+            return offset
+        offset = data.find(SYNC_BYTE, offset + 1, TS_PACKET_SIZE)
+    return None
+
+
+def looks_like_html(data, content_type=""):
+    if "html" in content_type.lower():
+        return True
+    return data[:64].lstrip().lower().startswith(HTML_PREFIXES)
+
+
+def _read_programs(data, start, end, info):
+    # 逐包遍历：PAT -> PMT PID -> PMT 中的音视频 PID/编码 -> 视频 PES 中的 SPS
+    pmt_pid = video_pid = None
+    video_type = 0
+    pmt_done = False
+    es = bytearray()
+    collecting = False
+    for p in range(start, end, TS_PACKET_SIZE):
+        b1 = data[p + 1]
+        if b1 & 0x80:  # transport_error_indicator
+            continue
+        pid = ((b1 & 0x1F) << 8) | data[p + 2]
+        control = data[p + 3] >> 4 & 0x03
+        if not control & 0x01:
+            continue
+        payload = p + 4 + (1 + data[p + 4] if control & 0x02 else 0)
+        packet_end = p + TS_PACKET_SIZE
+        if payload >= packet_end:
+            continue
+        unit_start = b1 & 0x40
+        if pid == 0 and unit_start and pmt_pid is None:
+            pmt_pid = _parse_pat(data, payload, packet_end)
+        elif pid == pmt_pid and unit_start and not pmt_done:
+            streams = _parse_pmt(data, payload, packet_end)
+            if streams is None:
+                continue
+            pmt_done = True
+            for stream_type, es_pid, kind, name in streams:
+                if kind == "video" and not info["video"]:
+                    info["video"], video_pid, video_type = name, es_pid, stream_type
+                elif kind == "audio" and not info["audio"]:
+                    info["audio"] = name
+            if video_pid is None:
+                return
+        elif pid == video_pid and video_type in (0x02, 0x1B, 0x24):
+            if unit_start:
+                es = _pes_payload(data, payload, packet_end)
+                collecting = es is not None
+                es = es or bytearray()
+            elif collecting:
+                es += data[payload:packet_end]
+            else:
+                continue
+            resolution = _find_resolution(es, video_type)
+            if resolution:
+                info["resolution"] = resolution
+                return
+            if len(es) >= SPS_SEARCH_BYTES:
+                collecting = False
+
+
+def _section(data, payload, packet_end, table_id):
+    # 返回 PSI 段的 (数据起点, 终点 (不含 CRC))，只处理完整位于一个包内的段
+    pointer = data[payload]
+    t = payload + 1 + pointer
+    if t + 3 > packet_end or data[t] != table_id:
+        return None
+    length = ((data[t + 1] & 0x0F) << 8) | data[t + 2]
+    end = t + 3 + length - 4
+    if end > packet_end:
+        return None
+    return t, end
+
+
+def _parse_pat(data, payload, packet_end):
+    section = _section(data, payload, packet_end, 0x00)
+    if section is None:
+        return None
+    t, end = section
+    for i in range(t + 8, end - 3, 4):
+        program = (data[i] << 8) | data[i + 1]
+        if program:
+            return ((data[i + 2] & 0x1F) << 8) | data[i + 3]
+    return None
+
+
+def _parse_pmt(data, payload, packet_end):
+    # 返回 [(stream_type, PID, 类型, 编码名称)]，无法识别的流类型为空字符串
+    section = _section(data, payload, packet_end, 0x02)
+    if section is None:
+        return None
+    t, end = section
+    i = t + 12 + (((data[t + 10] & 0x0F) << 8) | data[t + 11])
+    streams = []
+    while i + 5 <= end:
+        stream_type = data[i]
+        es_pid = ((data[i + 1] & 0x1F) << 8) | data[i + 2]
+        info_length = ((data[i + 3] & 0x0F) << 8) | data[i + 4]
+        kind, name = STREAM_TYPES.get(stream_type, ("", ""))
+        if stream_type == 0x06:
+            name = _private_codec(data, i + 5, min(i + 5 + info_length, end))
+            kind = "audio" if name else ""
+        streams.append((stream_type, es_pid, kind, name))
+        i += 5 + info_length
+    return streams
+
+
+def _private_codec(data, i, end):
+    while i + 2 <= end:
+        tag = data[i]
+        if tag in PRIVATE_DESCRIPTORS:
+            return PRIVATE_DESCRIPTORS[tag]
+        i += 2 + data[i + 1]
+    return ""
+
+
+def _pes_payload(data, payload, packet_end):
+    # 跳过 PES 头，返回基本流数据；不是 PES 包时返回 None
+    if payload + 9 > packet_end or data[payload : payload + 3] != b"\x00\x00\x01":
+        return None
+    start = payload + 9 + data[payload + 8]
+    return bytearray(data[start:packet_end]) if start < packet_end else bytearray()
+
+
+def _find_resolution(es, video_type):
+    if video_type == 0x02:
+        i = es.find(b"\x00\x00\x01\xb3")
+        if i == -1 or i + 7 > len(es):
+            return ""
+        width = (es[i + 4] << 4) | (es[i + 5] >> 4)
+        height = ((es[i + 5] & 0x0F) << 8) | es[i + 6]
+        return f"{width}x{height}"
+    hevc = video_type == 0x24
+    i = es.find(b"\x00\x00\x01")
+    while i != -1 and i + 4 < len(es):
+        header = es[i + 3]
+        nal_type = header >> 1 & 0x3F if hevc else header & 0x1F
+        if nal_type == (33 if hevc else 7):
+            nal = _unescape(es[i + 3 : i + 3 + MAX_SPS_BYTES])
+            try:
+                size = _hevc_sps_size(nal) if hevc else _h264_sps_size(nal)
+            except IndexError:  # SPS 还没收全
+                return ""
+            return f"{size[0]}x{size[1]}" if size else ""
+        i = es.find(b"\x00\x00\x01", i + 3)
+    return ""
+
+
+def _unescape(nal):
+    # 去掉防竞争字节 00 00 03
+    return bytes(nal).replace(b"\x00\x00\x03", b"\x00\x00")
+
+
+class _BitReader:
+    def __init__(self, data):
+        self.value = int.from_bytes(data, "big")
+        self.bits = len(data) * 8
+        self.pos = 0
+
+    def read(self, n):
+        if self.pos + n > self.bits:
+            raise IndexError
+        self.pos += n
+        return (self.value >> (self.bits - self.pos)) & ((1 << n) - 1)
+
+    def skip(self, n):
+        self.read(n)
+
+    def ue(self):
+        zeros = 0
+        while not self.read(1):
+            zeros += 1
+            if zeros > 31:
+                raise IndexError
+        return (1 << zeros) - 1 + self.read(zeros)
+
+    def se(self):
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def _crop_units(chroma_format, frame_mbs_only=1):
+    # 裁剪偏移的单位 (SubWidthC, SubHeightC)
+    if chroma_format == 1:
+        return 2, 2 * (2 - frame_mbs_only)
+    if chroma_format == 2:
+        return 2, 2 - frame_mbs_only
+    return 1, 2 - frame_mbs_only
+
+
+def _h264_sps_size(nal):
+    r = _BitReader(nal[1:])
+    profile = r.read(8)
+    r.skip(16)  # constraint_set 标志, level_idc
+    r.ue()  # seq_parameter_set_id
+    chroma_format = 1
+    if profile in H264_HIGH_PROFILES:
+        chroma_format = r.ue()
+        if chroma_format == 3:
+            r.skip(1)  # separate_colour_plane_flag
+        r.ue()
+        r.ue()  # bit_depth_luma/chroma
+        r.skip(1)
+        if r.read(1):  # seq_scaling_matrix_present_flag
+            for i in range(8 if chroma_format != 3 else 12):
+                if r.read(1):
+                    _skip_scaling_list(r, 16 if i < 6 else 64)
+    r.ue()  # log2_max_frame_num_minus4
+    poc_type = r.ue()
+    if poc_type == 0:
+        r.ue()
+    elif poc_type == 1:
+        r.skip(1)
+        r.se()
+        r.se()
+        for _ in range(r.ue()):
+            r.se()
+    r.ue()  # max_num_ref_frames
+    r.skip(1)
+    width_mbs = r.ue() + 1
+    height_units = r.ue() + 1
+    frame_mbs_only = r.read(1)
+    if not frame_mbs_only:
+        r.skip(1)
+    r.skip(1)  # direct_8x8_inference_flag
+    width = width_mbs * 16
+    height = (2 - frame_mbs_only) * height_units * 16
+    if r.read(1):  # frame_cropping_flag
+        unit_x, unit_y = _crop_units(chroma_format, frame_mbs_only)
+        left, right, top, bottom = r.ue(), r.ue(), r.ue(), r.ue()
+        width -= (left + right) * unit_x
+        height -= (top + bottom) * unit_y
+    return (width, height) if width > 0 and height > 0 else None
+
+
+def _skip_scaling_list(r, size):
+    last = next_scale = 8
+    for _ in range(size):
+        if next_scale:
+            next_scale = (last + r.se() + 256) % 256
+        last = next_scale or last
+
+
+def _hevc_sps_size(nal):
+    r = _BitReader(nal[2:])
+    r.skip(4)  # sps_video_parameter_set_id
+    sub_layers = r.read(3)
+    r.skip(1)
+    # profile_tier_level
+    r.skip(96)
+    flags = [(r.read(1), r.read(1)) for _ in range(sub_layers)]
+    if sub_layers:
+        r.skip(2 * (8 - sub_layers))
+    for profile_present, level_present in flags:
+        r.skip(88 * profile_present + 8 * level_present)
+    r.ue()  # sps_seq_parameter_set_id
+    chroma_format = r.ue()
+    if chroma_format == 3:
+        r.skip(1)
+    width, height = r.ue(), r.ue()
+    if r.read(1):  # conformance_window_flag
+        unit_x, unit_y = _crop_units(chroma_format)
+        left, right, top, bottom = r.ue(), r.ue(), r.ue(), r.ue()
+        width -= (left + right) * unit_x
+        height -= (top + bottom) * unit_y
+    return (width, height) if width > 0 and height > 0 else None